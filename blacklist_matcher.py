@@ -0,0 +1,101 @@
+# Plik: blacklist_matcher.py
+
+"""
+Skompilowana czarna lista aplikacji wspólna dla serwera i agenta (agent.exe dołącza ten moduł przy
+budowaniu, serwer używa go w winget_dashboard/blacklist.py). Dzięki temu obie strony stosują
+dokładnie tę samą składnię reguł. Moduł korzysta tylko z biblioteki standardowej.
+"""
+
+import fnmatch
+import re
+from collections import deque
+
+# Reguła "id:Dostawca.Aplikacja" pomija aplikację o dokładnie takim identyfikatorze winget.
+ID_RULE_PREFIX = 'id:'
+WILDCARD_CHARS = ('*', '?')
+
+
+class SubstringAutomaton:
+    """Automat Aho-Corasick: sprawdza, czy tekst zawiera którekolwiek ze słów, w jednym przejściu po tekście."""
+
+    def __init__(self, words):
+        self._goto = [{}]
+        self._fail = [0]
+        self._terminal = [False]
+        for word in words:
+            state = 0
+            for char in word:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._terminal.append(False)
+                    self._goto[state][char] = next_state
+                state = next_state
+            self._terminal[state] = True
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._terminal[next_state] = self._terminal[next_state] or self._terminal[self._fail[next_state]]
+
+    def search(self, text):
+        goto, fail, terminal = self._goto, self._fail, self._terminal
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if terminal[state]:
+                return True
+        return False
+
+
+class BlacklistMatcher:
+    """
+    Skompilowana czarna lista aplikacji. Obsługuje trzy rodzaje reguł (bez rozróżniania wielkości liter):
+    - zwykłe słowo - pomija aplikacje, których nazwa zawiera to słowo (dotychczasowe działanie),
+    - "id:Dostawca.Aplikacja" - pomija aplikację o dokładnie takim ID,
+    - wzorzec z * lub ? - musi pasować do całej nazwy albo całego ID (np. "Microsoft.VCRedist.*").
+    Słowa trafiają do automatu Aho-Corasick (jedno przejście po nazwie niezależnie od liczby słów),
+    a wzorce do jednego wyrażenia regularnego.
+    """
+
+    def __init__(self, rules):
+        self.rules = tuple(rules)
+        substrings, wildcards, ids = [], [], set()
+        for rule in self.rules:
+            rule = rule.strip().casefold()
+            if rule.startswith(ID_RULE_PREFIX):
+                ids.add(rule[len(ID_RULE_PREFIX):].strip())
+            elif any(char in rule for char in WILDCARD_CHARS):
+                wildcards.append(fnmatch.translate(rule))
+            elif rule:
+                substrings.append(rule)
+        self._substrings = SubstringAutomaton(substrings) if substrings else None
+        self._wildcards = re.compile('|'.join(wildcards)) if wildcards else None
+        self._ids = frozenset(ids)
+
+    def __bool__(self):
+        return bool(self._substrings or self._wildcards or self._ids)
+
+    def matches(self, name, app_id=None):
+        name = (name or '').casefold()
+        app_id = (app_id or '').casefold()
+        if app_id in self._ids:
+            return True
+        if self._substrings and self._substrings.search(name):
+            return True
+        return bool(self._wildcards and (self._wildcards.match(name) or self._wildcards.match(app_id)))
+
+    def filter(self, apps, name_key='name', id_key='id'):
+        """Zwraca aplikacje (słowniki), które nie pasują do żadnej reguły."""
+        if not self:
+            return list(apps)
+        return [app for app in apps if not self.matches(app.get(name_key), app.get(id_key))]
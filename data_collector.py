@@ -0,0 +1,96 @@
+# Plik: data_collector.py
+
+"""
+Harmonogram zbierania danych do raportów agenta (agent.exe dołącza ten moduł przy budowaniu).
+
+Moduł nie zależy od Windows: sondy to zwykłe funkcje, a zegar jest wstrzykiwany, więc harmonogram
+sprawdzają testy (tests/test_data_collector.py) z udawanymi sondami i zegarem.
+"""
+
+import concurrent.futures
+import logging
+import threading
+import time
+
+
+class CollectorProbe:
+    def __init__(self, name, func, interval, timeout, default, keep_last):
+        self.name, self.func, self.interval, self.timeout = name, func, interval, timeout
+        self.value, self.default, self.keep_last = default, default, keep_last
+        self.collected_at, self.failed, self.future, self.deadline = None, False, None, 0.0
+
+    def is_fresh(self, now):
+        return self.collected_at is not None and now - self.collected_at < self.interval
+
+
+class DataCollector:
+    """
+    Niezależne sondy działają równolegle w puli wątków, każda z własnym limitem czasu i interwałem
+    odświeżania. Sonda, która zgłosiła błąd albo nie zdążyła, zwraca ostatni dobry wynik (keep_last=False:
+    wartość domyślną). Sonda wciąż działająca po przekroczeniu limitu nie jest uruchamiana ponownie - jej
+    wynik zostanie użyty, gdy się zakończy.
+    """
+
+    def __init__(self, clock=time.monotonic, max_workers=6):
+        self._clock = clock
+        self._probes = {}
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='probe')
+
+    def register(self, name, func, interval=0, timeout=60, default=None, keep_last=True):
+        self._probes[name] = CollectorProbe(name, func, interval, timeout, default, keep_last)
+
+    def invalidate(self, *names):
+        with self._lock:
+            for name in names or self._probes:
+                self._probes[name].collected_at = None
+
+    def start(self, *names):
+        """Uruchamia w tle sondy, których wynik jest nieaktualny (bez czekania na wynik)."""
+        with self._lock:
+            now = self._clock()
+            for name in names:
+                probe = self._probes[name]
+                if probe.future is not None and probe.future.done():
+                    self._harvest(probe, probe.future)
+                if probe.future is not None or probe.is_fresh(now):
+                    continue
+                probe.future, probe.deadline = self._executor.submit(probe.func), now + probe.timeout
+
+    def result(self, name):
+        """Czeka na sondę najdłużej do jej limitu czasu i zwraca wynik (albo ostatni dobry)."""
+        probe = self._probes[name]
+        with self._lock:
+            future, deadline = probe.future, probe.deadline
+        if future is not None:
+            try:
+                future.result(timeout=max(0.0, deadline - self._clock()))
+            except Exception:
+                pass  # błąd sondy jest logowany w _harvest
+            with self._lock:
+                timed_out = not future.done()
+                if timed_out:
+                    probe.failed = True
+                else:
+                    self._harvest(probe, future)
+            if timed_out:
+                logging.warning(f"Sonda '{name}' nie zakończyła się w ciągu {probe.timeout} s. "
+                                f"{'Używany jest ostatni dobry wynik.' if probe.keep_last else 'Brak wyniku.'}")
+        with self._lock:
+            return probe.value if probe.keep_last or not probe.failed else probe.default
+
+    def collect(self, *names):
+        self.start(*names)
+        return {name: self.result(name) for name in names}
+
+    def _harvest(self, probe, future):
+        # Wywoływane pod blokadą dla zakończonej sondy (raz dla każdego uruchomienia)
+        if probe.future is not future:
+            return
+        probe.future = None
+        try:
+            probe.value, probe.collected_at, probe.failed = future.result(), self._clock(), False
+        except Exception as e:
+            probe.failed = True
+            fallback = "Używany jest ostatni dobry wynik." if probe.keep_last else "Brak wyniku."
+            logging.warning(f"Sonda '{probe.name}' zakończyła się błędem ({type(e).__name__}: {e}). {fallback}")
@@ -0,0 +1,78 @@
+# Plik: inventory_sync.py
+
+"""
+Raporty różnicowe inwentarza wspólne dla agenta i serwera (agent.exe dołącza ten moduł przy budowaniu,
+serwer używa go w winget_dashboard/inventory.py i db.py):
+- inventory_hash - skrót listy aplikacji niezależny od kolejności; agent wysyła go z różnicą, a serwer
+  liczy go ponownie z listy po nałożeniu różnicy i przy niezgodności żąda pełnej listy,
+- build_inventory_delta (agent) i apply_delta (serwer) - różnica i jej nałożenie na multizbiorach
+  wpisów (id, nazwa, wersja).
+Moduł korzysta tylko z biblioteki standardowej.
+"""
+
+import hashlib
+from collections import Counter, defaultdict
+
+# Pola wpisu inwentarza w raporcie agenta, z których liczony jest skrót i klucz wpisu.
+ENTRY_FIELDS = ('id', 'name', 'version')
+
+
+def entry_key(app):
+    return tuple(str(app.get(field) or '') for field in ENTRY_FIELDS)
+
+
+def _as_entry(key):
+    return dict(zip(ENTRY_FIELDS, key))
+
+
+def inventory_hash(apps):
+    """Skrót listy aplikacji niezależny od kolejności (SHA-256 z posortowanych linii "id, nazwa, wersja")."""
+    lines = sorted('\t'.join(key) for key in map(entry_key, apps))
+    return hashlib.sha256('\n'.join(lines).encode('utf-8')).hexdigest()
+
+
+def build_inventory_delta(previous_apps, current_apps):
+    """
+    Różnica inwentarza jako (added, removed, changed). Ta sama aplikacja (id, nazwa) z dokładnie
+    jedną starą i jedną nową wersją trafia do changed z polem previous_version.
+    """
+    previous, current = Counter(map(entry_key, previous_apps)), Counter(map(entry_key, current_apps))
+    added_by_app, removed_by_app = defaultdict(list), defaultdict(list)
+    for key in (current - previous).elements():
+        added_by_app[key[:2]].append(key)
+    for key in (previous - current).elements():
+        removed_by_app[key[:2]].append(key)
+    changed = []
+    for app_key, keys in added_by_app.items():
+        if len(keys) == 1 and len(removed_by_app.get(app_key, ())) == 1:
+            changed.append({**_as_entry(keys[0]), 'previous_version': removed_by_app.pop(app_key)[0][2]})
+            keys.clear()
+    return ([_as_entry(key) for keys in added_by_app.values() for key in keys],
+            [_as_entry(key) for keys in removed_by_app.values() for key in keys], changed)
+
+
+def apply_delta(apps, delta):
+    """
+    Nakłada różnicę na listę aplikacji. Wpisy są traktowane jak multizbiór (id, nazwa, wersja) -
+    ta sama aplikacja może być zainstalowana w kilku wersjach. 'changed' to wpisy z polem
+    previous_version: usuwany jest wpis ze starą wersją, dodawany z nową. Usuwanego wpisu, którego
+    nie ma na liście, się nie szuka - taki rozjazd wykrywa porównanie skrótów.
+    """
+    current = Counter(map(entry_key, apps))
+    by_key = {}
+    for app in apps:
+        by_key.setdefault(entry_key(app), app)
+    removed = list(delta.get('removed', []))
+    added = list(delta.get('added', []))
+    for entry in delta.get('changed', []):
+        removed.append({**entry, 'version': entry.get('previous_version')})
+        added.append(entry)
+    for entry in removed:
+        key = entry_key(entry)
+        if current[key]:
+            current[key] -= 1
+    for entry in added:
+        key = entry_key(entry)
+        current[key] += 1
+        by_key.setdefault(key, {field: entry.get(field) for field in ENTRY_FIELDS})
+    return [by_key[key] for key, count in current.items() for _ in range(count)]
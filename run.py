@@ -7,4 +7,4 @@ app = create_app()
 if __name__ == "__main__":
     # Używamy stabilnego serwera Waitress zamiast deweloperskiego Flask
     print("Starting server with Waitress on http://0.0.0.0:5000")
-    serve(app, host='0.0.0.0', port=5000)
\ No newline at end of file
+    serve(app, host='0.0.0.0', port=5000, threads=app.config['SERVER_THREADS'])
\ No newline at end of file
@@ -0,0 +1,156 @@
+# Plik: shell_worker.py
+
+"""
+Długo działający proces powłoki dla CommandRunner agenta (agent.exe dołącza ten moduł przy budowaniu).
+
+Moduł nie zależy od Windows: ShellWorker uruchamia dowolny program mówiący protokołem ramek opisanym
+w klasie. Agent uruchamia powershell.exe z POWERSHELL_WORKER_SCRIPT, a testy (tests/test_shell_worker.py)
+- zastępczy skrypt sh z tests/shell_worker_stub.sh.
+"""
+
+import base64
+import logging
+import queue
+import subprocess
+import threading
+import time
+
+# Po tylu awariach z rzędu proces powłoki jest wyłączany na RETRY_AFTER sekund
+MAX_FAILURES = 3
+RETRY_AFTER = 300
+
+# Pętla procesu PowerShell obsługującego ShellWorker: czyta ramki poleceń ze stdin, wynik (także Write-Host)
+# zapisuje w ramce odpowiedzi. Kod wyjścia jak w powershell.exe -Command: $LASTEXITCODE albo 1 po wyjątku.
+POWERSHELL_WORKER_SCRIPT = r"""
+$ProgressPreference = 'SilentlyContinue'
+[System.Threading.Thread]::CurrentThread.CurrentUICulture = 'en-US'
+function ConvertTo-Frame([string]$text) { [Convert]::ToBase64String([Text.Encoding]::UTF8.GetBytes($text)) }
+while ($null -ne ($line = [Console]::In.ReadLine())) {
+    $id, $payload = $line -split ' ', 2
+    $errors = New-Object System.Collections.Generic.List[string]
+    $output, $code = '', 0
+    try {
+        $global:LASTEXITCODE = 0
+        $block = [ScriptBlock]::Create([Text.Encoding]::UTF8.GetString([Convert]::FromBase64String($payload)))
+        $output = & $block 2>&1 6>&1 | ForEach-Object {
+            if ($_ -is [System.Management.Automation.ErrorRecord]) { $errors.Add($_.ToString()) } else { $_ }
+        } | Out-String -Width 4096
+        if ($global:LASTEXITCODE) { $code = $global:LASTEXITCODE }
+    } catch { $errors.Add($_.ToString()); $code = 1 }
+    [Console]::Out.WriteLine("$id $code $(ConvertTo-Frame $output) $(ConvertTo-Frame ($errors -join [Environment]::NewLine))")
+    [Console]::Out.Flush()
+}
+"""
+
+
+class ShellWorker:
+    """
+    Długo działający proces powłoki wykonujący kolejne polecenia bez kosztu startu nowego procesu.
+    Protokół - jedna linia na ramkę, tekst jako UTF-8 w base64:
+      żądanie:   "<id> <polecenie>"
+      odpowiedź: "<id> <kod wyjścia> <stdout> <stderr>"
+    Linie z innym id są pomijane. Przekroczenie limitu czasu kończy proces (następne polecenie uruchomi
+    nowy), a zakończenie procesu w trakcie polecenia (np. przez exit) daje jego kod wyjścia, jak przy
+    osobnym procesie. Naraz wykonywane jest jedno polecenie: gdy pracownik jest zajęty albo wyłączony
+    po serii awarii, run() zwraca None i wywołujący uruchamia polecenie po staremu.
+    """
+
+    def __init__(self, argv, max_failures=MAX_FAILURES, retry_after=RETRY_AFTER):
+        self.argv, self.max_failures, self.retry_after = argv, max_failures, retry_after
+        self._lock = threading.Lock()
+        self._process, self._lines = None, None
+        self._next_id, self._failures, self._disabled_until = 0, 0, 0.0
+        self.starts = 0
+
+    @staticmethod
+    def _encode(text):
+        return base64.b64encode(text.encode('utf-8')).decode('ascii')
+
+    @staticmethod
+    def _decode(field):
+        return base64.b64decode(field).decode('utf-8', errors='ignore')
+
+    @staticmethod
+    def _read_lines(stream, lines):
+        for line in iter(stream.readline, b''):
+            lines.put(line)
+        lines.put(None)
+
+    def _start(self):
+        self._process = subprocess.Popen(self.argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                         stderr=subprocess.DEVNULL,
+                                         creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+        self._lines = queue.Queue()
+        threading.Thread(target=self._read_lines, args=(self._process.stdout, self._lines), daemon=True).start()
+        self.starts += 1
+        if self.starts > 1:
+            logging.info(f"Ponownie uruchomiono proces powłoki (uruchomienie nr {self.starts}).")
+
+    def _stop(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        if process.poll() is None:
+            process.kill()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+        for stream in (process.stdin, process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+    def _record_failure(self, reason):
+        self._stop()
+        self._failures += 1
+        if self._failures < self.max_failures:
+            return
+        self._failures, self._disabled_until = 0, time.monotonic() + self.retry_after
+        logging.warning(f"Proces powłoki zawiódł {self.max_failures} razy z rzędu ({reason}). "
+                        f"Przez {self.retry_after} s polecenia będą uruchamiane w osobnych procesach.")
+
+    def close(self):
+        with self._lock:
+            self._stop()
+
+    def run(self, command, timeout):
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            if time.monotonic() < self._disabled_until:
+                return None
+            self._next_id += 1
+            request_id = str(self._next_id)
+            try:
+                if self._process is None or self._process.poll() is not None:
+                    self._stop()
+                    self._start()
+                self._process.stdin.write(f"{request_id} {self._encode(command)}\n".encode('ascii'))
+                self._process.stdin.flush()
+            except OSError as e:
+                self._record_failure(e)
+                return None
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    line = self._lines.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    self._stop()
+                    raise subprocess.TimeoutExpired(command, timeout)
+                if line is None:
+                    returncode = self._process.wait()
+                    self._record_failure(f"kod wyjścia {returncode}")
+                    return subprocess.CompletedProcess(command, returncode, '', '')
+                fields = line.rstrip(b'\r\n').split(b' ')
+                if len(fields) != 4 or fields[0].decode('ascii', errors='ignore') != request_id:
+                    continue
+                try:
+                    returncode, stdout, stderr = int(fields[1]), self._decode(fields[2]), self._decode(fields[3])
+                except ValueError:
+                    continue
+                self._failures = 0
+                return subprocess.CompletedProcess(command, returncode, stdout, stderr)
+        finally:
+            self._lock.release()
@@ -0,0 +1,33 @@
+# tests/conftest.py
+
+import logging
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+API_HEADERS = {'X-API-Key': 'test-key'}
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """Aplikacja serwera na pustej bazie w katalogu tymczasowym."""
+    monkeypatch.setenv('API_KEY', 'test-key')
+    monkeypatch.setenv('SECRET_KEY', 'test-secret')
+    from winget_dashboard import config, create_app
+    monkeypatch.setattr(config.Config, 'API_KEY', 'test-key')
+    monkeypatch.setattr(config.Config, 'SECRET_KEY', 'test-secret')
+    database = tmp_path / 'winget_dashboard.db'
+    database.touch()
+    monkeypatch.setattr(config.Config, 'DATABASE', str(database))
+    app = create_app({'TESTING': True, 'INSTANCE_PATH': str(tmp_path / 'instance')})
+    logging.getLogger().setLevel(logging.WARNING)
+    result = app.test_cli_runner().invoke(args=['init-db'])
+    assert result.exit_code == 0, result.output
+    yield app
+    for extension in ('report_ingest', 'task_leases'):
+        if extension in app.extensions:
+            app.extensions[extension].stop()
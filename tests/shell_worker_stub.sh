@@ -0,0 +1,15 @@
+#!/bin/sh
+# Zastępczy pracownik powłoki dla testów ShellWorker na Linuksie - ten sam protokół ramek co
+# POWERSHELL_WORKER_SCRIPT: "<id> <polecenie>" -> "<id> <kod wyjścia> <stdout> <stderr>" (UTF-8 w base64).
+# Polecenia są wykonywane przez eval w tej samej powłoce, więc zmienne przetrwają między poleceniami,
+# a exit/kill kończą pracownika jak w PowerShell. Linia "stray" sprawdza pomijanie obcych linii.
+output=$(mktemp)
+errors=$(mktemp)
+trap 'rm -f "$output" "$errors"' EXIT
+while IFS=' ' read -r id payload; do
+    command=$(printf '%s' "$payload" | base64 -d)
+    eval "$command" >"$output" 2>"$errors"
+    code=$?
+    printf 'stray line\n'
+    printf '%s %s %s %s\n' "$id" "$code" "$(base64 <"$output" | tr -d '\n')" "$(base64 <"$errors" | tr -d '\n')"
+done
@@ -0,0 +1,67 @@
+# tests/test_blacklist_matcher.py
+
+import random
+import string
+
+import pytest
+
+from blacklist_matcher import BlacklistMatcher
+
+
+def _legacy_filter(apps, keywords):
+    # Filtr sprzed BlacklistMatcher: słowo kluczowe jako fragment nazwy, bez rozróżniania wielkości liter
+    return [app for app in apps if not any(keyword.lower() in app['name'].lower() for keyword in keywords)]
+
+
+@pytest.mark.parametrize('name, app_id, expected', [
+    ('Microsoft Office 365', 'Microsoft.Office', True),
+    ('LibreOFFICE', 'TheDocumentFoundation.LibreOffice', True),
+    ('Teams Machine-Wide Installer', 'Microsoft.Teams', True),
+    ('Git', 'Git.Git', False),
+    (None, None, False),
+])
+def test_substring_rules_match_part_of_the_name(name, app_id, expected):
+    assert BlacklistMatcher(['office', 'machine-wide']).matches(name, app_id) is expected
+
+
+def test_substring_rules_do_not_look_at_the_id():
+    assert not BlacklistMatcher(['office']).matches('Word', 'Microsoft.Office')
+
+
+def test_id_rule_matches_only_the_exact_id():
+    matcher = BlacklistMatcher(['id: Mozilla.Firefox'])
+    assert matcher.matches('Firefox', 'mozilla.firefox')
+    assert not matcher.matches('Firefox ESR', 'Mozilla.Firefox.ESR')
+    assert not matcher.matches('Mozilla.Firefox', 'Other.App')
+
+
+@pytest.mark.parametrize('name, app_id, expected', [
+    ('Microsoft Visual C++ 2015 Redistributable', 'Microsoft.VCRedist.2015+.x64', True),
+    ('VC Runtime', 'microsoft.vcredist.2013.x86', True),
+    ('Microsoft.VCRedist', 'Microsoft.VCRedist', False),
+    ('Java 8', 'Oracle.JavaRuntimeEnvironment', True),
+    ('Java 17', 'Oracle.JDK.17', False),
+])
+def test_wildcard_rules_match_the_whole_name_or_id(name, app_id, expected):
+    assert BlacklistMatcher(['Microsoft.VCRedist.*', 'java ?']).matches(name, app_id) is expected
+
+
+def test_empty_rules_keep_every_app():
+    matcher = BlacklistMatcher(['', '  '])
+    apps = [{'name': 'Git', 'id': 'Git.Git'}]
+    assert not matcher
+    assert matcher.filter(apps) == apps
+
+
+def test_keyword_filtering_matches_the_legacy_filter():
+    rng = random.Random(7)
+
+    def word(length):
+        return ''.join(rng.choice(string.ascii_letters) for _ in range(length))
+
+    keywords = ['Office', 'teams', 'update'] + [word(rng.randint(2, 5)) for _ in range(150)]
+    apps = [{'name': f"{word(6)} {rng.choice(['OFFICE', 'Teams', 'Tool', ''])}{word(8)}", 'id': f"{word(5)}.{word(7)}"}
+            for _ in range(2000)]
+    expected = _legacy_filter(apps, keywords)
+    assert 0 < len(expected) < len(apps)
+    assert BlacklistMatcher(keywords).filter(apps) == expected
@@ -0,0 +1,134 @@
+# tests/test_data_collector.py
+
+import threading
+
+import pytest
+
+from data_collector import DataCollector
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeProbe:
+    """Sonda zwracająca kolejne wartości; z blocked=True czeka, aż test ją zwolni."""
+
+    def __init__(self, *values, blocked=False):
+        self.values = list(values)
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        if not blocked:
+            self.release.set()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        assert self.release.wait(5)
+        value = self.values.pop(0)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_probes_start_concurrently(clock):
+    collector = DataCollector(clock=clock)
+    barrier = threading.Barrier(3, timeout=5)
+
+    def probe(name):
+        # Każda sonda czeka na pozostałe - przejdzie tylko, jeśli wszystkie działają naraz
+        barrier.wait()
+        return name
+
+    for name in ('a', 'b', 'c'):
+        collector.register(name, lambda name=name: probe(name), timeout=10)
+    assert collector.collect('a', 'b', 'c') == {'a': 'a', 'b': 'b', 'c': 'c'}
+
+
+def test_fresh_result_is_reused_until_interval_passes(clock):
+    collector = DataCollector(clock=clock)
+    probe = FakeProbe('first', 'second')
+    collector.register('probe', probe, interval=60, timeout=10)
+    assert collector.collect('probe') == {'probe': 'first'}
+    clock.now += 59
+    assert collector.collect('probe') == {'probe': 'first'}
+    clock.now += 1
+    assert collector.collect('probe') == {'probe': 'second'}
+    assert probe.calls == 2
+
+
+def test_timeout_returns_last_good_value(clock):
+    collector = DataCollector(clock=clock)
+    probe = FakeProbe('good', 'late')
+    collector.register('probe', probe, timeout=30)
+    assert collector.collect('probe') == {'probe': 'good'}
+    probe.release.clear()
+    collector.start('probe')
+    assert probe.started.wait(5)
+    clock.now += 30
+    assert collector.result('probe') == 'good'
+    probe.release.set()
+
+
+def test_error_returns_last_good_value(clock):
+    collector = DataCollector(clock=clock)
+    collector.register('probe', FakeProbe('good', RuntimeError('boom')), timeout=30)
+    assert collector.collect('probe') == {'probe': 'good'}
+    assert collector.collect('probe') == {'probe': 'good'}
+
+
+def test_keep_last_false_returns_default_after_timeout(clock):
+    collector = DataCollector(clock=clock)
+    probe = FakeProbe('good', 'late')
+    collector.register('probe', probe, timeout=30, default=[], keep_last=False)
+    assert collector.collect('probe') == {'probe': 'good'}
+    probe.release.clear()
+    collector.start('probe')
+    clock.now += 30
+    assert collector.result('probe') == []
+    probe.release.set()
+
+
+def test_keep_last_false_returns_default_after_error(clock):
+    collector = DataCollector(clock=clock)
+    collector.register('probe', FakeProbe('good', RuntimeError('boom')), default=[], keep_last=False)
+    assert collector.collect('probe') == {'probe': 'good'}
+    assert collector.collect('probe') == {'probe': []}
+
+
+def test_timed_out_probe_is_not_resubmitted_while_running(clock):
+    collector = DataCollector(clock=clock)
+    probe = FakeProbe('slow', 'next', blocked=True)
+    collector.register('probe', probe, interval=3600, timeout=30, default='none')
+    collector.start('probe')
+    assert probe.started.wait(5)
+    clock.now += 30
+    assert collector.result('probe') == 'none'
+    # Kolejne raporty nie uruchamiają drugiej kopii sondy, dopóki pierwsza działa
+    clock.now += 60
+    assert collector.collect('probe') == {'probe': 'none'}
+    assert probe.calls == 1
+    probe.release.set()
+    # Wynik spóźnionej sondy jest używany, gdy się zakończy, i liczy się jako świeży
+    collector._probes['probe'].future.result(timeout=5)
+    assert collector.collect('probe') == {'probe': 'slow'}
+    assert probe.calls == 1
+
+
+def test_invalidate_forces_refresh(clock):
+    collector = DataCollector(clock=clock)
+    probe = FakeProbe('first', 'second')
+    collector.register('probe', probe, interval=3600, timeout=10)
+    assert collector.collect('probe') == {'probe': 'first'}
+    collector.invalidate('probe')
+    assert collector.collect('probe') == {'probe': 'second'}
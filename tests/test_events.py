@@ -0,0 +1,25 @@
+# tests/test_events.py
+
+from conftest import API_HEADERS
+
+
+def test_stream_closed_before_first_frame_releases_its_slot(app):
+    bus = app.extensions['events']
+    bus.max_streams = 2
+    # Serwer WSGI zamyka odpowiedź bez pobrania ramki, gdy klient rozłączył się od razu
+    for _ in range(bus.max_streams + 1):
+        stream = bus.open_stream(None)
+        assert stream is not None
+        stream.close()
+    assert bus._streams == 0
+
+
+def test_stream_limit_returns_503(app):
+    bus = app.extensions['events']
+    bus.max_streams = 1
+    client = app.test_client()
+    first = client.get('/api/events', headers=API_HEADERS, buffered=False)
+    assert client.get('/api/events', headers=API_HEADERS, buffered=False).status_code == 503
+    assert next(first.response) == b'retry: 3000\n\n'
+    first.close()
+    assert bus._streams == 0
@@ -0,0 +1,92 @@
+# tests/test_ingest.py
+
+import sqlite3
+
+from conftest import API_HEADERS
+
+
+def _report(hostname):
+    return {'hostname': hostname, 'installed_apps': [{'name': 'App', 'id': 'Vendor.App', 'version': '1.0'}],
+            'available_app_updates': []}
+
+
+def _submit_and_wait(app, *hostnames):
+    client = app.test_client()
+    for hostname in hostnames:
+        assert client.post('/api/report', json=_report(hostname), headers=API_HEADERS).status_code == 202
+    ingest = app.extensions['report_ingest']
+    ingest._queue.join()
+    return ingest.stats()
+
+
+def _computer_count(app):
+    with sqlite3.connect(app.config['DATABASE']) as db:
+        return db.execute("SELECT COUNT(*) FROM computers").fetchone()[0]
+
+
+def test_concurrent_commit_does_not_invalidate_the_batch(app, monkeypatch):
+    from winget_dashboard.db import DatabaseManager
+
+    with sqlite3.connect(app.config['DATABASE']) as db:
+        db.execute("CREATE TABLE concurrent_writes (value INTEGER)")
+    original = DatabaseManager.process_report
+    blocked = []
+
+    def process_report(self, data):
+        # Odczyt w transakcji paczki, potem zapis z innego połączenia: przy zwykłym BEGIN zapis się udaje,
+        # a pierwszy zapis paczki kończy się SQLITE_BUSY_SNAPSHOT. BEGIN IMMEDIATE każe mu czekać.
+        self.db.execute("SELECT COUNT(*) FROM computers").fetchone()
+        other = sqlite3.connect(app.config['DATABASE'], timeout=0)
+        try:
+            other.execute("INSERT INTO concurrent_writes (value) VALUES (1)")
+            other.commit()
+        except sqlite3.OperationalError as e:
+            blocked.append(str(e))
+        finally:
+            other.close()
+        return original(self, data)
+
+    monkeypatch.setattr(DatabaseManager, 'process_report', process_report)
+    app.extensions['report_ingest'].flush_interval = 1
+    stats = _submit_and_wait(app, 'PC1', 'PC2')
+    assert len(blocked) == 2 and all('locked' in message for message in blocked)
+    assert stats['processed'] == 2 and stats['failed'] == 0
+    assert _computer_count(app) == 2
+
+
+def test_busy_batch_is_retried_instead_of_failed(app, monkeypatch):
+    from winget_dashboard.db import DatabaseManager
+
+    app.extensions['report_ingest'].retry_delay = 0
+    original = DatabaseManager.process_report
+    calls = []
+
+    def process_report(self, data):
+        calls.append(data['hostname'])
+        if len(calls) == 2:
+            raise sqlite3.OperationalError("database is locked")
+        return original(self, data)
+
+    monkeypatch.setattr(DatabaseManager, 'process_report', process_report)
+    app.extensions['report_ingest'].flush_interval = 1
+    stats = _submit_and_wait(app, 'PC1', 'PC2', 'PC3')
+    assert stats['retries'] == 1
+    assert stats['processed'] == 3 and stats['failed'] == 0
+    assert _computer_count(app) == 3
+
+
+def test_other_database_errors_fail_only_their_report(app, monkeypatch):
+    from winget_dashboard.db import DatabaseManager
+
+    original = DatabaseManager.process_report
+
+    def process_report(self, data):
+        if data['hostname'] == 'BROKEN':
+            raise sqlite3.IntegrityError("CHECK constraint failed")
+        return original(self, data)
+
+    monkeypatch.setattr(DatabaseManager, 'process_report', process_report)
+    app.extensions['report_ingest'].flush_interval = 1
+    stats = _submit_and_wait(app, 'PC1', 'BROKEN', 'PC2')
+    assert stats['retries'] == 0
+    assert stats['processed'] == 2 and stats['failed'] == 1
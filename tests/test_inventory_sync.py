@@ -0,0 +1,85 @@
+# tests/test_inventory_sync.py
+
+import pytest
+
+from conftest import API_HEADERS
+from inventory_sync import apply_delta, build_inventory_delta, inventory_hash
+
+GIT = {'id': 'Git.Git', 'name': 'Git', 'version': '2.40'}
+VIM = {'id': 'vim.vim', 'name': 'Vim', 'version': '9.0'}
+DOTNET_6 = {'id': 'Microsoft.DotNet.Runtime', 'name': '.NET Runtime', 'version': '6.0'}
+DOTNET_8 = {'id': 'Microsoft.DotNet.Runtime', 'name': '.NET Runtime', 'version': '8.0'}
+
+
+def _sorted(apps):
+    return sorted(apps, key=lambda app: (app['id'], app['name'], app['version']))
+
+
+def test_hash_ignores_order():
+    assert inventory_hash([GIT, VIM]) == inventory_hash([VIM, GIT])
+    assert inventory_hash([GIT, VIM]) != inventory_hash([GIT, {**VIM, 'version': '9.1'}])
+
+
+def test_single_version_change_is_reported_as_changed():
+    added, removed, changed = build_inventory_delta([GIT, VIM], [{**GIT, 'version': '2.41'}, VIM])
+    assert (added, removed) == ([], [])
+    assert changed == [{**GIT, 'version': '2.41', 'previous_version': '2.40'}]
+
+
+@pytest.mark.parametrize('previous, current', [
+    ([GIT], [GIT, VIM]),
+    ([GIT, VIM], [VIM]),
+    ([GIT, DOTNET_6], [{**GIT, 'version': '2.41'}, DOTNET_6, DOTNET_8]),
+    ([DOTNET_6, DOTNET_8], [DOTNET_8]),
+    ([GIT, GIT], [GIT]),
+    ([], [GIT, VIM]),
+])
+def test_apply_delta_rebuilds_the_current_inventory(previous, current):
+    added, removed, changed = build_inventory_delta(previous, current)
+    applied = apply_delta(previous, {'added': added, 'removed': removed, 'changed': changed})
+    assert _sorted(applied) == _sorted(current)
+    assert inventory_hash(applied) == inventory_hash(current)
+
+
+def _send_full_report(client, app, apps):
+    response = client.post('/api/report', json={'hostname': 'PC1', 'installed_apps': apps}, headers=API_HEADERS)
+    assert response.status_code == 202
+    app.extensions['report_ingest']._queue.join()
+
+
+def _delta_report(previous, current, **overrides):
+    added, removed, changed = build_inventory_delta(previous, current)
+    delta = {'base': inventory_hash(previous), 'hash': inventory_hash(current),
+             'added': added, 'removed': removed, 'changed': changed, **overrides}
+    return {'hostname': 'PC1', 'inventory_delta': delta}
+
+
+def _stored_apps(app):
+    from winget_dashboard.db import SNAPSHOT_APPS_QUERY, get_db
+
+    with app.app_context():
+        db = get_db()
+        snapshot_id = db.execute("SELECT MAX(snapshot_id) FROM reports").fetchone()[0]
+        return sorted((row['app_id'], row['name'], row['version'])
+                      for row in db.execute(SNAPSHOT_APPS_QUERY, (snapshot_id,)).fetchall())
+
+
+def test_delta_report_is_applied(app):
+    client = app.test_client()
+    _send_full_report(client, app, [GIT, DOTNET_6])
+    current = [{**GIT, 'version': '2.41'}, DOTNET_6, VIM]
+    response = client.post('/api/report', json=_delta_report([GIT, DOTNET_6], current), headers=API_HEADERS)
+    assert response.status_code == 202
+    app.extensions['report_ingest']._queue.join()
+    assert _stored_apps(app) == sorted((a['id'], a['name'], a['version']) for a in current)
+
+
+@pytest.mark.parametrize('overrides', [{'base': 'stale'}, {'hash': 'not-the-applied-inventory'}])
+def test_mismatched_delta_asks_for_a_full_report(app, overrides):
+    client = app.test_client()
+    _send_full_report(client, app, [GIT, DOTNET_6])
+    report = _delta_report([GIT, DOTNET_6], [GIT, DOTNET_6, VIM], **overrides)
+    response = client.post('/api/report', json=report, headers=API_HEADERS)
+    assert response.status_code == 409
+    assert response.json['status'] == 'resync_needed'
+    assert _stored_apps(app) == sorted((a['id'], a['name'], a['version']) for a in [GIT, DOTNET_6])
@@ -0,0 +1,218 @@
+# tests/test_ipc.py
+
+"""Obie strony IPC na pętli zwrotnej: ui_channel (agent) z prawdziwym ui_helper.handle_client."""
+
+import json
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+
+import pytest
+
+# ui_helper zakłada katalog logów w %PROGRAMDATA% już przy imporcie
+os.environ['PROGRAMDATA'] = tempfile.mkdtemp(prefix='winget-agent-test-')
+
+import ui_helper  # noqa: E402
+from ui_channel import UiChannel, UiClient, recv_exact  # noqa: E402
+
+TOKEN = 'test-token'
+
+
+def _fake_command(command):
+    # "sleep <s> <znacznik>" - długie polecenie wykonywane przez Pomocnika UI
+    _, seconds, marker = command.split()
+    time.sleep(float(seconds))
+    return json.dumps({'status': 'success', 'details': marker})
+
+
+def _command(seconds, marker):
+    return {'type': 'execute_command', 'command': f'sleep {seconds} {marker}'}
+
+
+def _listen(handler):
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(16)
+
+    def serve():
+        while True:
+            try:
+                conn, addr = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=handler, args=(conn, addr), daemon=True).start()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return listener
+
+
+def _read_frame(conn):
+    length = struct.unpack('>I', recv_exact(conn, 4))[0]
+    return json.loads(recv_exact(conn, length))
+
+
+def _send_frame(conn, value):
+    payload = json.dumps(value).encode('utf-8')
+    conn.sendall(struct.pack('>I', len(payload)) + payload)
+
+
+@pytest.fixture
+def helper(monkeypatch):
+    """Prawdziwy ui_helper.handle_client na losowym porcie, z udawanym wykonaniem poleceń."""
+    token_dir = os.path.join(os.environ['PROGRAMDATA'], 'WingetAgent')
+    os.makedirs(token_dir, exist_ok=True)
+    with open(os.path.join(token_dir, 'ipc.token'), 'w') as f:
+        f.write(TOKEN)
+    monkeypatch.setattr(ui_helper, 'run_command_as_user', _fake_command)
+    monkeypatch.setattr(ui_helper, 'REQUEST_SCHEDULER', ui_helper.RequestScheduler())
+    ui_helper.load_ipc_token()
+    listener = _listen(ui_helper.handle_client)
+    yield listener.getsockname()[1]
+    listener.close()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def connect(port, token=TOKEN):
+        monkeypatch.setattr(UiClient, 'PORT', port)
+        UiClient.configure_token(token)
+        return UiClient
+
+    yield connect
+    channel = UiClient._channel
+    if channel and channel._sock:
+        channel._disconnect(channel._sock, 'koniec testu')
+
+
+def test_session_is_kept_between_requests(helper, client):
+    ui = client(helper)
+    assert json.loads(ui.send_request({'type': 'ping'}, timeout=5)) == {'status': 'pong'}
+    sock = ui._channel._sock
+    assert sock is not None
+    for _ in range(50):
+        assert json.loads(ui.send_request({'type': 'ping'}, timeout=5)) == {'status': 'pong'}
+    assert ui._channel._sock is sock
+
+
+def test_replies_arrive_out_of_order_by_request_id(helper, client):
+    ui = client(helper)
+    finished = []
+
+    def call(seconds, marker):
+        finished.append(json.loads(ui.send_request(_command(seconds, marker), timeout=10))['details'])
+
+    threads = [threading.Thread(target=call, args=(0.6, 'slow')), threading.Thread(target=call, args=(0.1, 'fast'))]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)
+    for thread in threads:
+        thread.join()
+    # Oba polecenia szły tym samym połączeniem; krótsze odpowiedziało pierwsze
+    assert finished == ['fast', 'slow']
+
+
+def test_ping_is_answered_while_long_command_runs(helper, client):
+    ui = client(helper)
+    ui.send_request({'type': 'ping'}, timeout=5)
+    result = {}
+    long_call = threading.Thread(target=lambda: result.update(reply=ui.send_request(_command(1.0, 'long'), timeout=10)))
+    long_call.start()
+    time.sleep(0.1)
+    started = time.monotonic()
+    assert json.loads(ui.send_request({'type': 'ping'}, timeout=5)) == {'status': 'pong'}
+    assert time.monotonic() - started < 0.3
+    long_call.join()
+    assert json.loads(result['reply'])['details'] == 'long'
+
+
+def test_reconnects_after_helper_drops_connection(helper, client):
+    ui = client(helper)
+    ui.send_request({'type': 'ping'}, timeout=5)
+    sock = ui._channel._sock
+    sock.shutdown(socket.SHUT_RDWR)
+    time.sleep(0.1)
+    assert json.loads(ui.send_request({'type': 'ping'}, timeout=5)) == {'status': 'pong'}
+    assert ui._channel._sock not in (None, sock)
+
+
+def test_in_flight_requests_return_no_response_on_drop():
+    received = threading.Event()
+
+    def dropping_helper(conn, addr):
+        # Powitanie, po czym zerwanie połączenia w trakcie wykonywania polecenia
+        _read_frame(conn)
+        _send_frame(conn, {'status': 'hello', 'protocol': 2})
+        recv_exact(conn, 8)
+        received.set()
+        time.sleep(0.2)
+        conn.close()
+
+    listener = _listen(dropping_helper)
+    channel = UiChannel('127.0.0.1', listener.getsockname()[1], TOKEN)
+    started = time.monotonic()
+    assert channel.request(_command(5, 'never'), timeout=10) == 'no_response'
+    assert received.is_set() and time.monotonic() - started < 2
+    assert channel._sock is None and channel._pending == {}
+    listener.close()
+
+
+def test_keepalive_timeout_disconnects_silent_helper():
+    def silent_helper(conn, addr):
+        _read_frame(conn)
+        _send_frame(conn, {'status': 'hello', 'protocol': 2})
+        time.sleep(5)
+        conn.close()
+
+    listener = _listen(silent_helper)
+    channel = UiChannel('127.0.0.1', listener.getsockname()[1], TOKEN, keepalive_interval=0.2, ping_timeout=0.2)
+    # Polecenie bez odpowiedzi - keepalive zauważa ciszę i zamyka połączenie, zanim minie limit polecenia
+    started = time.monotonic()
+    assert channel.request(_command(5, 'never'), timeout=10) == 'no_response'
+    assert time.monotonic() - started < 2
+    assert channel._sock is None
+    listener.close()
+
+
+def test_legacy_helper_falls_back_to_single_requests(client):
+    hellos = []
+
+    def legacy_helper(conn, addr):
+        # Pomocnik sprzed sesji: każde połączenie to jedno polecenie, "hello" jest nieznanym typem
+        request = _read_frame(conn)
+        if request['type'] == 'hello':
+            hellos.append(request)
+            _send_frame(conn, {'status': 'error', 'details': 'Nieznany typ polecenia: hello'})
+        else:
+            _send_frame(conn, {'status': 'pong', 'token_ok': request.get('token') == TOKEN})
+        conn.close()
+
+    listener = _listen(legacy_helper)
+    ui = client(listener.getsockname()[1])
+    assert json.loads(ui.send_request({'type': 'ping'}, timeout=5)) == {'status': 'pong', 'token_ok': True}
+    assert json.loads(ui.send_request({'type': 'ping'}, timeout=5)) == {'status': 'pong', 'token_ok': True}
+    # Powitanie nie jest ponawiane przy każdym poleceniu
+    assert len(hellos) == 1 and hellos[0]['protocol'] == 2
+    listener.close()
+
+
+def test_protocol_1_agent_against_current_helper(helper):
+    with socket.create_connection(('127.0.0.1', helper), timeout=5) as conn:
+        _send_frame(conn, {'type': 'ping', 'token': TOKEN})
+        assert _read_frame(conn) == {'status': 'pong'}
+
+
+def test_wrong_token_is_rejected(helper, client):
+    ui = client(helper, token='wrong')
+    assert ui.send_request({'type': 'ping'}, timeout=5) == 'no_response'
+    assert ui._channel._sock is None
+
+
+def test_no_helper(client):
+    probe = socket.socket()
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    assert client(port).send_request({'type': 'ping'}, timeout=5) == 'no_helper'
@@ -0,0 +1,24 @@
+# tests/test_overview.py
+
+import pytest
+
+from winget_dashboard.events import publish_event
+
+
+@pytest.mark.parametrize('event_type, data, invalidated', [
+    ('report', {'computer_id': 1, 'hostname': 'PC1', 'created': False}, False),
+    ('task', {'id': 1, 'computer_id': 1, 'status': 'w toku'}, False),
+    ('presence', {'hostname': 'PC1', 'online': False}, False),
+    ('report', {'computer_id': 2, 'hostname': 'PC2', 'created': True}, True),
+    ('computer_removed', {'computer_id': 1}, True),
+    ('blacklist', {'hostname': 'PC1'}, True),
+])
+def test_only_structural_events_invalidate_the_cache(app, event_type, data, invalidated):
+    overview = app.extensions['fleet_overview']
+    with app.app_context():
+        overview.get_summary()
+        publish_event(event_type, data)
+        overview.get_summary()
+    stats = overview.stats()
+    assert stats['invalidations'] == int(invalidated)
+    assert stats['hits'] == int(not invalidated)
@@ -0,0 +1,9 @@
+# tests/test_query_plans.py
+
+from winget_dashboard.migrations import check_query_plans
+
+
+def test_workload_has_no_full_table_scans(app):
+    with app.app_context():
+        problems = check_query_plans()
+    assert problems == [], '\n'.join(f"{statement}\n  {plan}" for statement, plan in problems)
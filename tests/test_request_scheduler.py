@@ -0,0 +1,111 @@
+# tests/test_request_scheduler.py
+
+"""Tory RequestScheduler w ui_helper: kolejność poleceń winget i łączenie identycznych poleceń."""
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+
+# ui_helper zakłada katalog logów w %PROGRAMDATA% już przy imporcie
+os.environ.setdefault('PROGRAMDATA', tempfile.mkdtemp(prefix='winget-agent-test-'))
+
+import ui_helper  # noqa: E402
+
+
+class FakeRunner:
+    """Udawane run_command_as_user: liczy wykonania i najwyższą liczbę poleceń winget wykonywanych naraz."""
+
+    def __init__(self, duration=0.1):
+        self.duration = duration
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, command):
+        with self._lock:
+            self.calls.append(command)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.duration)
+        with self._lock:
+            self.running -= 1
+        return json.dumps({'status': 'success', 'details': command})
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    runner = FakeRunner()
+    monkeypatch.setattr(ui_helper, 'run_command_as_user', runner)
+    return runner
+
+
+@pytest.fixture
+def scheduler():
+    return ui_helper.RequestScheduler()
+
+
+def _execute(scheduler, *commands):
+    futures = [scheduler.submit({'type': 'execute_command', 'command': command}) for command in commands]
+    return [json.loads(future.result(timeout=10))['details'] for future in futures]
+
+
+def test_winget_commands_run_one_at_a_time(runner, scheduler):
+    commands = ['winget install --id A', 'winget list', 'winget upgrade --id B', 'winget search git']
+    assert _execute(scheduler, *commands) == commands
+    assert runner.calls == commands
+    assert runner.max_running == 1
+
+
+def test_other_commands_do_not_wait_for_winget(runner, scheduler):
+    _execute(scheduler, 'winget install --id A', 'Get-Date', 'Get-Process')
+    assert runner.max_running == 3
+
+
+def test_identical_read_only_commands_share_one_run(runner, scheduler):
+    results = _execute(scheduler, 'winget list --json', 'winget  list  --json', 'winget list --json')
+    assert results == ['winget list --json'] * 3
+    assert runner.calls == ['winget list --json']
+    assert scheduler.coalesced == 2
+
+
+def test_finished_command_is_run_again(runner, scheduler):
+    _execute(scheduler, 'winget list')
+    _execute(scheduler, 'winget list')
+    assert runner.calls == ['winget list', 'winget list']
+    assert scheduler.coalesced == 0
+
+
+def test_source_update_is_coalesced(runner, scheduler):
+    _execute(scheduler, 'winget source update', 'winget source update')
+    assert runner.calls == ['winget source update']
+
+
+@pytest.mark.parametrize('command', [
+    'winget upgrade --all --accept-source-agreements',
+    'winget upgrade --id Git.Git',
+    'winget install --id Git.Git',
+    'winget uninstall --id Git.Git',
+    'winget source reset --force',
+])
+def test_commands_that_change_the_system_are_not_coalesced(runner, scheduler, command):
+    _execute(scheduler, command, command)
+    assert runner.calls == [command, command]
+    assert scheduler.coalesced == 0
+
+
+@pytest.mark.parametrize('command, read_only', [
+    ('winget list --accept-source-agreements', True),
+    ('winget upgrade --json --include-unknown', True),
+    ('winget source list', True),
+    ('winget source update', False),
+    ('winget upgrade --all', False),
+    ('winget install --id Git.Git', False),
+    ('winget list\nwinget install --id Git.Git', False),
+])
+def test_read_only_classification(command, read_only):
+    assert ui_helper.is_read_only_winget_command(command) is read_only
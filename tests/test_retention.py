@@ -0,0 +1,29 @@
+# tests/test_retention.py
+
+import pytest
+
+from winget_dashboard.db import get_db
+from winget_dashboard.retention import RetentionEngine
+
+
+@pytest.fixture
+def db_without_incremental_vacuum(app):
+    with app.app_context():
+        db = get_db()
+        db.execute("PRAGMA auto_vacuum = NONE")
+        db.execute("VACUUM")
+        assert db.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+        yield db
+
+
+def test_background_run_does_not_convert_database(app, db_without_incremental_vacuum):
+    db = db_without_incremental_vacuum
+    assert RetentionEngine(db, app.config).vacuum() == 0
+    assert db.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+
+
+def test_cli_run_converts_database_to_incremental(app, db_without_incremental_vacuum):
+    result = app.test_cli_runner().invoke(args=['retention-run'])
+    assert result.exit_code == 0, result.output
+    db = db_without_incremental_vacuum
+    assert db.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
@@ -0,0 +1,84 @@
+# tests/test_shell_worker.py
+
+import os
+import subprocess
+import threading
+import time
+
+import pytest
+
+from shell_worker import ShellWorker
+
+STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shell_worker_stub.sh')
+
+
+@pytest.fixture
+def worker():
+    worker = ShellWorker(['sh', STUB], max_failures=2, retry_after=0.5)
+    yield worker
+    worker.close()
+
+
+def test_framing_round_trip(worker):
+    result = worker.run('echo "zażółć gęślą jaźń"; echo błąd >&2; exit_code() { return 3; }; exit_code', 5)
+    assert (result.returncode, result.stdout, result.stderr) == (3, 'zażółć gęślą jaźń\n', 'błąd\n')
+    # Jeden proces dla wielu poleceń, ze wspólnym stanem powłoki
+    assert worker.run('VALUE=42', 5).returncode == 0
+    assert worker.run('echo $VALUE', 5).stdout == '42\n'
+    assert worker.starts == 1
+
+
+def test_busy_worker_returns_none(worker):
+    started = threading.Event()
+
+    def long_command():
+        started.set()
+        worker.run('sleep 0.5', 5)
+
+    thread = threading.Thread(target=long_command)
+    thread.start()
+    started.wait()
+    time.sleep(0.1)
+    assert worker.run('echo busy', 5) is None
+    thread.join()
+
+
+def test_timeout_kills_and_restarts(worker):
+    assert worker.run('echo first', 5).stdout == 'first\n'
+    with pytest.raises(subprocess.TimeoutExpired):
+        worker.run('sleep 10', 0.3)
+    assert worker.run('echo again', 5).stdout == 'again\n'
+    assert worker.starts == 2
+
+
+def test_crash_mid_command_returns_exit_code_and_restarts(worker):
+    assert worker.run('exit 7', 5).returncode == 7
+    assert worker.run('echo alive', 5).stdout == 'alive\n'
+    assert worker.starts == 2
+    killed = worker.run('kill -9 $$', 5)
+    assert killed.returncode == -9
+    assert worker.run('echo alive', 5).stdout == 'alive\n'
+    assert worker.starts == 3
+
+
+def test_disabled_after_repeated_failures(worker):
+    assert worker.run('exit 1', 5).returncode == 1
+    assert worker.run('exit 1', 5).returncode == 1
+    # Po max_failures awariach z rzędu wywołujący uruchamia polecenia w osobnych procesach
+    assert worker.run('echo disabled', 5) is None
+    time.sleep(0.6)
+    assert worker.run('echo enabled', 5).stdout == 'enabled\n'
+
+
+def test_success_resets_failure_count(worker):
+    assert worker.run('exit 1', 5).returncode == 1
+    assert worker.run('echo ok', 5).stdout == 'ok\n'
+    assert worker.run('exit 1', 5).returncode == 1
+    assert worker.run('echo still enabled', 5).stdout == 'still enabled\n'
+
+
+def test_missing_shell_counts_as_failure():
+    worker = ShellWorker(['/nonexistent/shell'], max_failures=2, retry_after=60)
+    assert worker.run('echo', 5) is None
+    assert worker.run('echo', 5) is None
+    assert worker._disabled_until > time.monotonic()
@@ -0,0 +1,81 @@
+# tests/test_task_leases.py
+
+import sqlite3
+
+from conftest import API_HEADERS
+
+
+def _claimed_tasks(app, count):
+    client = app.test_client()
+    client.post('/api/report', json={'hostname': 'PC1', 'agent_version': '1.2.0', 'installed_apps': []},
+                headers=API_HEADERS)
+    app.extensions['report_ingest']._queue.join()
+    for i in range(count):
+        client.post('/api/computer/1/update', json={'package_id': f'Vendor.App{i}'}, headers=API_HEADERS)
+    tasks = client.get('/api/tasks/PC1', headers=API_HEADERS).json
+    assert len(tasks) == count
+    with sqlite3.connect(app.config['DATABASE']) as db:
+        db.execute("UPDATE tasks SET lease_expires_at = datetime('now', '-1 seconds')")
+    return [task['id'] for task in tasks]
+
+
+def _statuses(app):
+    with sqlite3.connect(app.config['DATABASE']) as db:
+        return dict(db.execute("SELECT id, status FROM tasks").fetchall())
+
+
+def test_sweep_requeues_expired_tasks(app):
+    task_ids = _claimed_tasks(app, 2)
+    assert app.extensions['task_leases'].sweep() == 2
+    assert _statuses(app) == {task_id: 'oczekuje' for task_id in task_ids}
+    assert app.extensions['task_leases'].sweep() == 0
+
+
+def test_result_posted_during_sweep_is_not_requeued(app, monkeypatch):
+    from winget_dashboard.db import DatabaseManager
+
+    finished_id, expired_id = _claimed_tasks(app, 2)
+    original = DatabaseManager._update_expired_tasks
+
+    def update_expired_tasks(self, assignments, task_ids):
+        # Agent zapisuje wynik między SELECT wygasłych dzierżaw a ich UPDATE
+        if finished_id in task_ids:
+            with sqlite3.connect(app.config['DATABASE']) as other:
+                other.execute("UPDATE tasks SET status = 'zakończone', lease_expires_at = NULL WHERE id = ?",
+                              (finished_id,))
+        return original(self, assignments, task_ids)
+
+    monkeypatch.setattr(DatabaseManager, '_update_expired_tasks', update_expired_tasks)
+    published = []
+    monkeypatch.setattr(DatabaseManager, '_publish_tasks', lambda self, task_ids: published.extend(task_ids))
+    assert app.extensions['task_leases'].sweep() == 1
+    assert _statuses(app) == {finished_id: 'zakończone', expired_id: 'oczekuje'}
+    assert published == [expired_id]
+
+
+def test_heartbeat_renews_lease_of_running_task(app):
+    running_id, claimed_id = _claimed_tasks(app, 2)
+    client = app.test_client()
+    client.post('/api/tasks/result', json={'task_id': running_id, 'status': 'w_trakcie_wykonywania'},
+                headers=API_HEADERS)
+    with sqlite3.connect(app.config['DATABASE']) as db:
+        db.execute("UPDATE tasks SET lease_expires_at = datetime('now', '-1 seconds')")
+    client.post('/api/agent/heartbeat', json={'hostname': 'PC1'}, headers=API_HEADERS)
+    app.extensions['presence'].flush()
+    # Zadanie wykonywane przez żywego agenta zostaje; tylko pobrane i nierozpoczęte wraca do kolejki
+    assert app.extensions['task_leases'].sweep() == 1
+    assert _statuses(app) == {running_id: 'w_trakcie_wykonywania', claimed_id: 'oczekuje'}
+
+
+def test_self_update_is_delivered_on_every_poll(app):
+    from winget_dashboard.db import DatabaseManager
+
+    client = app.test_client()
+    client.post('/api/report', json={'hostname': 'PC1', 'agent_version': '1.2.0', 'installed_apps': []},
+                headers=API_HEADERS)
+    app.extensions['report_ingest']._queue.join()
+    with app.app_context():
+        task_id = DatabaseManager().create_task(1, 'self_update', {'target_version': '1.3.0'})
+    for _ in range(2):
+        tasks = client.get('/api/tasks/PC1', headers=API_HEADERS).json
+        assert [(task['id'], task['status']) for task in tasks] == [(task_id, 'oczekuje')]
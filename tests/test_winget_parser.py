@@ -0,0 +1,134 @@
+# tests/test_winget_parser.py
+
+import json
+import os
+
+import pytest
+
+import winget_parser
+from winget_parser import JsonStreamDecoder, parse_json_output, parse_text_output
+
+CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'winget_corpus')
+
+
+def _corpus():
+    with open(os.path.join(CORPUS, 'expected.json'), encoding='utf-8') as f:
+        return sorted(json.load(f).items())
+
+
+@pytest.mark.parametrize('chunk_size', [None, 1, 7, 4096])
+@pytest.mark.parametrize('name, expected', _corpus())
+def test_corpus(name, expected, chunk_size):
+    with open(os.path.join(CORPUS, name), encoding='utf-8', newline='') as f:
+        text = f.read()
+    parse = parse_json_output if name.endswith('.json') else parse_text_output
+    assert (parse(text, chunk_size) if chunk_size else parse(text)) == expected
+
+
+def test_concatenated_objects_with_braces_in_strings():
+    entries = [{'Name': 'A }{ B', 'Id': 'X.A', 'Version': '1'}, {'Name': 'C', 'Id': 'X.C', 'Version': '2'}]
+    text = 'Postęp...\r' + ''.join(json.dumps(entry) for entry in entries)
+    assert parse_json_output(text) == entries
+    assert parse_json_output(text, 3) == entries
+
+
+def test_data_wrapper_and_garbage():
+    assert parse_json_output('{"data": [{"Id": "A"}, 5, {"Id": "B"}]}') == [{'Id': 'A'}, {'Id': 'B'}]
+    with pytest.raises(ValueError):
+        parse_json_output('Brak pakietów')
+    assert parse_json_output('') == []
+
+
+def test_incomplete_value_is_not_redecoded_on_every_chunk(monkeypatch):
+    text = json.dumps([{'Id': f'X.{i}', 'Tags': {'a': [i]}} for i in range(2000)])
+    decoder = JsonStreamDecoder()
+    attempts = []
+    decode_buffer = decoder._decode_buffer
+    monkeypatch.setattr(decoder, '_decode_buffer', lambda final: attempts.append(final) or decode_buffer(final))
+    values = []
+    chunks = list(winget_parser.iter_chunks(text, 16))
+    for chunk in chunks:
+        values.extend(decoder.feed(chunk))
+    values.extend(decoder.close())
+    assert values == [json.loads(text)]
+    # Bez ograniczenia każda porcja kończąca się nawiasem dekodowałaby całą tablicę od początku
+    assert sum(chunk.endswith(('}', ']')) for chunk in chunks) > 300
+    assert len(attempts) < 20
+
+
+def test_gc_state_is_restored():
+    import gc
+    assert gc.isenabled()
+    parse_json_output('{"Id": "A"}')
+    assert gc.isenabled()
+    gc.disable()
+    try:
+        parse_json_output('{"Id": "A"}')
+        assert not gc.isenabled()
+    finally:
+        gc.enable()
+
+
+def test_every_corpus_file_has_provenance():
+    with open(os.path.join(CORPUS, 'sources.json'), encoding='utf-8') as f:
+        sources = json.load(f)
+    for name, _ in _corpus():
+        assert sources[name]['source'] in ('captured', 'reconstructed')
+        if sources[name]['source'] == 'captured':
+            assert {'command', 'winget_version', 'culture', 'recorded_at'} <= set(sources[name])
+
+
+def test_record_writes_output_and_provenance(tmp_path, monkeypatch):
+    import shutil
+    import subprocess
+
+    tmp_path = tmp_path / 'winget_corpus'
+    shutil.copytree(CORPUS, tmp_path)
+    with open(os.path.join(CORPUS, 'upgrade_en.txt'), encoding='utf-8', newline='') as f:
+        output = f.read()
+    commands = []
+
+    def powershell(command):
+        commands.append(command)
+        stdout = {'winget --version': 'v1.8.1911\r\n'}.get(command, 'pl-PL / pl-PL\r\n')
+        return subprocess.CompletedProcess(command, 0, output if command.startswith('winget upgrade') else stdout, '')
+
+    monkeypatch.setattr(winget_parser, '_powershell', powershell)
+    entries = winget_parser.record(str(tmp_path), 'upgrade_pc.txt', ['upgrade', '--name', "Bob's App"], True)
+    assert commands[0] == "winget upgrade --name 'Bob''s App'"
+    with open(tmp_path / 'upgrade_pc.txt', encoding='utf-8', newline='') as f:
+        assert f.read() == output
+    sources = json.loads((tmp_path / 'sources.json').read_text(encoding='utf-8'))
+    assert sources['upgrade_pc.txt']['source'] == 'captured'
+    assert sources['upgrade_pc.txt']['winget_version'] == 'v1.8.1911'
+    expected = json.loads((tmp_path / 'expected.json').read_text(encoding='utf-8'))
+    assert expected['upgrade_pc.txt'] == entries == expected['upgrade_en.txt']
+    assert winget_parser.check_corpus(str(tmp_path)) == 0
+
+
+def test_required_captures_need_english_and_localized_recordings(tmp_path, monkeypatch):
+    import shutil
+    import subprocess
+
+    tmp_path = tmp_path / 'winget_corpus'
+    shutil.copytree(CORPUS, tmp_path)
+    sources_path = tmp_path / 'sources.json'
+    sources = json.loads(sources_path.read_text(encoding='utf-8'))
+    sources_path.write_text(json.dumps({name: {'source': 'reconstructed'} for name in sources}), encoding='utf-8')
+    assert winget_parser.check_corpus(str(tmp_path), require_captured=True) == 2
+
+    def recorder(file_name, ui_culture):
+        with open(os.path.join(CORPUS, file_name), encoding='utf-8', newline='') as f:
+            output = f.read()
+
+        def powershell(command):
+            stdout = {'winget --version': 'v1.8.1911'}.get(command, f'pl-PL / {ui_culture}')
+            return subprocess.CompletedProcess(command, 0, output if command.startswith('winget list') else stdout, '')
+        return powershell
+
+    monkeypatch.setattr(winget_parser, '_powershell', recorder('list_en.txt', 'en-US'))
+    winget_parser.record(str(tmp_path), 'list_captured_en.txt', ['list'], True)
+    assert winget_parser.check_corpus(str(tmp_path), require_captured=True) == 1
+    monkeypatch.setattr(winget_parser, '_powershell', recorder('list_pl.txt', 'pl-PL'))
+    winget_parser.record(str(tmp_path), 'list_captured_pl.txt', ['list'], True)
+    assert winget_parser.check_corpus(str(tmp_path), require_captured=True) == 0
@@ -0,0 +1,181 @@
+# Plik: ui_channel.py
+
+"""
+Komunikacja agenta z Pomocnikiem UI przez lokalne gniazdo TCP (agent.exe dołącza ten moduł przy budowaniu).
+
+Moduł nie zależy od Windows, więc obie strony protokołu sprawdzają testy na pętli zwrotnej
+(tests/test_ipc.py) z prawdziwym ui_helper.handle_client.
+"""
+
+import json
+import logging
+import socket
+import struct
+import threading
+import time
+
+# Trwałe połączenie z Pomocnikiem UI: ping po IPC_KEEPALIVE_INTERVAL s ciszy (bez odpowiedzi w IPC_PING_TIMEOUT s
+# połączenie jest zamykane), a pomocnik bez obsługi sesji jest sprawdzany ponownie po IPC_LEGACY_RECHECK s
+IPC_SESSION_PROTOCOL = 2
+IPC_KEEPALIVE_INTERVAL = 30
+IPC_PING_TIMEOUT = 10
+IPC_LEGACY_RECHECK = 600
+
+
+def recv_exact(sock, size):
+    buffer = bytearray(size)
+    view, received = memoryview(buffer), 0
+    while received < size:
+        count = sock.recv_into(view[received:], min(size - received, 65536))
+        if not count:
+            raise ConnectionError("Pomocnik UI zamknął połączenie.")
+        received += count
+    return bytes(buffer)
+
+
+class UiChannel:
+    """
+    Trwałe połączenie z Pomocnikiem UI (protokół 2). Po powitaniu w formacie protokołu 1 (długość + JSON z tokenem)
+    każda ramka ma nagłówek (długość, id żądania): wiele poleceń czeka na odpowiedź naraz, a odpowiedzi przychodzą
+    w kolejności zakończenia. Odbiera je osobny wątek. Ping po keepalive_interval s ciszy wykrywa zerwane
+    połączenie, a następne żądanie łączy się ponownie. Gdy pomocnik nie obsługuje sesji, request() zwraca None.
+    """
+
+    def __init__(self, host, port, token, keepalive_interval=IPC_KEEPALIVE_INTERVAL, ping_timeout=IPC_PING_TIMEOUT,
+                 legacy_recheck=IPC_LEGACY_RECHECK):
+        self.host, self.port, self.token = host, port, token
+        self.keepalive_interval, self.ping_timeout, self.legacy_recheck = keepalive_interval, ping_timeout, legacy_recheck
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._sock, self._pending, self._next_id = None, {}, 0
+        self._legacy_until, self._last_received, self._keepalive_started = 0.0, 0.0, False
+
+    def _connect(self):
+        # Wywoływane pod self._lock. False: pomocnik odpowiada tylko na pojedyncze polecenia (protokół 1).
+        sock = socket.create_connection((self.host, self.port), timeout=10)
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            hello = json.dumps({'type': 'hello', 'protocol': IPC_SESSION_PROTOCOL, 'token': self.token}).encode('utf-8')
+            sock.sendall(struct.pack('>I', len(hello)) + hello)
+            length = struct.unpack('>I', recv_exact(sock, 4))[0]
+            reply = json.loads(recv_exact(sock, length).decode('utf-8'))
+        except Exception:
+            sock.close()
+            raise
+        if reply.get('status') != 'hello':
+            sock.close()
+            self._legacy_until = time.monotonic() + self.legacy_recheck
+            logging.info("Pomocnik UI nie obsługuje trwałego połączenia - polecenia będą wysyłane osobnymi połączeniami.")
+            return False
+        sock.settimeout(None)
+        self._sock, self._last_received = sock, time.monotonic()
+        threading.Thread(target=self._read_loop, args=(sock,), daemon=True).start()
+        if not self._keepalive_started:
+            self._keepalive_started = True
+            threading.Thread(target=self._keepalive_loop, daemon=True).start()
+        logging.info("Nawiązano trwałe połączenie z Pomocnikiem UI.")
+        return True
+
+    def _read_loop(self, sock):
+        try:
+            while True:
+                length, request_id = struct.unpack('>II', recv_exact(sock, 8))
+                payload = recv_exact(sock, length).decode('utf-8')
+                with self._lock:
+                    self._last_received = time.monotonic()
+                    waiter = self._pending.pop(request_id, None)
+                if waiter:
+                    waiter[1] = payload
+                    waiter[0].set()
+        except (OSError, ValueError) as e:
+            self._disconnect(sock, e)
+
+    def _disconnect(self, sock, reason):
+        with self._lock:
+            if self._sock is not sock:
+                return
+            self._sock = None
+            pending, self._pending = self._pending, {}
+        try:
+            sock.close()
+        except OSError:
+            pass
+        logging.warning(f"Połączenie z Pomocnikiem UI zostało przerwane ({reason}). Następne polecenie połączy się ponownie.")
+        for waiter in pending.values():
+            waiter[0].set()
+
+    def _keepalive_loop(self):
+        while True:
+            time.sleep(self.keepalive_interval)
+            with self._lock:
+                sock, idle = self._sock, time.monotonic() - self._last_received
+            if sock is None or idle < self.keepalive_interval:
+                continue
+            if self.request({'type': 'ping'}, self.ping_timeout) == "no_response":
+                self._disconnect(sock, f"brak odpowiedzi na ping w ciągu {self.ping_timeout} s")
+
+    def request(self, request_data, timeout):
+        """Odpowiedź pomocnika (tekst JSON), "no_response" albo None, gdy pomocnik nie obsługuje sesji."""
+        with self._lock:
+            if self._sock is None and (time.monotonic() < self._legacy_until or not self._connect()):
+                return None
+            sock = self._sock
+            self._next_id = self._next_id % 0xFFFFFFFF + 1
+            request_id = self._next_id
+            waiter = self._pending[request_id] = [threading.Event(), None]
+        payload = json.dumps(request_data).encode('utf-8')
+        try:
+            with self._send_lock:
+                sock.sendall(struct.pack('>II', len(payload), request_id) + payload)
+        except OSError as e:
+            self._disconnect(sock, e)
+            return "no_response"
+        if not waiter[0].wait(timeout):
+            with self._lock:
+                self._pending.pop(request_id, None)
+            logging.error("Timeout podczas oczekiwania na odpowiedź od Pomocnika UI.")
+            return "no_response"
+        return waiter[1] if waiter[1] is not None else "no_response"
+
+
+class UiClient:
+    HOST = '127.0.0.1'
+    PORT = 61900
+    _token = ''
+    _channel = None
+
+    @staticmethod
+    def configure_token(token):
+        UiClient._token = token
+        UiClient._channel = UiChannel(UiClient.HOST, UiClient.PORT, token) if token else None
+
+    @staticmethod
+    def send_request(request_data: dict, timeout=3600) -> str:
+        if not UiClient._token:
+            logging.error("Brak tokenu IPC. Komunikacja z UI jest niemożliwa.")
+            return "error"
+        try:
+            response = UiClient._channel.request(request_data, timeout)
+            return response if response is not None else UiClient._send_single(request_data, timeout)
+        except socket.timeout:
+            logging.error("Timeout podczas oczekiwania na odpowiedź od Pomocnika UI.")
+            return "no_response"
+        except ConnectionRefusedError:
+            logging.warning("Odmowa połączenia z Pomocnikiem UI.")
+            return "no_helper"
+        except ConnectionError as e:
+            logging.warning(f"Pomocnik UI zamknął połączenie bez odpowiedzi: {e}")
+            return "no_response"
+        except Exception as e:
+            logging.error(f"Błąd komunikacji z Pomocnikiem UI: {e}", exc_info=True)
+            return "error"
+
+    @staticmethod
+    def _send_single(request_data, timeout):
+        # Protokół 1: jedno polecenie na połączenie (pomocnik UI sprzed wprowadzenia sesji)
+        with socket.create_connection((UiClient.HOST, UiClient.PORT), timeout=timeout) as s:
+            request_bytes = json.dumps({**request_data, 'token': UiClient._token}).encode('utf-8')
+            s.sendall(struct.pack('>I', len(request_bytes)) + request_bytes)
+            length = struct.unpack('>I', recv_exact(s, 4))[0]
+            return recv_exact(s, length).decode('utf-8')
@@ -10,6 +10,7 @@ import struct
 import tempfile
 import ctypes
 import base64
+from concurrent.futures import Future, ThreadPoolExecutor
 
 LOG_DIR = os.path.join(os.environ.get('PROGRAMDATA', 'C:\\ProgramData'), "WingetAgent")
 LOG_FILE = os.path.join(LOG_DIR, "ui_helper.log")
@@ -20,10 +21,28 @@ logging.basicConfig(filename=LOG_FILE, level=logging.INFO, format='%(asctime)s -
 HOST = '127.0.0.1'
 PORT = 61900
 IPC_TOKEN = ''
+# Sesja (protokół 2): jedno trwałe połączenie agenta, ramki z nagłówkiem (długość, id żądania) i odpowiedzi
+# w dowolnej kolejności. Agent wysyła ping co 30 s - sesja bez żadnej ramki przez SESSION_IDLE_TIMEOUT jest zamykana.
+SESSION_PROTOCOL = 2
+SESSION_IDLE_TIMEOUT = 120
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+# Wykonawca poleceń: okna dialogowe (FAST_LANE_WORKERS naraz), polecenia winget pojedynczo jedno po drugim,
+# pozostałe polecenia i planowanie zadań (COMMAND_LANE_WORKERS naraz). Połączeń naraz najwyżej MAX_CONNECTIONS.
+FAST_LANE_WORKERS = 4
+COMMAND_LANE_WORKERS = 2
+MAX_CONNECTIONS = 16
+# Polecenia winget tylko do odczytu - identyczne polecenia oczekujące naraz są wykonywane raz
+READ_ONLY_WINGET_VERBS = {'list', 'ls', 'search', 'find', 'show', 'view', '--version', '-v', '--info'}
+# "winget upgrade" z samymi tymi przełącznikami tylko wypisuje dostępne aktualizacje
+UPGRADE_LISTING_FLAGS = {'--json', '--accept-source-agreements', '--disable-interactivity', '--include-unknown', '-u'}
+# "winget source update" zmienia stan (odświeża pamięć podręczną źródeł), ale jest idempotentne: jego wynik nie
+# zależy od tego, kto je zlecił, a odświeżenie, które właśnie czeka lub trwa, daje źródła co najmniej tak świeże,
+# jak drugie wywołanie. Dlatego identyczne zlecenia też są łączone, choć polecenie nie jest tylko do odczytu.
+IDEMPOTENT_WINGET_SOURCE_VERBS = {'update'}
 
 
 def load_ipc_token():
-    """Wczytuje token z pliku przy starcie."""
+    """Wczytuje token z pliku (przy starcie i gdy agent przedstawi inny token - usługa tworzy nowy przy każdym starcie)."""
     global IPC_TOKEN
     try:
         token_path = os.path.join(os.environ.get('PROGRAMDATA', 'C:\\ProgramData'), "WingetAgent", "ipc.token")
@@ -159,52 +178,219 @@ Remove-Item -Path "{starter_script_path}" -Force -ErrorAction SilentlyContinue
         return json.dumps({"status": "failure", "details": str(e)})
 
 
+def recv_exact(conn, size):
+    """Odbiera dokładnie size bajtów. None, gdy druga strona zamknęła połączenie przed pierwszym bajtem."""
+    buffer = bytearray(size)
+    view, received = memoryview(buffer), 0
+    while received < size:
+        count = conn.recv_into(view[received:], min(size - received, 65536))
+        if not count:
+            if received == 0:
+                return None
+            raise RuntimeError("Połączenie przerwane")
+        received += count
+    return bytes(buffer)
+
+
+def send_frame(conn, payload, request_id=None):
+    # Nagłówek i treść w jednym wywołaniu - osobne sendall opóźniały odpowiedź (algorytm Nagle'a)
+    header = struct.pack('>I', len(payload)) if request_id is None else struct.pack('>II', len(payload), request_id)
+    conn.sendall(header + payload)
+
+
+def verify_token(received_token, addr):
+    if not IPC_TOKEN or received_token != IPC_TOKEN:
+        load_ipc_token()
+    if not IPC_TOKEN:
+        logging.warning("Odrzucono połączenie - token serwera nie jest załadowany.")
+        return False
+    if not received_token or received_token != IPC_TOKEN:
+        logging.error(f"Odrzucono połączenie od {addr} z powodu nieprawidłowego tokenu IPC!")
+        return False
+    return True
+
+
+def dispatch_request(data):
+    """Wykonuje polecenie agenta i zwraca odpowiedź (tekst JSON)."""
+    dialog_type = data.get('type')
+    if dialog_type == 'ping':
+        return json.dumps({"status": "pong"})
+    logging.info(f"Otrzymano polecenie (po weryfikacji tokenu): {data}")
+    if dialog_type in ['request', 'info']:
+        return show_dialog_native(data)
+    elif dialog_type == 'execute_command':
+        return run_command_as_user(data.get('command'))
+    elif dialog_type == 'schedule_task':
+        return schedule_task_as_user(
+            data.get('task_name'),
+            data.get('command'),
+            data.get('trigger_type', 'onlogon')
+        )
+    return json.dumps({"status": "error", "details": f"Nieznany typ polecenia: {dialog_type}"})
+
+
+def is_winget_command(command):
+    parts = (command or '').split(None, 1)
+    return bool(parts) and parts[0].lower() == 'winget'
+
+
+def _winget_args(command):
+    if not is_winget_command(command) or '\n' in command:
+        return []
+    return command.split()[1:]
+
+
+def is_read_only_winget_command(command):
+    """Czy polecenie winget tylko odczytuje stan (lista, wyszukiwanie, wersja) - bez instalacji i zmian."""
+    args = _winget_args(command)
+    if not args:
+        return False
+    verb = args[0].lower()
+    if verb in READ_ONLY_WINGET_VERBS or '--help' in args or '-?' in args:
+        return True
+    if verb == 'source':
+        return len(args) > 1 and args[1].lower() in ('list', 'ls')
+    if verb in ('upgrade', 'update'):
+        return all(arg.lower() in UPGRADE_LISTING_FLAGS for arg in args[1:])
+    return False
+
+
+def can_coalesce_winget_command(command):
+    """Czy identyczne polecenia winget oczekujące naraz mogą współdzielić jedno wykonanie."""
+    if is_read_only_winget_command(command):
+        return True
+    args = [arg.lower() for arg in _winget_args(command)]
+    return len(args) == 2 and args[0] == 'source' and args[1] in IDEMPOTENT_WINGET_SOURCE_VERBS
+
+
+def _dispatch_safely(data):
+    try:
+        return dispatch_request(data)
+    except Exception as e:
+        logging.error(f"Krytyczny błąd podczas obsługi polecenia: {e}", exc_info=True)
+        return json.dumps({"status": "error", "details": str(e)})
+
+
+class RequestScheduler:
+    """
+    Ograniczony wykonawca poleceń agenta z osobnymi torami:
+    - fast: okna dialogowe (ping jest obsługiwany od razu, bez kolejki),
+    - winget: polecenia winget pojedynczo - równoległe wywołania walczyłyby o blokady winget,
+    - commands: pozostałe polecenia PowerShell i planowanie zadań.
+    Identyczne polecenie winget tylko do odczytu (albo idempotentne "source update"), które już czeka lub trwa,
+    nie jest uruchamiane drugi raz - wszyscy oczekujący dostają wynik tego samego wykonania.
+    """
+
+    def __init__(self):
+        self._lanes = {
+            'fast': ThreadPoolExecutor(max_workers=FAST_LANE_WORKERS, thread_name_prefix='ui-fast'),
+            'winget': ThreadPoolExecutor(max_workers=1, thread_name_prefix='ui-winget'),
+            'commands': ThreadPoolExecutor(max_workers=COMMAND_LANE_WORKERS, thread_name_prefix='ui-commands'),
+        }
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.coalesced = 0
+
+    @staticmethod
+    def lane_for(data):
+        dialog_type = data.get('type')
+        if dialog_type in ('request', 'info'):
+            return 'fast'
+        if dialog_type == 'execute_command' and is_winget_command(data.get('command')):
+            return 'winget'
+        return 'commands'
+
+    def submit(self, data):
+        """Zleca polecenie i zwraca Future z odpowiedzią (tekst JSON)."""
+        if data.get('type') == 'ping':
+            future = Future()
+            future.set_result(dispatch_request(data))
+            return future
+        lane = self.lane_for(data)
+        command = data.get('command')
+        if data.get('type') != 'execute_command' or not can_coalesce_winget_command(command):
+            return self._lanes[lane].submit(_dispatch_safely, data)
+        key = ' '.join(command.split())
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                logging.info(f"Polecenie '{key}' już czeka lub trwa - odpowiedź zostanie współdzielona.")
+                return future
+            future = self._lanes[lane].submit(_dispatch_safely, data)
+            self._inflight[key] = future
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+
+REQUEST_SCHEDULER = RequestScheduler()
+
+
+def send_session_response(conn, send_lock, request_id, response_json):
+    try:
+        with send_lock:
+            send_frame(conn, response_json.encode('utf-8'), request_id)
+    except OSError as e:
+        logging.warning(f"Nie udało się wysłać odpowiedzi na polecenie {request_id} - połączenie zamknięte: {e}")
+
+
+def serve_session(conn, addr):
+    """
+    Obsługuje trwałe połączenie agenta: polecenia trafiają do REQUEST_SCHEDULER, a odpowiedzi oznaczone id żądania
+    są wysyłane zaraz po zakończeniu - długie polecenie winget nie blokuje pingów ani okien dialogowych.
+    """
+    conn.settimeout(SESSION_IDLE_TIMEOUT)
+    send_lock = threading.Lock()
+    logging.info(f"Rozpoczęto sesję z agentem {addr}.")
+    try:
+        while True:
+            header = recv_exact(conn, 8)
+            if header is None:
+                break
+            length, request_id = struct.unpack('>II', header)
+            if length > MAX_FRAME_SIZE:
+                logging.error(f"Ramka od {addr} ma {length} bajtów - zamykam sesję.")
+                break
+            data = json.loads(recv_exact(conn, length).decode('utf-8'))
+            future = REQUEST_SCHEDULER.submit(data)
+            future.add_done_callback(
+                lambda done, request_id=request_id: send_session_response(conn, send_lock, request_id, done.result()))
+    except socket.timeout:
+        logging.warning(f"Sesja z agentem {addr} bez aktywności przez {SESSION_IDLE_TIMEOUT} s - zamykam.")
+    except (OSError, RuntimeError) as e:
+        logging.warning(f"Sesja z agentem {addr} przerwana: {e}")
+    logging.info(f"Zakończono sesję z agentem {addr}.")
+
+
 def handle_client(conn, addr):
     logging.info(f"Połączono z {addr} - obsługa w wątku {threading.get_ident()}")
     try:
-        header_bytes = conn.recv(4)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        header_bytes = recv_exact(conn, 4)
         if not header_bytes: return
         msg_len = struct.unpack('>I', header_bytes)[0]
-        chunks, bytes_recd = [], 0
-        while bytes_recd < msg_len:
-            chunk = conn.recv(min(msg_len - bytes_recd, 4096))
-            if not chunk: raise RuntimeError("Połączenie przerwane")
-            chunks.append(chunk)
-            bytes_recd += len(chunk)
-        data = json.loads(b''.join(chunks).decode('utf-8'))
-
-        if not IPC_TOKEN:
-            logging.warning("Odrzucono połączenie - token serwera nie jest załadowany.")
-            conn.close()
+        if msg_len > MAX_FRAME_SIZE:
+            logging.error(f"Ramka od {addr} ma {msg_len} bajtów - odrzucono połączenie.")
             return
+        data = json.loads(recv_exact(conn, msg_len).decode('utf-8'))
 
-        received_token = data.pop('token', None)
-        if not received_token or received_token != IPC_TOKEN:
-            logging.error(f"Odrzucono połączenie od {addr} z powodu nieprawidłowego tokenu IPC!")
-            conn.close()
+        if not verify_token(data.pop('token', None), addr):
             return
 
-        logging.info(f"Otrzymano polecenie (po weryfikacji tokenu): {data}")
-        dialog_type = data.get('type')
-
-        if dialog_type == 'ping':
-            response_json = json.dumps({"status": "pong"})
-        elif dialog_type in ['request', 'info']:
-            response_json = show_dialog_native(data)
-        elif dialog_type == 'execute_command':
-            response_json = run_command_as_user(data.get('command'))
-        elif dialog_type == 'schedule_task':
-            response_json = schedule_task_as_user(
-                data.get('task_name'),
-                data.get('command'),
-                data.get('trigger_type', 'onlogon')
-            )
-        else:
-            response_json = json.dumps({"status": "error", "details": f"Nieznany typ polecenia: {dialog_type}"})
+        if data.get('type') == 'hello' and data.get('protocol') == SESSION_PROTOCOL:
+            send_frame(conn, json.dumps({"status": "hello", "protocol": SESSION_PROTOCOL}).encode('utf-8'))
+            serve_session(conn, addr)
+            return
 
-        response_bytes = response_json.encode('utf-8')
-        conn.sendall(struct.pack('>I', len(response_bytes)))
-        conn.sendall(response_bytes)
+        # Pojedyncze polecenie na połączenie (protokół 1 - agenci sprzed wprowadzenia sesji)
+        response_bytes = REQUEST_SCHEDULER.submit(data).result().encode('utf-8')
+        send_frame(conn, response_bytes)
         logging.info(f"Wysłano odpowiedź do agenta o długości {len(response_bytes)} bajtów.")
 
     except Exception as e:
@@ -214,8 +400,16 @@ def handle_client(conn, addr):
         logging.info(f"Zakończono obsługę klienta dla {addr}, wątek {threading.get_ident()} zakończony.")
 
 
+def serve_connection(conn, addr, connection_slots):
+    try:
+        handle_client(conn, addr)
+    finally:
+        connection_slots.release()
+
+
 def main():
     load_ipc_token()
+    connection_slots = threading.BoundedSemaphore(MAX_CONNECTIONS)
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         try:
             s.bind((HOST, PORT))
@@ -227,7 +421,11 @@ def main():
         while True:
             try:
                 conn, addr = s.accept()
-                threading.Thread(target=handle_client, args=(conn, addr), daemon=True).start()
+                if not connection_slots.acquire(blocking=False):
+                    logging.warning(f"Odrzucono połączenie od {addr} - osiągnięto limit {MAX_CONNECTIONS} połączeń.")
+                    conn.close()
+                    continue
+                threading.Thread(target=serve_connection, args=(conn, addr, connection_slots), daemon=True).start()
             except Exception as e:
                 logging.error(f"Błąd w głównej pętli serwera UI: {e}", exc_info=True)
 
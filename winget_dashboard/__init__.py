@@ -1,6 +1,7 @@
 # winget_dashboard/__init__.py
 import os
 from flask import Flask, render_template
+from markupsafe import Markup, escape
 from datetime import datetime
 from zoneinfo import ZoneInfo
 import logging
@@ -9,11 +10,14 @@ import sqlite3
 
 def create_app(test_config=None):
     """Tworzy i konfiguruje instancję aplikacji Flask."""
-    app = Flask(__name__, instance_relative_config=True)
+    test_config = test_config or {}
+    # Testy podają własny folder 'instance', aby log i pliki robocze nie trafiały do repozytorium
+    app = Flask(__name__, instance_relative_config=True, instance_path=test_config.get('INSTANCE_PATH'))
 
     # Załaduj konfigurację
     from . import config
     app.config.from_object(config.Config)
+    app.config.from_mapping(test_config)
 
     # Upewnij się, że folder 'instance' istnieje
     # TO MUSI BYĆ PRZED KONFIGURACJĄ LOGOWANIA, KTÓRE UŻYWA TEGO FOLDERU
@@ -49,6 +53,50 @@ def create_app(test_config=None):
     from . import db
     db.init_app(app)
 
+    # Kompresja treści żądań (gzip/deflate) i odpowiedzi (gzip)
+    from . import compression
+    compression.init_app(app)
+
+    # Słownik pakietów i wersji (identyfikatory liczbowe w applications/updates)
+    from . import catalog
+    catalog.init_app(app)
+
+    # Strumień zdarzeń (SSE) dla panelu
+    from . import events
+    events.init_app(app)
+
+    # Wersje zasobów dla zapytań warunkowych (ETag / If-None-Match)
+    from . import conditional
+    conditional.init_app(app)
+
+    # Kolejka zapisu raportów w tle
+    from . import ingest
+    ingest.init_app(app)
+
+    # Śledzenie obecności agentów (heartbeaty w pamięci, zapis do bazy w paczkach)
+    from . import presence
+    presence.init_app(app)
+
+    # Skompilowane czarne listy aplikacji (polecenie blacklist-benchmark)
+    from . import blacklist
+    blacklist.init_app(app)
+
+    # Retencja i archiwizacja historii raportów
+    from . import retention
+    retention.init_app(app)
+
+    # Powiadamianie oczekujących agentów (long-poll) o nowych zadaniach
+    from . import task_notify
+    task_notify.init_app(app)
+
+    # Zwalnianie wygasłych dzierżaw zadań
+    from . import task_leases
+    task_leases.init_app(app)
+
+    # Pamięć podręczna przeglądu floty (unieważniana zdarzeniami zapisu)
+    from . import overview
+    overview.init_app(app)
+
     # Rejestracja Blueprintów (modułów z trasami)
     from . import views
     app.register_blueprint(views.bp)
@@ -69,6 +117,12 @@ def create_app(test_config=None):
         except (ValueError, TypeError):
             return utc_str
 
+    @app.template_filter('highlight_matches')
+    def highlight_matches_filter(text):
+        from .db import HIGHLIGHT_START, HIGHLIGHT_END
+        escaped = str(escape(text or ''))
+        return Markup(escaped.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>'))
+
     @app.context_processor
     def inject_year():
         return {'current_year': datetime.now(ZoneInfo("UTC")).year}
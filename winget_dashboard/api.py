@@ -1,14 +1,32 @@
 # winget-dashboard_new/winget_dashboard/api.py
 
-from flask import Blueprint, request, jsonify, abort, current_app, url_for, send_from_directory, flash
+from flask import (Blueprint, request, jsonify, abort, current_app, url_for, send_from_directory, flash,
+                   Response)
 from functools import wraps
-from .db import DatabaseManager
+from .blacklist import get_computer_blacklist_rules, get_default_blacklist, parse_blacklist
+from .catalog import get_package_catalog
+from .conditional import conditional_json, get_resource_versions, not_modified, with_etag
+from .db import DatabaseManager, close_db
+from .events import get_event_bus
+from .ingest import get_ingest_queue
+from .inventory import InventoryDeltaError, validate_delta
+from .overview import get_fleet_overview
+from .presence import get_presence_tracker
+from .task_notify import get_task_notifier
 from .services import AgentVersionService
 import os
+import re
 import json
 
 bp = Blueprint('api', __name__, url_prefix='/api')
 
+# ETag pustej listy zadań agenta: tasks-<computer_id>-<start serwera>-<licznik zadań komputera>
+TASKS_ETAG_RE = re.compile(r'^tasks-(\d+)-(\d+)-(\d+)$')
+
+# Polecenia, które można zlecić zbiorczo przez /api/tasks/bulk
+BULK_TASK_COMMANDS = ('request_update', 'force_update', 'request_uninstall', 'force_uninstall',
+                      'request_os_update', 'force_os_update', 'force_report', 'self_update')
+
 
 def require_api_key(f):
     @wraps(f)
@@ -27,36 +45,121 @@ def receive_report():
     data = request.get_json()
     if not data or 'hostname' not in data:
         return "Bad Request", 400
-    db_manager = DatabaseManager()
-    computer_id = db_manager.save_report(data)
-
-    if computer_id:
-        db_manager.cleanup_scheduled_tasks(computer_id)
-
-    if computer_id:
-        apps_still_needing_update = {
-            update['id'] for update in data.get('available_app_updates', [])
-        }
-        active_update_tasks = db_manager.get_active_tasks_for_computer(computer_id, command_filter='update')
-        tasks_to_remove = []
-        for task in active_update_tasks:
-            if task['payload'] not in apps_still_needing_update:
-                tasks_to_remove.append(task['id'])
-        if tasks_to_remove:
-            db_manager.delete_tasks(tasks_to_remove)
-            current_app.logger.info(
-                f"Wyczyszczono {len(tasks_to_remove)} nieaktualnych zadań aktualizacji dla komputera ID {computer_id}.")
-        return "Report received and tasks cleaned successfully", 200
-    else:
-        return "Internal Server Error", 500
+    if 'inventory_delta' in data:
+        # Raport różnicowy: zamiast installed_apps zawiera zmiany względem inwentarza o skrócie base.
+        # Serwer od razu odtwarza pełną listę i sprawdza jej skrót - przy niezgodności agent dostaje 409
+        # i wysyła pełną listę. Do kolejki zapisu trafia już zwykły raport z installed_apps.
+        error = validate_delta(data['inventory_delta'])
+        if error:
+            return jsonify({"status": "error", "message": error}), 400
+        try:
+            installed_apps = DatabaseManager().resolve_inventory_delta(data['hostname'], data['inventory_delta'])
+        except InventoryDeltaError as e:
+            return jsonify({"status": "resync_needed", "message": str(e)}), 409
+        data = {**{key: value for key, value in data.items() if key != 'inventory_delta'},
+                'installed_apps': installed_apps}
+    if not get_ingest_queue().submit(data):
+        return "Report queue is full, retry later", 503, {'Retry-After': '30'}
+    return "Report accepted", 202
+
+
+@bp.route('/ingest/stats', methods=['GET'])
+@require_api_key
+def ingest_stats():
+    return jsonify({**get_ingest_queue().stats(), 'catalog': get_package_catalog().stats()})
 
 
 @bp.route('/tasks/<hostname>', methods=['GET'])
 @require_api_key
 def get_tasks(hostname):
+    """
+    Zwraca oczekujące zadania komputera. Z parametrem ?wait=N (long-poll) przy braku zadań
+    wstrzymuje odpowiedź do pojawienia się nowego zadania, najdłużej N sekund (max TASK_LONG_POLL_TIMEOUT).
+    Pusta odpowiedź ma ETag z licznika zadań komputera - agent odsyła go w If-None-Match i dopóki
+    nie pojawi się nowe zadanie, dostaje 304 bez zapytania do bazy.
+    """
+    wait = min(max(request.args.get('wait', 0, type=float), 0), current_app.config['TASK_LONG_POLL_TIMEOUT'])
+    notifier = get_task_notifier()
+    computer_id, seen_version = _fresh_tasks_validator(notifier)
+    if computer_id is None:
+        db_manager = DatabaseManager()
+        computer_id = db_manager.get_computer_id(hostname)
+        if computer_id is None:
+            return jsonify([])
+        seen_version = notifier.version(computer_id)
+        tasks = db_manager.get_pending_tasks(hostname)
+        if tasks:
+            return jsonify(tasks)
+    # Połączenie wraca do puli na czas oczekiwania, aby long-poll nie blokował bazy innym zapytaniom
+    close_db()
+    if not wait or not notifier.wait(computer_id, seen_version, wait):
+        etag = _tasks_etag(computer_id, seen_version)
+        return not_modified(etag) or with_etag(jsonify([]), etag)
+    seen_version = notifier.version(computer_id)
+    tasks = DatabaseManager().get_pending_tasks(hostname)
+    return jsonify(tasks) if tasks else with_etag(jsonify([]), _tasks_etag(computer_id, seen_version))
+
+
+def _tasks_etag(computer_id, version):
+    return f"tasks-{computer_id}-{get_resource_versions().epoch}-{version}"
+
+
+def _fresh_tasks_validator(notifier):
+    """
+    Zwraca (computer_id, wersja) z ETagu w If-None-Match, jeśli od jego wydania nie pojawiło się
+    żadne nowe zadanie dla komputera, w przeciwnym razie (None, None).
+    """
+    epoch = get_resource_versions().epoch
+    for etag in request.if_none_match.as_set(include_weak=True):
+        match = TASKS_ETAG_RE.match(etag)
+        if match and int(match.group(2)) == epoch:
+            computer_id, version = int(match.group(1)), int(match.group(3))
+            if notifier.version(computer_id) == version:
+                return computer_id, version
+    return None, None
+
+
+@bp.route('/tasks/bulk', methods=['POST'])
+@require_api_key
+def create_bulk_tasks():
+    """
+    Zleca jedno polecenie wielu komputerom naraz. Body: {"command": ..., "payload": ..., "selector": {...}}.
+    Dla self_update payload jest budowany przez serwer, a dla selektora pending_update domyślnym payloadem jest app_id.
+    """
+    data = request.get_json(silent=True) or {}
+    command, selector = data.get('command'), data.get('selector')
+    if command not in BULK_TASK_COMMANDS or not isinstance(selector, dict):
+        return jsonify({"status": "error", "message": "Wymagane pola: command (dozwolone polecenie) i selector."}), 400
+    payload = data.get('payload')
+    if command == 'self_update':
+        payload = {'download_path': url_for('api.download_latest_agent'),
+                   'target_version': AgentVersionService().get_server_agent_version()}
+    elif payload is None and command in ('force_report', 'request_os_update', 'force_os_update'):
+        payload = '{}' if command == 'force_report' else 'os_update'
+    elif payload is None and selector.get('type') == 'pending_update':
+        payload = selector.get('app_id')
+    if payload is None:
+        return jsonify({"status": "error", "message": "Brak payloadu dla polecenia."}), 400
     db_manager = DatabaseManager()
-    tasks = db_manager.get_pending_tasks(hostname)
-    return jsonify(tasks)
+    try:
+        computer_ids = db_manager.select_computers(selector)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    if not computer_ids:
+        return jsonify({"status": "warning", "message": "Żaden komputer nie pasuje do selektora.", "count": 0})
+    batch_id = db_manager.create_task_batch(command, payload, computer_ids, selector)
+    return jsonify({"status": "success", "message": f"Zlecono {command} dla {len(computer_ids)} komputerów.",
+                    "batch_id": batch_id, "count": len(computer_ids),
+                    "progress_url": url_for('api.task_batch_status', batch_id=batch_id)}), 201
+
+
+@bp.route('/tasks/batch/<int:batch_id>', methods=['GET'])
+@require_api_key
+def task_batch_status(batch_id):
+    batch = DatabaseManager().get_task_batch(batch_id)
+    if not batch:
+        return jsonify({"status": "not_found"}), 404
+    return jsonify(batch)
 
 
 @bp.route('/tasks/result', methods=['POST'])
@@ -79,22 +182,18 @@ def agent_heartbeat():
     if not data or 'hostname' not in data:
         return "Bad Request", 400
 
-    db_manager = DatabaseManager()
-    db_manager.update_computer_status_from_heartbeat(data)
+    get_presence_tracker().heartbeat(data)
     return "Heartbeat received", 200
 
 
 @bp.route('/settings/blacklist/<hostname>', methods=['GET'])
 @require_api_key
 def get_blacklist(hostname):
-    db_manager = DatabaseManager()
-    keywords_str = db_manager.get_computer_blacklist(hostname)
-    if not keywords_str:
-        default_keywords_raw = current_app.config['DEFAULT_BLACKLIST_KEYWORDS']
-        keywords_list = [line.strip() for line in default_keywords_raw.strip().split('\n') if line.strip()]
-    else:
-        keywords_list = [k.strip() for k in keywords_str.split(',') if k.strip()]
-    return jsonify(keywords_list)
+    def build():
+        rules = get_computer_blacklist_rules(DatabaseManager().get_computer_blacklist(hostname))
+        return rules or get_default_blacklist()
+
+    return conditional_json(get_resource_versions().etag('blacklist', hostname.lower()), build)
 
 
 @bp.route('/computer/<int:computer_id>/refresh', methods=['POST'])
@@ -121,9 +220,8 @@ def trigger_report(hostname):
 @bp.route('/computer/<int:computer_id>/tasks', methods=['GET'])
 @require_api_key
 def get_computer_tasks(computer_id):
-    db_manager = DatabaseManager()
-    tasks = db_manager.get_computer_tasks(computer_id)
-    return jsonify(tasks)
+    return conditional_json(get_resource_versions().etag('computer_tasks', computer_id),
+                            lambda: DatabaseManager().get_computer_tasks(computer_id))
 
 
 @bp.route('/computer/<int:computer_id>/update', methods=['POST'])
@@ -182,24 +280,15 @@ def request_update_all(computer_id):
     if not updates:
         return jsonify({"status": "no_updates", "message": "Brak oczekujących aktualizacji do zlecenia."})
 
-    tasks_created_count = 0
+    tasks = []
     os_update_created = False
     for update in updates:
         if update['update_type'] == 'APP':
-            db_manager.create_task(
-                computer_id=computer_id,
-                command='request_update',
-                payload=update['app_id']
-            )
-            tasks_created_count += 1
+            tasks.append((computer_id, 'request_update', update['app_id']))
         elif update['update_type'] == 'OS' and not os_update_created:
-            db_manager.create_task(
-                computer_id=computer_id,
-                command='request_os_update',
-                payload='os_update'
-            )
-            tasks_created_count += 1
+            tasks.append((computer_id, 'request_os_update', 'os_update'))
             os_update_created = True
+    tasks_created_count = db_manager.create_tasks(tasks)
 
     return jsonify({"status": "success", "message": f"Zlecono {tasks_created_count} zadań aktualizacji.",
                     "count": tasks_created_count})
@@ -210,7 +299,7 @@ def request_update_all(computer_id):
 def update_blacklist(computer_id):
     data = request.get_json()
     new_blacklist_raw = data.get('blacklist_keywords', '')
-    keywords = [k.strip() for k in new_blacklist_raw.split(',') if k.strip()]
+    keywords = parse_blacklist(new_blacklist_raw)
     clean_blacklist_str = ", ".join(keywords)
     db_manager = DatabaseManager()
     computer_details = db_manager.get_computer_details_by_id(computer_id)
@@ -232,6 +321,77 @@ def task_status(task_id):
         return jsonify({"status": "not_found"}), 404
 
 
+@bp.route('/packages', methods=['GET'])
+@require_api_key
+def search_packages():
+    app_id = request.args.get('app_id', '').strip()
+    if not app_id:
+        return jsonify({"status": "error", "message": "Parametr app_id jest wymagany."}), 400
+    try:
+        limit = int(request.args.get('limit', current_app.config['FLEET_SEARCH_PAGE_SIZE']))
+    except ValueError:
+        return jsonify({"status": "error", "message": "Nieprawidłowa wartość limit."}), 400
+    limit = max(1, min(limit, current_app.config['FLEET_SEARCH_MAX_PAGE_SIZE']))
+    db_manager = DatabaseManager()
+    result = db_manager.search_fleet_packages(
+        app_id, older_than=request.args.get('older_than'), pending_only=request.args.get('pending') == '1',
+        after=request.args.get('after'), limit=limit)
+    return jsonify({"items": [dict(row) for row in result['items']], "next": result['next']})
+
+
+@bp.route('/computers', methods=['GET'])
+@require_api_key
+def list_computers():
+    """
+    Przegląd floty stronami (np. do wirtualnego przewijania): ?status=&q=&sort=&order=desc&after=&limit=.
+    Kolejną stronę pobiera się z kursorem z pola 'next'.
+    """
+    try:
+        limit = int(request.args.get('limit', current_app.config['OVERVIEW_PAGE_SIZE']))
+    except ValueError:
+        return jsonify({"status": "error", "message": "Nieprawidłowa wartość limit."}), 400
+    limit = max(1, min(limit, current_app.config['OVERVIEW_MAX_PAGE_SIZE']))
+    overview = get_fleet_overview()
+    page = overview.get_page(status=request.args.get('status'), search=request.args.get('q'),
+                             sort=request.args.get('sort', 'hostname'), descending=request.args.get('order') == 'desc',
+                             after=request.args.get('after'), limit=limit)
+    presence = get_presence_tracker()
+    items = [presence.apply(dict(computer)) for computer in page['items']]
+    return jsonify({"items": items, "next": page['next'], "summary": overview.get_summary()})
+
+
+@bp.route('/task_statuses', methods=['GET'])
+@require_api_key
+def tasks_status():
+    """Stan wielu zadań jednym zapytaniem: ?ids=1,2,3. Zapasowa ścieżka dla klientów bez strumienia zdarzeń."""
+    try:
+        task_ids = sorted({int(task_id) for task_id in request.args.get('ids', '').split(',') if task_id.strip()})
+    except ValueError:
+        return jsonify({"status": "error", "message": "Parametr ids musi być listą liczb."}), 400
+    statuses = DatabaseManager().get_tasks_status(task_ids[:500])
+    return jsonify({str(task_id): task for task_id, task in statuses.items()})
+
+
+@bp.route('/events', methods=['GET'])
+@require_api_key
+def event_stream():
+    """
+    Strumień SSE ze zdarzeniami task, tasks_changed, batch, report, presence, computer_removed, blacklist
+    i resync.
+    Kursor to identyfikator ostatniego odebranego zdarzenia (nagłówek Last-Event-ID lub ?cursor=).
+    """
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('cursor')
+    try:
+        cursor = int(cursor) if cursor else None
+    except ValueError:
+        cursor = None
+    stream = get_event_bus().open_stream(cursor)
+    if stream is None:
+        return "Too many event streams", 503, {'Retry-After': '30'}
+    return Response(stream, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 @bp.route('/agent/download/latest', methods=['GET'])
 def download_latest_agent():
     builds_dir = os.path.join(current_app.root_path, '..', 'agent_builds')
@@ -244,6 +404,10 @@ def download_latest_agent():
 def get_latest_agent_info():
     try:
         version_service = AgentVersionService()
+        etag = f"agent-{version_service.get_build_fingerprint()}"
+        cached = not_modified(etag)
+        if cached:
+            return cached
         server_info = version_service.get_server_agent_info()
 
         if not server_info.get('file_exists'):
@@ -251,10 +415,10 @@ def get_latest_agent_info():
 
         download_path = url_for('api.download_latest_agent')
 
-        return jsonify({
+        return with_etag(jsonify({
             "latest_version": server_info.get('version'),
             "download_path": download_path
-        })
+        }), etag)
     except Exception as e:
         current_app.logger.error(f"Błąd podczas pobierania info o agencie: {e}")
         return jsonify({"error": "Internal server error"}), 500
@@ -320,18 +484,14 @@ def deploy_update_to_all():
     download_path = url_for('api.download_latest_agent')
     payload = {'download_path': download_path, 'target_version': target_version}
 
-    tasks_created_count = 0
-    for computer in computers:
-        db_manager.create_task(
-            computer_id=computer['id'],
-            command='self_update',
-            payload=payload
-        )
-        tasks_created_count += 1
+    selector = {'type': 'all'}
+    computer_ids = [computer['id'] for computer in computers]
+    batch_id = db_manager.create_task_batch('self_update', payload, computer_ids, selector)
+    tasks_created_count = len(computer_ids)
 
     message = f"Pomyślnie zlecono zadanie aktualizacji do wersji {target_version} dla {tasks_created_count} komputerów."
     current_app.logger.info(message)
-    return jsonify({"status": "success", "message": message, "count": tasks_created_count})
+    return jsonify({"status": "success", "message": message, "count": tasks_created_count, "batch_id": batch_id})
 
 
 @bp.route('/computer/<int:computer_id>', methods=['DELETE'])
@@ -343,5 +503,6 @@ def delete_computer(computer_id):
         return jsonify({"status": "error", "message": "Nie znaleziono komputera"}), 404
 
     db_manager.delete_computer(computer_id)
+    get_presence_tracker().forget(computer['computer']['hostname'])
     flash(f"Pomyślnie usunięto komputer '{computer['computer']['hostname']}'.", 'success')
     return jsonify({"status": "success", "message": "Komputer usunięty pomyślnie"})
\ No newline at end of file
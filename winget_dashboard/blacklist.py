@@ -0,0 +1,85 @@
+# winget-dashboard_new/winget_dashboard/blacklist.py
+
+import random
+import re
+import string
+import time
+from functools import lru_cache
+import click
+from blacklist_matcher import BlacklistMatcher
+from flask import current_app
+from flask.cli import with_appcontext
+
+
+def parse_blacklist(text):
+    """Dzieli czarną listę zapisaną w bazie (po przecinkach) lub w konfiguracji (po liniach) na reguły."""
+    if not text:
+        return []
+    return [rule.strip() for rule in re.split(r'[,\n]', text) if rule.strip()]
+
+
+@lru_cache(maxsize=512)
+def _compile(rules):
+    return BlacklistMatcher(rules)
+
+
+def get_matcher(rules):
+    """Zwraca skompilowaną czarną listę. Każda wersja listy jest kompilowana raz i trzymana w pamięci."""
+    return _compile(tuple(rules))
+
+
+@lru_cache(maxsize=16)
+def _parse_cached(text):
+    return tuple(parse_blacklist(text))
+
+
+def get_default_blacklist():
+    """Domyślna czarna lista z DEFAULT_BLACKLIST_KEYWORDS (parsowana raz dla danej treści)."""
+    return list(_parse_cached(current_app.config['DEFAULT_BLACKLIST_KEYWORDS']))
+
+
+def get_computer_blacklist_rules(stored):
+    """Reguły czarnej listy komputera zapisanej w bazie (parsowane raz dla danej treści)."""
+    return list(_parse_cached(stored)) if stored else []
+
+
+def _random_word(rng, length):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+@click.command('blacklist-benchmark')
+@click.option('--apps', 'app_count', default=5000, help='Liczba aplikacji na liście.')
+@click.option('--rules', 'rule_count', default=200, help='Liczba reguł czarnej listy.')
+@click.option('--rounds', default=5, help='Liczba powtórzeń pomiaru.')
+@with_appcontext
+def blacklist_benchmark_command(app_count, rule_count, rounds):
+    """Porównuje filtrowanie listy aplikacji skompilowaną czarną listą z dotychczasowym any(... in ...)."""
+    rng = random.Random(42)
+    rules = get_default_blacklist() + [_random_word(rng, rng.randint(4, 9)) for _ in range(rule_count)]
+    apps = [{'name': f"{_random_word(rng, 6).title()} {_random_word(rng, 8)}", 'id': f"{_random_word(rng, 5)}.{_random_word(rng, 7)}"}
+            for _ in range(app_count)]
+
+    def naive():
+        return [app for app in apps if not any(keyword.lower() in app['name'].lower() for keyword in rules)]
+
+    def compiled():
+        return get_matcher(rules).filter(apps)
+
+    started = time.perf_counter()
+    _compile.cache_clear()
+    get_matcher(rules)
+    compile_ms = (time.perf_counter() - started) * 1000
+    if [app['id'] for app in naive()] != [app['id'] for app in compiled()]:
+        raise click.ClickException("Wyniki filtrowania różnią się - dopasowanie nie jest zgodne z dotychczasowym.")
+    for label, func in (('any(... in ...)', naive), ('BlacklistMatcher', compiled)):
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        click.echo(f"{label:>18}: najlepszy {min(timings):8.2f} ms, średni {sum(timings) / len(timings):8.2f} ms")
+    click.echo(f"Kompilacja czarnej listy ({len(rules)} reguł): {compile_ms:.2f} ms, aplikacji: {len(apps)}")
+
+
+def init_app(app):
+    app.cli.add_command(blacklist_benchmark_command)
@@ -0,0 +1,94 @@
+# winget-dashboard_new/winget_dashboard/catalog.py
+
+import threading
+from collections import OrderedDict
+from flask import current_app
+
+
+def _text(value):
+    # Wartości trafiają do kolumn TEXT - numer wersji wysłany jako liczba jest tym samym wpisem co tekst.
+    return None if value is None else str(value)
+
+
+class PackageCatalog:
+    """
+    Słownik pakietów (app_id, nazwa) i wersji, do którego odwołują się wiersze applications i updates
+    przez identyfikatory liczbowe. Identyfikatory używane przy zapisie raportów są trzymane w pamięci
+    procesu (LRU), więc typowy raport nie odpytuje słownika wcale.
+    Wpisy słownika nigdy nie są usuwane. Identyfikator wstawiony w transakcji, która została wycofana,
+    mógłby jednak zostać w pamięci - dlatego każde wycofanie zapisu raportu wywołuje clear().
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._packages = OrderedDict()
+        self._versions = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def _cached(self, cache, key):
+        with self._lock:
+            entry_id = cache.get(key)
+            if entry_id is None:
+                self._misses += 1
+                return None
+            cache.move_to_end(key)
+            self._hits += 1
+            return entry_id
+
+    def _remember(self, cache, key, entry_id):
+        with self._lock:
+            cache[key] = entry_id
+            cache.move_to_end(key)
+            while len(cache) > self.max_entries:
+                cache.popitem(last=False)
+
+    def package_id(self, db, app_id, name):
+        """ID pakietu (app_id, nazwa) - ze słownika albo nowo dopisany (bez commita)."""
+        key = (_text(app_id), _text(name))
+        package_id = self._cached(self._packages, key)
+        if package_id is None:
+            row = db.execute("SELECT id FROM packages WHERE app_id IS ? AND name = ?", key).fetchone()
+            package_id = row[0] if row else db.execute(
+                "INSERT INTO packages (app_id, name) VALUES (?, ?)", key).lastrowid
+            self._remember(self._packages, key, package_id)
+        return package_id
+
+    def version_id(self, db, version):
+        """ID wersji ze słownika albo nowo dopisanej (bez commita). Brak wersji to None."""
+        version = _text(version)
+        if version is None:
+            return None
+        version_id = self._cached(self._versions, version)
+        if version_id is None:
+            row = db.execute("SELECT id FROM package_versions WHERE version = ?", (version,)).fetchone()
+            version_id = row[0] if row else db.execute(
+                "INSERT INTO package_versions (version) VALUES (?)", (version,)).lastrowid
+            self._remember(self._versions, version, version_id)
+        return version_id
+
+    def clear(self):
+        with self._lock:
+            self._packages.clear()
+            self._versions.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'packages': len(self._packages), 'versions': len(self._versions),
+                    'hits': self._hits, 'misses': self._misses, 'max_entries': self.max_entries}
+
+
+def get_package_catalog():
+    return current_app.extensions['package_catalog']
+
+
+def clear_package_catalog():
+    """Czyści pamięć identyfikatorów (po wycofaniu transakcji albo po odtworzeniu bazy)."""
+    catalog = current_app.extensions.get('package_catalog')
+    if catalog:
+        catalog.clear()
+
+
+def init_app(app):
+    app.extensions['package_catalog'] = PackageCatalog(app.config['CATALOG_CACHE_MAX_ENTRIES'])
@@ -0,0 +1,106 @@
+# winget-dashboard_new/winget_dashboard/compression.py
+
+import gzip
+import json
+import logging
+import zlib
+from io import BytesIO
+from flask import current_app, request
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import get_input_stream
+
+# Typy odpowiedzi kompresowane przez serwer. Strumień zdarzeń (text/event-stream) i pliki wysyłane
+# bezpośrednio (agent.exe) nie są kompresowane.
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/plain', 'text/css', 'text/javascript',
+                          'application/javascript'}
+# Kodowania treści żądań -> parametr wbits dla zlib ("deflate" w HTTP to format zlib).
+REQUEST_ENCODINGS = {'gzip': 16 + zlib.MAX_WBITS, 'x-gzip': 16 + zlib.MAX_WBITS, 'deflate': zlib.MAX_WBITS}
+_READ_CHUNK_SIZE = 64 * 1024
+
+
+class _DecompressedTooLarge(Exception):
+    pass
+
+
+def _json_error(status, message):
+    return Response(json.dumps({'error': message}), status=status, mimetype='application/json')
+
+
+class RequestDecompressionMiddleware:
+    """
+    Middleware WSGI rozpakowujące treść żądań z nagłówkiem Content-Encoding: gzip lub deflate, zanim
+    Flask ją odczyta - widoki dostają zwykły JSON. Rozpakowywanie idzie porcjami i kończy się, gdy
+    wynik przekroczy max_size bajtów (ochrona przed "bombą" dekompresyjną): takie żądanie dostaje 413,
+    uszkodzone dane 400, a nieobsługiwane kodowanie 415.
+    """
+
+    def __init__(self, wsgi_app, max_size):
+        self.wsgi_app = wsgi_app
+        self.max_size = max_size
+
+    def __call__(self, environ, start_response):
+        encoding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if not encoding or encoding == 'identity':
+            return self.wsgi_app(environ, start_response)
+        if encoding not in REQUEST_ENCODINGS:
+            return _json_error(415, f"Nieobsługiwane kodowanie treści żądania: {encoding}.")(environ, start_response)
+        try:
+            body = self._decompress(get_input_stream(environ), REQUEST_ENCODINGS[encoding])
+        except _DecompressedTooLarge:
+            logging.warning(f"Odrzucono żądanie {environ.get('PATH_INFO')} - treść po rozpakowaniu przekracza "
+                            f"{self.max_size} bajtów.")
+            return _json_error(413, "Treść żądania po rozpakowaniu jest zbyt duża.")(environ, start_response)
+        except zlib.error:
+            return _json_error(400, "Nie udało się rozpakować treści żądania.")(environ, start_response)
+        environ['wsgi.input'] = BytesIO(body)
+        environ['CONTENT_LENGTH'] = str(len(body))
+        environ.pop('HTTP_CONTENT_ENCODING', None)
+        environ.pop('HTTP_TRANSFER_ENCODING', None)
+        return self.wsgi_app(environ, start_response)
+
+    def _decompress(self, stream, wbits):
+        decompressor = zlib.decompressobj(wbits)
+        parts, size = [], 0
+        while not decompressor.eof:
+            chunk = stream.read(_READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            while chunk:
+                # max_length ogranicza pamięć zajętą przez jedną porcję - reszta czeka w unconsumed_tail
+                data = decompressor.decompress(chunk, self.max_size - size + 1)
+                size += len(data)
+                if size > self.max_size:
+                    raise _DecompressedTooLarge()
+                parts.append(data)
+                chunk = decompressor.unconsumed_tail
+        if not decompressor.eof:
+            raise zlib.error("Niekompletny strumień skompresowanych danych.")
+        return b''.join(parts)
+
+
+def compress_response(response):
+    """
+    Kompresuje gzipem odpowiedzi tekstowe większe niż COMPRESSION_MIN_SIZE, jeśli klient to akceptuje.
+    Silny ETag staje się słaby - treść zależy od kodowania, a If-None-Match i tak porównuje się słabo.
+    """
+    if (response.status_code < 200 or response.status_code in (204, 206, 304) or request.method == 'HEAD'
+            or response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    if not request.accept_encodings['gzip']:
+        return response
+    data = response.get_data()
+    if len(data) < current_app.config['COMPRESSION_MIN_SIZE']:
+        return response
+    response.set_data(gzip.compress(data, current_app.config['COMPRESSION_LEVEL'], mtime=0))
+    response.headers['Content-Encoding'] = 'gzip'
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    app.wsgi_app = RequestDecompressionMiddleware(app.wsgi_app, app.config['MAX_DECOMPRESSED_REQUEST_SIZE'])
+    app.after_request(compress_response)
@@ -0,0 +1,84 @@
+# winget-dashboard_new/winget_dashboard/conditional.py
+
+import threading
+import time
+from flask import current_app, request, jsonify
+
+# Typy zdarzeń EventBus, po których zmienia się lista zadań komputera widoczna w panelu.
+_TASK_EVENTS = ('task', 'tasks_changed', 'report', 'computer_removed')
+
+
+class ResourceVersions:
+    """
+    Liczniki wersji zasobów odczytywanych wielokrotnie bez zmian (czarna lista komputera, lista zadań
+    komputera w panelu). Z licznika powstaje ETag, więc na żądanie z pasującym If-None-Match
+    serwer odpowiada 304 bez zapytania do bazy. Liczniki żyją w pamięci procesu - znacznik startu
+    w ETagu sprawia, że walidatory sprzed restartu serwera nigdy nie pasują.
+    """
+
+    def __init__(self):
+        self.epoch = int(time.time() * 1000)
+        self._lock = threading.Lock()
+        self._versions = {}
+
+    def bump(self, scope, key):
+        with self._lock:
+            self._versions[(scope, key)] = self._versions.get((scope, key), 0) + 1
+
+    def etag(self, scope, key):
+        with self._lock:
+            version = self._versions.get((scope, key), 0)
+        return f"{scope}-{key}-{self.epoch}-{version}"
+
+    def on_event(self, event_type, data):
+        """Subskrypcja EventBus: podbija wersje zasobów zmienionych przez zdarzenie."""
+        if event_type in _TASK_EVENTS and data.get('computer_id') is not None:
+            self.bump('computer_tasks', data['computer_id'])
+        if event_type == 'computer_removed' and data.get('hostname'):
+            self.bump('blacklist', data['hostname'].lower())
+
+
+def not_modified(etag):
+    """
+    Zwraca odpowiedź 304, jeśli If-None-Match żądania zawiera etag, w przeciwnym razie None.
+    Porównanie jest słabe, bo skompresowane odpowiedzi mają ETag oznaczony jako słaby.
+    """
+    if etag and request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return None
+
+
+def with_etag(response, etag):
+    """Dokleja ETag do odpowiedzi. no-cache wymusza rewalidację, więc przeglądarka sama wysyła If-None-Match."""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def conditional_json(etag, build):
+    """
+    Odpowiedź JSON z ETagiem. ETag trzeba wyliczyć przed odczytem danych: zmiana w trakcie budowania
+    odpowiedzi podbije licznik, więc kolejne żądanie z tym ETagiem nie dostanie 304.
+    """
+    return not_modified(etag) or with_etag(jsonify(build()), etag)
+
+
+def bump_version(scope, key, app=None):
+    """Podbija wersję zasobu, jeśli aplikacja ma zainicjowane ResourceVersions."""
+    app = app or current_app
+    versions = app.extensions.get('resource_versions')
+    if versions:
+        versions.bump(scope, key)
+
+
+def get_resource_versions():
+    return current_app.extensions['resource_versions']
+
+
+def init_app(app):
+    versions = ResourceVersions()
+    app.extensions['resource_versions'] = versions
+    app.extensions['events'].subscribe(versions.on_event)
@@ -14,6 +14,68 @@ class Config:
 
     DATABASE = os.path.join(os.path.dirname(basedir), 'instance', 'winget_dashboard.db')
 
+    # Pula połączeń SQLite (na proces) i parametry pragm ustawianych przy otwieraniu połączenia
+    DB_POOL_SIZE = 8
+    DB_STATEMENT_CACHE_SIZE = 256
+    DB_CACHE_SIZE_KB = 20000
+    DB_MMAP_SIZE = 256 * 1024 * 1024
+    DB_BUSY_TIMEOUT_MS = 5000
+
+    # Liczba identyfikatorów pakietów i wersji ze słownika trzymanych w pamięci procesu (osobno dla każdego rodzaju)
+    CATALOG_CACHE_MAX_ENTRIES = 50000
+
+    # Kompresja: minimalny rozmiar odpowiedzi kompresowanej gzipem, poziom kompresji i limit rozmiaru
+    # treści żądania po rozpakowaniu (ochrona przed "bombą" dekompresyjną)
+    COMPRESSION_MIN_SIZE = 1024
+    COMPRESSION_LEVEL = 6
+    MAX_DECOMPRESSED_REQUEST_SIZE = 32 * 1024 * 1024
+
+    # Kolejka zapisu raportów w tle (group commit)
+    INGEST_QUEUE_MAX = 5000
+    INGEST_BATCH_SIZE = 200
+    INGEST_FLUSH_INTERVAL = 0.5
+    # Ile razy ponowić zapis paczki, gdy baza jest zablokowana przez inny zapis, i odstęp między próbami (s)
+    INGEST_RETRY_ATTEMPTS = 3
+    INGEST_RETRY_DELAY = 0.5
+
+    # Co ile sekund zaległe heartbeaty są zapisywane do bazy
+    PRESENCE_FLUSH_INTERVAL = 30
+
+    # Retencja historii raportów (w dniach). RETENTION_MAX_DAYS = None oznacza brak usuwania najstarszych.
+    RETENTION_FULL_DAYS = 30
+    RETENTION_DAILY_DAYS = 180
+    RETENTION_MAX_DAYS = None
+    RETENTION_ARCHIVE_DAYS = 90
+    RETENTION_INTERVAL_HOURS = 24
+
+    # Dzierżawa (lease) zadań pobranych przez agenta i co ile sekund wygasłe dzierżawy są zwalniane
+    TASK_LEASE_SECONDS = 900
+    TASK_LEASE_SWEEP_INTERVAL = 60
+
+    # Long-poll /api/tasks/<hostname>?wait=N: maksymalny czas oczekiwania (s) i limit równoczesnych oczekujących.
+    # Każde oczekujące zapytanie zajmuje wątek serwera, więc limit musi być mniejszy niż SERVER_THREADS.
+    TASK_LONG_POLL_TIMEOUT = 25
+    TASK_LONG_POLL_MAX_WAITERS = 48
+    SERVER_THREADS = 64
+
+    # Strumień zdarzeń SSE dla panelu (/api/events): rozmiar bufora zdarzeń, czas życia jednego
+    # połączenia (przeglądarka łączy się ponownie z kursorem), odstęp keepalive i limit równoczesnych strumieni
+    EVENTS_BUFFER_SIZE = 2000
+    EVENTS_STREAM_TIMEOUT = 300
+    EVENTS_KEEPALIVE_INTERVAL = 15
+    EVENTS_MAX_STREAMS = 8
+
+    # Wyszukiwanie pakietów w całej flocie (liczba wyników na stronę i górny limit dla API)
+    FLEET_SEARCH_PAGE_SIZE = 50
+    FLEET_SEARCH_MAX_PAGE_SIZE = 500
+
+    # Przegląd floty na stronie głównej: komputerów na stronę, górny limit dla API oraz czas życia
+    # i liczba wpisów pamięci podręcznej (wpisy są też unieważniane przy każdym zapisie)
+    OVERVIEW_PAGE_SIZE = 100
+    OVERVIEW_MAX_PAGE_SIZE = 500
+    OVERVIEW_CACHE_TTL = 10
+    OVERVIEW_CACHE_MAX_ENTRIES = 256
+
     DEFAULT_BLACKLIST_KEYWORDS = """
 redistributable
 visual c++
@@ -5,24 +5,167 @@ import logging
 import click
 from flask import current_app, g
 from flask.cli import with_appcontext
+from inventory_sync import apply_delta, inventory_hash
 import json
 import os
+import queue
+import threading
+from collections import Counter
+from . import migrations
+from .migrations import FLEET_SCAN_MARKER
+from .retention import unpack_inventory
+from .versions import version_sort_key
+from .events import publish_event
+from .conditional import bump_version
+from .inventory import InventoryDeltaError, snapshot_hash
+from .blacklist import get_computer_blacklist_rules, get_default_blacklist, get_matcher
+from .catalog import clear_package_catalog, get_package_catalog
+
+# Statusy, po których zadanie nie jest już liczone jako aktywne w computer_state.
+FINAL_TASK_STATUSES = ('zakończone', 'zakończone_po_restarcie', 'błąd', 'anulowane',
+                       'niepowodzenie_interwencja_uzytkownika', 'niepowodzenie_brak_uzytkownika')
+# Statusy zadań wykonywanych przez agenta - trzymają dzierżawę, a po jej wygaśnięciu zadanie wraca do kolejki.
+LEASED_TASK_STATUSES = ('w toku', 'w_trakcie_wykonywania', 'w_trakcie_aktualizacji', 'oczekuje_na_uzytkownika',
+                        'sukces_oczekuje_na_potwierdzenie')
+# Zadania, które agent już wykonuje - ich dzierżawę przedłuża każdy heartbeat i raport agenta,
+# więc długa aktualizacja nie wraca do kolejki tylko dlatego, że trwa dłużej niż TASK_LEASE_SECONDS.
+RUNNING_TASK_STATUSES = ('w_trakcie_wykonywania', 'w_trakcie_aktualizacji', 'oczekuje_na_uzytkownika')
+
+# Znaczniki trafień wstawiane przez highlight() FTS5 (filtr highlight_matches zamienia je na <mark>).
+HIGHLIGHT_START, HIGHLIGHT_END = '\x02', '\x03'
+# Tokenizer trigram nie znajduje fraz krótszych niż 3 znaki - dla nich zostaje zwykłe LIKE.
+FTS_MIN_KEYWORD_LENGTH = 3
+
+# Wiersze migawki inwentarza z nazwami i wersjami ze słownika pakietów (parametr: id migawki).
+SNAPSHOT_APPS_QUERY = """
+    SELECT p.name, v.version, p.app_id FROM applications a
+    JOIN packages p ON p.id = a.package_id
+    LEFT JOIN package_versions v ON v.id = a.version_id
+    WHERE a.snapshot_id = ? ORDER BY p.name COLLATE NOCASE"""
+SNAPSHOT_UPDATES_QUERY = """
+    SELECT u.id, p.name, p.app_id, cv.version AS current_version, av.version AS available_version, u.update_type
+    FROM updates u
+    JOIN packages p ON p.id = u.package_id
+    LEFT JOIN package_versions cv ON cv.id = u.current_version_id
+    LEFT JOIN package_versions av ON av.id = u.available_version_id
+    WHERE u.snapshot_id = ? ORDER BY u.update_type, p.name COLLATE NOCASE"""
+
+# Przegląd floty: ostatni kontakt agenta i warunek "offline" liczone w SQL (parametr: '-N seconds').
+_OVERVIEW_LAST_SEEN = "IFNULL(s.last_seen, c.last_report)"
+_OVERVIEW_OFFLINE = f"({_OVERVIEW_LAST_SEEN} IS NULL OR {_OVERVIEW_LAST_SEEN} < datetime('now', ?))"
+# Kolumny sortowania przeglądu floty: nazwa parametru sort -> (wyrażenie SQL, typ wartości w kursorze).
+OVERVIEW_SORT_COLUMNS = {
+    'hostname': ("c.hostname COLLATE NOCASE", str),
+    'last_report': (f"IFNULL({_OVERVIEW_LAST_SEEN}, '')", str),
+    'agent_version': ("IFNULL(c.agent_version, '')", str),
+    'app_updates': ("IFNULL(s.app_update_count, 0)", int),
+    'os_updates': ("IFNULL(s.os_update_count, 0)", int),
+    'active_tasks': ("IFNULL(s.active_task_count, 0)", int),
+}
+# Filtry statusu przeglądu floty. Filtry używające _OVERVIEW_OFFLINE potrzebują parametru progu.
+OVERVIEW_STATUS_FILTERS = {
+    'offline': _OVERVIEW_OFFLINE,
+    'online': f"NOT {_OVERVIEW_OFFLINE}",
+    'updates': "(IFNULL(s.app_update_count, 0) > 0 OR IFNULL(s.os_update_count, 0) > 0)",
+    'reboot': "IFNULL(s.reboot_required, c.reboot_required)",
+    'tasks': "IFNULL(s.active_task_count, 0) > 0",
+}
+
+
+def fts_computer_key(computer_id):
+    """Wartość kolumny computer w report_apps_fts (ograniczniki chronią przed dopasowaniem '#1#' do '#12#')."""
+    return f'#{computer_id}#'
+
+
+def fts_apps_document(apps):
+    """Dokument report_apps_fts dla raportu: jedna linia "Nazwa (Id)" na aplikację."""
+    return '\n'.join(f"{app.get('name') or ''} ({app.get('app_id') or ''})" for app in apps)
+
+
+def _fts_phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def connect(db_path, config=None):
+    """Otwiera połączenie SQLite z trybem WAL i pragmami dostrojonymi pod równoległe odczyty i zapisy."""
+    config = config or {}
+    conn = sqlite3.connect(db_path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False,
+                           cached_statements=config.get('DB_STATEMENT_CACHE_SIZE', 256))
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA cache_size = {-int(config.get('DB_CACHE_SIZE_KB', 20000))}")
+    conn.execute(f"PRAGMA mmap_size = {int(config.get('DB_MMAP_SIZE', 268435456))}")
+    conn.execute(f"PRAGMA busy_timeout = {int(config.get('DB_BUSY_TIMEOUT_MS', 5000))}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+class ConnectionPool:
+    """Pula połączeń do jednego pliku bazy, współdzielona przez wątki serwera w obrębie procesu."""
+
+    def __init__(self, db_path, config, size):
+        self.db_path = db_path
+        self.config = config
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            if not os.path.exists(self.db_path):
+                raise sqlite3.OperationalError(f"Plik bazy danych nie istnieje: {self.db_path}")
+            return connect(self.db_path, self.config)
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            conn.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool():
+    db_path = current_app.config['DATABASE']
+    pool = _pools.get(db_path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(db_path)
+            if pool is None:
+                config = {k: v for k, v in current_app.config.items() if k.startswith('DB_')}
+                pool = ConnectionPool(db_path, config, current_app.config.get('DB_POOL_SIZE', 8))
+                _pools[db_path] = pool
+    return pool
 
 
 def get_db():
     if 'db' not in g:
-        db_path = current_app.config['DATABASE']
-        if not os.path.exists(db_path):
-            raise sqlite3.OperationalError(f"Plik bazy danych nie istnieje: {db_path}")
-
-        g.db = sqlite3.connect(db_path, detect_types=sqlite3.PARSE_DECLTYPES)
-        g.db.row_factory = sqlite3.Row
+        g.db_pool = get_pool()
+        g.db = g.db_pool.acquire()
     return g.db
 
 
 def close_db(e=None):
     db = g.pop('db', None)
-    if db is not None: db.close()
+    pool = g.pop('db_pool', None)
+    if db is None: return
+    if pool is not None:
+        pool.release(db)
+    else:
+        db.close()
 
 
 def init_db():
@@ -30,6 +173,11 @@ def init_db():
     with current_app.open_resource('schema.sql') as f:
         db.executescript(f.read().decode('utf8'))
     db.commit()
+    # Pozwala retencji zwalniać miejsce w pliku przez PRAGMA incremental_vacuum
+    db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    db.execute("VACUUM")
+    migrations.upgrade(db)
+    clear_package_catalog()
 
 
 @click.command('init-db')
@@ -40,9 +188,49 @@ def init_db_command():
     click.echo('Zainicjowano bazę danych.')
 
 
+@click.command('db-upgrade')
+@with_appcontext
+def db_upgrade_command():
+    """Aktualizuje schemat istniejącej bazy danych bez usuwania danych."""
+    db = get_db()
+    version_before = migrations.get_schema_version(db)
+    applied = migrations.upgrade(db)
+    if applied:
+        click.echo(f'Zaktualizowano schemat z wersji {version_before} do {applied[-1]}.')
+    else:
+        click.echo(f'Schemat bazy danych jest aktualny (wersja {version_before}).')
+
+
+@click.command('db-check-plans')
+@with_appcontext
+def db_check_plans_command():
+    """Sprawdza plany zapytań i kończy się błędem, jeśli któreś przeszukuje całą tabelę."""
+    problems = migrations.check_query_plans()
+    for statement, plan in problems:
+        click.echo(f'PEŁNE SKANOWANIE: {statement}')
+        for detail in plan:
+            click.echo(f'    {detail}')
+    if problems:
+        raise click.ClickException(f'{len(problems)} zapytań nie korzysta z indeksów.')
+    click.echo('Wszystkie zapytania korzystają z indeksów.')
+
+
+@click.command('rebuild-state')
+@with_appcontext
+def rebuild_state_command():
+    """Przelicza tabele computer_state i fleet_packages na podstawie historii raportów i zadań."""
+    db_manager = DatabaseManager()
+    count = db_manager.rebuild_computer_state()
+    db_manager.rebuild_fleet_packages()
+    click.echo(f'Przeliczono stan i indeks pakietów dla {count} komputerów.')
+
+
 def init_app(app):
     app.teardown_appcontext(close_db)
     app.cli.add_command(init_db_command)
+    app.cli.add_command(db_upgrade_command)
+    app.cli.add_command(db_check_plans_command)
+    app.cli.add_command(rebuild_state_command)
 
 
 class DatabaseManager:
@@ -54,65 +242,292 @@ class DatabaseManager:
         if commit: self.db.commit()
         return cursor
 
+    def _upsert_report_state(self, computer_id, report_id, app_update_count, os_update_count, reboot_required,
+                             reported_hash=None):
+        """Zapisuje w computer_state podsumowanie najnowszego raportu (bez commita)."""
+        self._execute(
+            """INSERT INTO computer_state
+               (computer_id, latest_report_id, app_update_count, os_update_count, reboot_required, last_seen,
+                inventory_hash)
+               VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?)
+               ON CONFLICT(computer_id) DO UPDATE SET
+               latest_report_id = excluded.latest_report_id,
+               app_update_count = excluded.app_update_count,
+               os_update_count = excluded.os_update_count,
+               reboot_required = excluded.reboot_required,
+               last_seen = excluded.last_seen,
+               inventory_hash = excluded.inventory_hash""",
+            (computer_id, report_id, app_update_count, os_update_count, reboot_required, reported_hash))
+
+    def _resolve_inventory(self, data, state):
+        """
+        Zwraca (lista aplikacji raportu, skrót inwentarza). Dla raportu różnicowego (inventory_delta)
+        lista powstaje z migawki najnowszego raportu komputera (state z _latest_report_state) i różnicy.
+        """
+        delta = data.get('inventory_delta')
+        if delta is None:
+            apps = data.get('installed_apps', [])
+            return apps, inventory_hash(apps)
+        return self._apply_inventory_delta(data.get('hostname'), state, delta), delta['hash']
+
+    def _apply_inventory_delta(self, hostname, state, delta):
+        """
+        Nakłada różnicę na migawkę najnowszego raportu. Skrót bazowy musi zgadzać się z zapisanym,
+        a skrót listy po nałożeniu różnicy - z delta['hash'] wyliczonym przez agenta. W przeciwnym razie
+        rzuca InventoryDeltaError (agent dostaje 409 i wysyła pełną listę).
+        """
+        if not state or not state['snapshot_id'] or state['inventory_hash'] != delta['base']:
+            raise InventoryDeltaError(f"Skrót bazowy inwentarza od {hostname} nie zgadza się z serwerem.")
+        apps, _ = self._load_snapshot(state['snapshot_id'])
+        base_apps = [{'id': app['app_id'], 'name': app['name'], 'version': app['version']} for app in apps]
+        applied = apply_delta(base_apps, delta)
+        if inventory_hash(applied) != delta['hash']:
+            raise InventoryDeltaError(f"Inwentarz od {hostname} po nałożeniu różnicy ma inny skrót niż u agenta.")
+        return applied
+
+    def resolve_inventory_delta(self, hostname, delta):
+        """
+        Odtwarza pełną listę aplikacji z raportu różnicowego komputera (sprawdzając oba skróty).
+        Rzuca InventoryDeltaError, gdy różnica nie pasuje do stanu na serwerze.
+        """
+        state = self._execute(
+            """SELECT r.snapshot_id, s.inventory_hash FROM computers c
+               JOIN computer_state s ON s.computer_id = c.id
+               JOIN reports r ON r.id = s.latest_report_id
+               WHERE c.hostname = ? COLLATE NOCASE""", (hostname,)).fetchone()
+        return self._apply_inventory_delta(hostname, state, delta)
+
+    def _latest_report_state(self, computer_id):
+        """Migawka inwentarza i skrót inwentarza najnowszego raportu komputera (albo None)."""
+        return self._execute(
+            """SELECT r.snapshot_id, s.inventory_hash FROM computer_state s
+               JOIN reports r ON r.id = s.latest_report_id WHERE s.computer_id = ?""", (computer_id,)).fetchone()
+
+    def _store_snapshot(self, computer_id, app_rows, update_rows):
+        """
+        Zwraca ID migawki inwentarza o podanej treści (bez commita). Wiersze aplikacji, aktualizacji i dokument
+        FTS są zapisywane tylko dla treści, której komputer jeszcze nie zgłaszał. Migawka zarchiwizowana
+        przez retencję, do której komputer wrócił, odzyskuje wiersze w tabelach.
+        """
+        content_hash = snapshot_hash(app_rows, update_rows)
+        snapshot = self._execute(
+            "SELECT id, archive FROM inventory_snapshots WHERE computer_id = ? AND content_hash = ?",
+            (computer_id, content_hash)).fetchone()
+        if snapshot and snapshot['archive'] is None:
+            return snapshot['id']
+        if snapshot:
+            snapshot_id = snapshot['id']
+            self._execute("UPDATE inventory_snapshots SET archive_format = NULL, archive = NULL WHERE id = ?",
+                          (snapshot_id,))
+        else:
+            snapshot_id = self._execute(
+                """INSERT INTO inventory_snapshots (computer_id, content_hash, app_count, app_update_count,
+                   os_update_count) VALUES (?, ?, ?, ?, ?)""",
+                (computer_id, content_hash, len(app_rows), sum(1 for row in update_rows if row[4] == 'APP'),
+                 sum(1 for row in update_rows if row[4] == 'OS'))).lastrowid
+            if app_rows:
+                self._execute("INSERT INTO report_apps_fts (rowid, computer, apps) VALUES (?, ?, ?)",
+                              (snapshot_id, fts_computer_key(computer_id),
+                               fts_apps_document({'name': row[0], 'app_id': row[2]} for row in app_rows)))
+        catalog = get_package_catalog()
+        if app_rows:
+            self.db.executemany(
+                "INSERT INTO applications (snapshot_id, package_id, version_id) VALUES (?, ?, ?)",
+                [(snapshot_id, catalog.package_id(self.db, app_id, name), catalog.version_id(self.db, version))
+                 for name, version, app_id in app_rows])
+        if update_rows:
+            self.db.executemany(
+                "INSERT INTO updates (snapshot_id, package_id, current_version_id, available_version_id, update_type) VALUES (?, ?, ?, ?, ?)",
+                [(snapshot_id, catalog.package_id(self.db, app_id, name), catalog.version_id(self.db, current),
+                  catalog.version_id(self.db, available), update_type)
+                 for name, app_id, current, available, update_type in update_rows])
+        return snapshot_id
+
+    def _load_snapshot(self, snapshot_id):
+        """Zwraca (aplikacje, aktualizacje) migawki inwentarza - z tabel albo z archiwum retencji."""
+        snapshot = self._execute("SELECT archive FROM inventory_snapshots WHERE id = ?", (snapshot_id,)).fetchone()
+        if not snapshot:
+            return [], []
+        if snapshot['archive'] is not None:
+            return unpack_inventory(snapshot['archive'])
+        apps = self._execute(SNAPSHOT_APPS_QUERY, (snapshot_id,)).fetchall()
+        updates = self._execute(SNAPSHOT_UPDATES_QUERY, (snapshot_id,)).fetchall()
+        return apps, updates
+
+    def get_inventory_hash(self, hostname):
+        """Skrót inwentarza z najnowszego raportu komputera (podstawa raportów różnicowych) albo None."""
+        row = self._execute(
+            """SELECT s.inventory_hash FROM computers c JOIN computer_state s ON s.computer_id = c.id
+               WHERE c.hostname = ? COLLATE NOCASE""", (hostname,)).fetchone()
+        return row['inventory_hash'] if row else None
+
+    def _refresh_task_state(self, computer_ids, commit=False):
+        """Przelicza licznik aktywnych zadań w computer_state dla podanych komputerów."""
+        placeholders = ','.join('?' for _ in FINAL_TASK_STATUSES)
+        for computer_id in set(computer_ids):
+            self._execute(
+                f"""UPDATE computer_state SET active_task_count = (
+                    SELECT COUNT(*) FROM tasks WHERE computer_id = ? AND status NOT IN ({placeholders}))
+                WHERE computer_id = ?""",
+                (computer_id, *FINAL_TASK_STATUSES, computer_id))
+        if commit: self.db.commit()
+
+    def rebuild_computer_state(self, commit=True):
+        """Odtwarza computer_state od zera na podstawie najnowszych raportów i tabeli zadań."""
+        self._execute(f"DELETE FROM computer_state {FLEET_SCAN_MARKER}")
+        self._execute(
+            f"""{FLEET_SCAN_MARKER}
+               INSERT INTO computer_state
+               (computer_id, latest_report_id, app_update_count, os_update_count, reboot_required, last_seen)
+               SELECT c.id, lr.report_id, IFNULL(sn.app_update_count, 0), IFNULL(sn.os_update_count, 0),
+                   c.reboot_required, c.last_report
+               FROM computers c
+               LEFT JOIN (SELECT computer_id, MAX(id) AS report_id FROM reports GROUP BY computer_id) lr
+                   ON lr.computer_id = c.id
+               LEFT JOIN reports r ON r.id = lr.report_id
+               LEFT JOIN inventory_snapshots sn ON sn.id = r.snapshot_id""")
+        computer_ids = [row['id'] for row in self._execute("SELECT id FROM computers").fetchall()]
+        self._refresh_task_state(computer_ids, commit=commit)
+        logging.info(f"Odtworzono computer_state dla {len(computer_ids)} komputerów.")
+        return len(computer_ids)
+
+    def _sync_fleet_packages(self, computer_id, apps, app_updates):
+        """
+        Uzgadnia wpisy fleet_packages komputera z jego najnowszym raportem (bez commita).
+        Zapisywane są tylko różnice: usunięte, nowe i zmienione pakiety.
+        """
+        available = {update['id'].lower(): update.get('available_version')
+                     for update in app_updates if update.get('id')}
+        wanted = {}
+        for app in apps:
+            app_id = app.get('id')
+            if not app_id or app_id == 'N/A':
+                continue
+            version = app.get('version') or ''
+            wanted[(app_id.lower(), version)] = (app_id, version, app.get('name'), available.get(app_id.lower()))
+        current = {(row['app_id'].lower(), row['version']): row for row in self._execute(
+            "SELECT app_id, version, name, available_version FROM fleet_packages WHERE computer_id = ?",
+            (computer_id,)).fetchall()}
+        removed = [(row['app_id'], computer_id, row['version']) for key, row in current.items() if key not in wanted]
+        changed = [(app_id, computer_id, version, version_sort_key(version), name, available_version)
+                   for key, (app_id, version, name, available_version) in wanted.items()
+                   if key not in current
+                   or (current[key]['name'], current[key]['available_version']) != (name, available_version)]
+        if removed:
+            self.db.executemany("DELETE FROM fleet_packages WHERE app_id = ? AND computer_id = ? AND version = ?",
+                                removed)
+        if changed:
+            self.db.executemany(
+                """INSERT INTO fleet_packages (app_id, computer_id, version, version_key, name, available_version)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (app_id, computer_id, version) DO UPDATE SET
+                       name = excluded.name, available_version = excluded.available_version""",
+                changed)
+
+    def rebuild_fleet_packages(self, commit=True):
+        """Odtwarza fleet_packages od zera na podstawie najnowszych raportów komputerów."""
+        self._execute("DELETE FROM fleet_packages")
+        latest_reports = self._execute(
+            f"""SELECT s.computer_id, r.snapshot_id FROM computer_state s {FLEET_SCAN_MARKER}
+               JOIN reports r ON r.id = s.latest_report_id""").fetchall()
+        for row in latest_reports:
+            apps, updates = self._load_snapshot(row['snapshot_id'])
+            self._sync_fleet_packages(
+                row['computer_id'], [{'name': app['name'], 'version': app['version'], 'id': app['app_id']} for app in apps],
+                [{'id': update['app_id'], 'available_version': update['available_version']}
+                 for update in updates if update['update_type'] == 'APP'])
+        if commit:
+            self.db.commit()
+        logging.info(f"Odtworzono indeks pakietów floty dla {len(latest_reports)} komputerów.")
+        return len(latest_reports)
+
+    def _insert_report(self, data):
+        """
+        Zapisuje raport w bieżącej transakcji (bez commita). Zwraca (id komputera, czy komputer został
+        właśnie dodany). Błędy SQLite są przekazywane wyżej.
+        """
+        hostname = data.get('hostname')
+        computer_cursor = self._execute(
+            "SELECT id, blacklist_keywords FROM computers WHERE hostname = ? COLLATE NOCASE", (hostname,))
+        computer = computer_cursor.fetchone()
+        created = not computer
+        if created:
+            default_blacklist_str = ", ".join(get_default_blacklist())
+            self._execute(
+                "INSERT INTO computers (hostname, blacklist_keywords, ip_address, reboot_required, agent_version, winget_version, agent_mode) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (hostname, default_blacklist_str, data.get('ip_address'), data.get('reboot_required', False),
+                 data.get('agent_version'), data.get('winget_version'), data.get('agent_mode')))
+            computer_cursor = self._execute(
+                "SELECT id, blacklist_keywords FROM computers WHERE hostname = ? COLLATE NOCASE", (hostname,))
+            computer = computer_cursor.fetchone()
+
+        computer_id = computer['id']
+        previous = self._latest_report_state(computer_id)
+        reported_apps, reported_hash = self._resolve_inventory(data, previous)
+        # Agent filtruje inwentarz sam, ale starsze wersje nie znają reguł id: i wzorców - dlatego
+        # serwer przepuszcza listę przez tę samą (skompilowaną raz dla danej treści) czarną listę.
+        rules = get_computer_blacklist_rules(computer['blacklist_keywords']) or get_default_blacklist()
+        installed_apps = get_matcher(rules).filter(reported_apps)
+        self._execute(
+            "UPDATE computers SET ip_address = ?, reboot_required = ?, agent_version = ?, winget_version = ?, agent_mode = ?, last_report = CURRENT_TIMESTAMP WHERE id = ?",
+            (data.get('ip_address'), data.get('reboot_required', False), data.get('agent_version', 'N/A'),
+             data.get('winget_version'), data.get('agent_mode'), computer_id))
+
+        app_rows = [(app.get('name'), app.get('version'), app.get('id', 'N/A')) for app in installed_apps]
+        app_update_rows = [(u.get('name'), u.get('id', 'N/A'), u.get('version'), u.get('available_version'), 'APP')
+                           for u in data.get('available_app_updates', [])]
+        os_update_rows = [(u.get('Title'), u.get('KB', 'N/A'), 'N/A', 'N/A', 'OS') for u in
+                          data.get('pending_os_updates', []) if isinstance(u, dict)]
+        snapshot_id = self._store_snapshot(computer_id, app_rows, app_update_rows + os_update_rows)
+        report_id = self._execute("INSERT INTO reports (computer_id, snapshot_id) VALUES (?, ?)",
+                                  (computer_id, snapshot_id)).lastrowid
+
+        self._upsert_report_state(computer_id, report_id, len(app_update_rows), len(os_update_rows),
+                                  data.get('reboot_required', False), reported_hash)
+        # Niezmieniony inwentarz oznacza, że fleet_packages jest już zgodne z raportem.
+        if not previous or previous['snapshot_id'] != snapshot_id:
+            self._sync_fleet_packages(computer_id, installed_apps, data.get('available_app_updates', []))
+        return computer_id, created
+
     def save_report(self, data):
         hostname = data.get('hostname')
         if not hostname:
             logging.error("Otrzymano raport bez nazwy hosta.")
             return None
         try:
-            computer_cursor = self._execute("SELECT id FROM computers WHERE hostname = ? COLLATE NOCASE", (hostname,))
-            computer = computer_cursor.fetchone()
-            if not computer:
-                default_keywords_raw = current_app.config['DEFAULT_BLACKLIST_KEYWORDS']
-                default_keywords_list = [line.strip() for line in default_keywords_raw.strip().split('\n') if
-                                         line.strip()]
-                default_blacklist_str = ", ".join(default_keywords_list)
-                self._execute(
-                    "INSERT INTO computers (hostname, blacklist_keywords, ip_address, reboot_required, agent_version, winget_version, agent_mode) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                    (hostname, default_blacklist_str, data.get('ip_address'), data.get('reboot_required', False),
-                     data.get('agent_version'), data.get('winget_version'), data.get('agent_mode')),
-                    commit=True)
-                computer_cursor = self._execute("SELECT id FROM computers WHERE hostname = ? COLLATE NOCASE",
-                                                (hostname,))
-                computer = computer_cursor.fetchone()
-
-            computer_id = computer['id']
-            self._execute(
-                "UPDATE computers SET ip_address = ?, reboot_required = ?, agent_version = ?, winget_version = ?, agent_mode = ?, last_report = CURRENT_TIMESTAMP WHERE id = ?",
-                (data.get('ip_address'), data.get('reboot_required', False), data.get('agent_version', 'N/A'),
-                 data.get('winget_version'), data.get('agent_mode'), computer_id))
-
-            report_cursor = self._execute("INSERT INTO reports (computer_id) VALUES (?)", (computer_id,), commit=True)
-            report_id = report_cursor.lastrowid
-
-            apps_to_insert = [(report_id, app.get('name'), app.get('version'), app.get('id', 'N/A')) for app in
-                              data.get('installed_apps', [])]
-            if apps_to_insert:
-                self.db.executemany("INSERT INTO applications (report_id, name, version, app_id) VALUES (?, ?, ?, ?)",
-                                    apps_to_insert)
-
-            app_updates_to_insert = [
-                (report_id, u.get('name'), u.get('id', 'N/A'), u.get('version'), u.get('available_version'), 'APP') for
-                u in data.get('available_app_updates', [])]
-            if app_updates_to_insert:
-                self.db.executemany(
-                    "INSERT INTO updates (report_id, name, app_id, current_version, available_version, update_type) VALUES (?, ?, ?, ?, ?, ?)",
-                    app_updates_to_insert)
-
-            os_updates_to_insert = [(report_id, u.get('Title'), u.get('KB', 'N/A'), 'N/A', 'N/A', 'OS') for u in
-                                    data.get('pending_os_updates', []) if isinstance(u, dict)]
-            if os_updates_to_insert:
-                self.db.executemany(
-                    "INSERT INTO updates (report_id, name, app_id, current_version, available_version, update_type) VALUES (?, ?, ?, ?, ?, ?)",
-                    os_updates_to_insert)
-
+            computer_id, _ = self._insert_report(data)
             self.db.commit()
             return computer_id
+        except InventoryDeltaError as e:
+            clear_package_catalog()
+            self.db.rollback()
+            logging.warning(f"Odrzucono raport różnicowy: {e}")
+            return None
         except sqlite3.Error as e:
+            clear_package_catalog()
             self.db.rollback()
             logging.error(f"Błąd transakcji podczas zapisu raportu od {hostname}: {e}", exc_info=True)
             return None
 
+    def process_report(self, data):
+        """
+        Zapisuje raport i porządkuje zadania komputera: zamyka zadania zaplanowane na logowanie
+        oraz usuwa zadania aktualizacji aplikacji, które nie są już potrzebne. Nie wykonuje commita.
+        Zwraca (id komputera, czy komputer został właśnie dodany).
+        """
+        computer_id, created = self._insert_report(data)
+        self._renew_running_task_leases([data.get('hostname')])
+        self.cleanup_scheduled_tasks(computer_id, commit=False)
+        apps_still_needing_update = {update.get('id') for update in data.get('available_app_updates', [])}
+        active_update_tasks = self.get_active_tasks_for_computer(computer_id, command_filter='update')
+        tasks_to_remove = [task['id'] for task in active_update_tasks
+                           if task['payload'] not in apps_still_needing_update]
+        if tasks_to_remove:
+            self.delete_tasks(tasks_to_remove, commit=False)
+            logging.info(
+                f"Wyczyszczono {len(tasks_to_remove)} nieaktualnych zadań aktualizacji dla komputera ID {computer_id}.")
+        return computer_id, created
+
     def update_agent_update_status(self, hostname, status, details=""):
         self._execute(
             "UPDATE computers SET last_agent_update_status = ?, last_agent_update_ts = CURRENT_TIMESTAMP, last_agent_update_confirmed_at = NULL WHERE hostname = ? COLLATE NOCASE",
@@ -125,61 +540,123 @@ class DatabaseManager:
             (hostname,), commit=True)
         logging.info(f"Potwierdzono poprawność działania nowego agenta na komputerze: {hostname}")
 
-    def update_computer_status_from_heartbeat(self, data):
-        hostname = data.get('hostname')
-        if not hostname:
-            return
-
-        self._execute(
-            """UPDATE computers SET 
-               last_report = CURRENT_TIMESTAMP, 
-               ip_address = ?, 
-               reboot_required = ?, 
-               agent_version = ?, 
-               winget_version = ?, 
-               agent_mode = ? 
-               WHERE hostname = ? COLLATE NOCASE""",
-            (data.get('ip_address'),
-             data.get('reboot_required', False),
-             data.get('agent_version', 'N/A'),
-             data.get('winget_version'),
-             data.get('agent_mode'),
-             hostname),
-            commit=True)
-        logging.info(f"Odebrano heartbeat od {hostname}. Zaktualizowano status online.")
+    def save_heartbeats(self, heartbeats):
+        """
+        Zapisuje paczkę heartbeatów zebranych przez PresenceTracker w jednej transakcji.
+        Każdy element to słownik z kluczami: hostname, last_seen, reboot_required oraz changed
+        (kolumny tabeli computers, które zmieniły się od poprzedniego zapisu).
+        """
+        if not heartbeats: return
+        grouped = {}
+        for hb in heartbeats:
+            columns = tuple(sorted(hb['changed']))
+            grouped.setdefault(columns, []).append(
+                (hb['last_seen'], *(hb['changed'][col] for col in columns), hb['hostname']))
+        for columns, rows in grouped.items():
+            assignments = ', '.join(['last_report = ?'] + [f"{col} = ?" for col in columns])
+            self.db.executemany(f"UPDATE computers SET {assignments} WHERE hostname = ? COLLATE NOCASE", rows)
+        self.db.executemany(
+            """INSERT INTO computer_state (computer_id, reboot_required, last_seen)
+               SELECT id, ?, ? FROM computers WHERE hostname = ? COLLATE NOCASE
+               ON CONFLICT(computer_id) DO UPDATE SET
+               reboot_required = excluded.reboot_required,
+               last_seen = excluded.last_seen""",
+            [(hb['reboot_required'], hb['last_seen'], hb['hostname']) for hb in heartbeats])
+        self._renew_running_task_leases([hb['hostname'] for hb in heartbeats])
+        self.db.commit()
 
     def get_all_computers(self):
         query = """
         SELECT
-            c.id, c.hostname, c.ip_address, c.last_report, c.reboot_required, c.agent_version,
+            c.id, c.hostname, c.ip_address, c.agent_version,
             c.last_agent_update_status, c.last_agent_update_ts, c.last_agent_update_confirmed_at,
             c.winget_version, c.agent_mode,
-            IFNULL(upd_counts.app_updates, 0) as app_update_count,
-            IFNULL(upd_counts.os_updates, 0) as os_update_count
+            IFNULL(s.last_seen, c.last_report) as last_report,
+            IFNULL(s.reboot_required, c.reboot_required) as reboot_required,
+            IFNULL(s.app_update_count, 0) as app_update_count,
+            IFNULL(s.os_update_count, 0) as os_update_count,
+            IFNULL(s.active_task_count, 0) as active_task_count
         FROM
             computers c
         LEFT JOIN
-            (SELECT
-                r.computer_id,
-                SUM(CASE WHEN u.update_type = 'APP' THEN 1 ELSE 0 END) as app_updates,
-                SUM(CASE WHEN u.update_type = 'OS' THEN 1 ELSE 0 END) as os_updates
-            FROM
-                updates u
-            JOIN
-                reports r ON u.report_id = r.id
-            WHERE
-                u.report_id IN (SELECT MAX(id) FROM reports GROUP BY computer_id)
-            GROUP BY
-                r.computer_id
-            ) as upd_counts ON c.id = upd_counts.computer_id
+            computer_state s ON s.computer_id = c.id
         ORDER BY
             c.hostname COLLATE NOCASE;
         """
         return self._execute(query).fetchall()
 
+    def get_computer_overview(self, offline_threshold, status=None, search=None, sort='hostname',
+                              descending=False, after=None, limit=100):
+        """
+        Strona przeglądu floty dla strony głównej. Status offline, filtrowanie (status, fragment nazwy hosta)
+        i sortowanie liczone są w SQL. Stronicowanie kursorem "computer_id:wartość_sortowania"
+        z poprzedniej strony (klucz 'next').
+        """
+        sort_expr, sort_type = OVERVIEW_SORT_COLUMNS.get(sort, OVERVIEW_SORT_COLUMNS['hostname'])
+        offline_param = f'-{int(offline_threshold)} seconds'
+        # Domyślna kolejność (nazwa hosta) idzie po indeksie idx_computers_hostname_nocase i kończy się po LIMIT;
+        # pozostałe sortowania z definicji przeglądają całą flotę.
+        marker = '' if sort_expr.startswith('c.hostname') else FLEET_SCAN_MARKER
+        query = f"""{marker}
+        SELECT
+            c.id, c.hostname, c.ip_address, c.agent_version,
+            c.last_agent_update_status, c.last_agent_update_ts, c.last_agent_update_confirmed_at,
+            c.winget_version, c.agent_mode,
+            {_OVERVIEW_LAST_SEEN} as last_report,
+            IFNULL(s.reboot_required, c.reboot_required) as reboot_required,
+            IFNULL(s.app_update_count, 0) as app_update_count,
+            IFNULL(s.os_update_count, 0) as os_update_count,
+            IFNULL(s.active_task_count, 0) as active_task_count,
+            {_OVERVIEW_OFFLINE} as is_offline,
+            {sort_expr} as sort_value
+        FROM computers c
+        LEFT JOIN computer_state s ON s.computer_id = c.id
+        WHERE 1 = 1 """
+        params = [offline_param]
+        if status in OVERVIEW_STATUS_FILTERS:
+            query += f"AND {OVERVIEW_STATUS_FILTERS[status]} "
+            params.extend([offline_param] * OVERVIEW_STATUS_FILTERS[status].count('?'))
+        if search:
+            query += "AND c.hostname LIKE ? ESCAPE '\\' "
+            params.append('%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        if after:
+            try:
+                after_id, after_value = after.split(':', 1)
+                after_value, after_id = sort_type(after_value), int(after_id)
+                params.extend([after_value, after_value, after_id])
+                operator = '<' if descending else '>'
+                # Warunek na samej kolumnie sortowania pozwala SQLite zacząć od kursora w indeksie
+                query += f"AND {sort_expr} {operator}= ? AND ({sort_expr}, c.id) {operator} (?, ?) "
+            except ValueError:
+                logging.warning(f"Zignorowano nieprawidłowy kursor przeglądu floty: {after}")
+        direction = 'DESC' if descending else 'ASC'
+        query += f"ORDER BY {sort_expr} {direction}, c.id {direction} LIMIT ?"
+        params.append(limit + 1)
+        rows = self._execute(query, tuple(params)).fetchall()
+        next_cursor = f"{rows[limit - 1]['id']}:{rows[limit - 1]['sort_value']}" if len(rows) > limit else None
+        return {"items": rows[:limit], "next": next_cursor}
+
+    def get_fleet_summary(self, offline_threshold):
+        """Liczniki komputerów dla filtrów przeglądu floty (wszystkie, offline, z aktualizacjami itd.)."""
+        offline_param = f'-{int(offline_threshold)} seconds'
+        row = self._execute(
+            f"""{FLEET_SCAN_MARKER}
+            SELECT COUNT(*) AS total,
+                   IFNULL(SUM({OVERVIEW_STATUS_FILTERS['offline']}), 0) AS offline,
+                   IFNULL(SUM({OVERVIEW_STATUS_FILTERS['updates']}), 0) AS updates,
+                   IFNULL(SUM({OVERVIEW_STATUS_FILTERS['reboot']}), 0) AS reboot,
+                   IFNULL(SUM({OVERVIEW_STATUS_FILTERS['tasks']}), 0) AS tasks
+            FROM computers c LEFT JOIN computer_state s ON s.computer_id = c.id""",
+            (offline_param,)).fetchone()
+        summary = dict(row)
+        summary['online'] = summary['total'] - summary['offline']
+        return summary
+
     def update_computer_blacklist(self, hostname, new_blacklist):
         self._execute("UPDATE computers SET blacklist_keywords = ? WHERE hostname = ? COLLATE NOCASE",
                       (new_blacklist, hostname), commit=True)
+        bump_version('blacklist', hostname.lower())
+        publish_event('blacklist', {'hostname': hostname})
         logging.info(f"Zaktualizowano czarną listę dla komputera: {hostname}")
 
     def get_computer_blacklist(self, hostname):
@@ -190,122 +667,312 @@ class DatabaseManager:
     def get_computer_details(self, hostname):
         computer = self._execute("SELECT * FROM computers WHERE hostname = ? COLLATE NOCASE", (hostname,)).fetchone()
         if not computer: return None
-        latest_report = self._execute(
-            "SELECT id FROM reports WHERE computer_id = ? ORDER BY report_timestamp DESC LIMIT 1",
-            (computer['id'],)).fetchone()
-        apps, updates = [], []
-        if latest_report:
-            report_id = latest_report['id']
-            apps = self._execute(
-                "SELECT name, version, app_id FROM applications WHERE report_id = ? ORDER BY name COLLATE NOCASE",
-                (report_id,)).fetchall()
-            updates = self._execute(
-                "SELECT id, name, app_id, current_version, available_version, update_type FROM updates WHERE report_id = ? ORDER BY update_type, name COLLATE NOCASE",
-                (report_id,)).fetchall()
+        latest = self._latest_report_state(computer['id'])
+        apps, updates = self._load_snapshot(latest['snapshot_id']) if latest else ([], [])
         return {"computer": computer, "apps": apps, "updates": updates}
 
     def get_computer_history(self, hostname, search_params=None):
         computer = self._execute("SELECT * FROM computers WHERE hostname = ? COLLATE NOCASE", (hostname,)).fetchone()
         if not computer: return None
         computer_id = computer['id']
+        search_params = search_params or {}
+        keyword = search_params.get('keyword', '').strip()
+        use_fts = len(keyword) >= FTS_MIN_KEYWORD_LENGTH
         params = [computer_id]
-        query = "SELECT DISTINCT r.id, r.report_timestamp FROM reports r "
-        if search_params and search_params.get('keyword'):
-            query += "JOIN applications a ON r.id = a.report_id "
-        query += "WHERE r.computer_id = ? "
-        if search_params:
-            if search_params.get('keyword'):
-                query += "AND a.name LIKE ? "
-                params.append(f"%{search_params['keyword']}%")
-            start_date = search_params.get('start_date')
-            end_date = search_params.get('end_date')
-            if start_date:
-                query += "AND r.report_timestamp >= ? "
-                params.append(f"{start_date} 00:00:00")
-                final_end_date = end_date if end_date else start_date
-                query += "AND r.report_timestamp <= ? "
-                params.append(f"{final_end_date} 23:59:59")
+        if use_fts:
+            # Wyszukiwanie podciągów w indeksie FTS5 (trigram) - obejmuje też raporty zarchiwizowane.
+            query = ("SELECT r.id, r.report_timestamp, highlight(report_apps_fts, 1, ?, ?) AS matches "
+                     "FROM report_apps_fts JOIN reports r ON r.snapshot_id = report_apps_fts.rowid "
+                     "WHERE report_apps_fts MATCH ? AND r.computer_id = ? ")
+            params = [HIGHLIGHT_START, HIGHLIGHT_END,
+                      f"computer : {_fts_phrase(fts_computer_key(computer_id))} AND apps : {_fts_phrase(keyword)}",
+                      computer_id]
+        elif keyword:
+            query = ("SELECT DISTINCT r.id, r.report_timestamp FROM reports r "
+                     "JOIN applications a ON a.snapshot_id = r.snapshot_id JOIN packages p ON p.id = a.package_id "
+                     "WHERE r.computer_id = ? AND p.name LIKE ? ")
+            params.append(f"%{keyword}%")
+        else:
+            query = "SELECT r.id, r.report_timestamp FROM reports r WHERE r.computer_id = ? "
+        start_date = search_params.get('start_date')
+        end_date = search_params.get('end_date')
+        if start_date:
+            query += "AND r.report_timestamp >= ? "
+            params.append(f"{start_date} 00:00:00")
+            final_end_date = end_date if end_date else start_date
+            query += "AND r.report_timestamp <= ? "
+            params.append(f"{final_end_date} 23:59:59")
         query += "ORDER BY r.report_timestamp DESC"
-        reports = self._execute(query, tuple(params)).fetchall()
+        changed_ids = self._changed_report_ids(computer_id)
+        reports = []
+        for row in self._execute(query, tuple(params)).fetchall():
+            if search_params.get('changed_only') and row['id'] not in changed_ids:
+                continue
+            report = {'id': row['id'], 'report_timestamp': row['report_timestamp'], 'changed': row['id'] in changed_ids}
+            if use_fts:
+                report['matches'] = [line for line in row['matches'].split('\n') if HIGHLIGHT_START in line]
+            reports.append(report)
         return {"computer": computer, "reports": reports}
 
+    def _changed_report_ids(self, computer_id):
+        """ID raportów komputera, których migawka inwentarza różni się od migawki poprzedniego raportu."""
+        rows = self._execute(
+            """SELECT id, snapshot_id IS NOT LAG(snapshot_id) OVER (ORDER BY report_timestamp, id) AS changed
+               FROM reports WHERE computer_id = ?""", (computer_id,)).fetchall()
+        return {row['id'] for row in rows if row['changed']}
+
+    def search_fleet_packages(self, app_id, older_than=None, pending_only=False, after=None, limit=50):
+        """
+        Zwraca komputery, których najnowszy raport zawiera pakiet app_id (opcjonalnie: w wersji
+        starszej niż older_than lub z oczekującą aktualizacją). Stronicowanie kursorem "computer_id:wersja"
+        z poprzedniej strony (klucz 'next').
+        """
+        query = ("SELECT f.computer_id, c.hostname, f.app_id, f.name, f.version, f.available_version "
+                 "FROM fleet_packages f JOIN computers c ON c.id = f.computer_id WHERE f.app_id = ? ")
+        params = [app_id]
+        if older_than:
+            query += "AND f.version_key > '' AND f.version_key < ? "
+            params.append(version_sort_key(older_than))
+        if pending_only:
+            query += "AND f.available_version IS NOT NULL "
+        if after:
+            try:
+                after_computer, after_version = after.split(':', 1)
+                params.extend([int(after_computer), after_version])
+                query += "AND (f.computer_id, f.version) > (?, ?) "
+            except ValueError:
+                logging.warning(f"Zignorowano nieprawidłowy kursor wyszukiwania pakietów: {after}")
+        query += "ORDER BY f.computer_id, f.version LIMIT ?"
+        params.append(limit + 1)
+        rows = self._execute(query, tuple(params)).fetchall()
+        next_cursor = f"{rows[limit - 1]['computer_id']}:{rows[limit - 1]['version']}" if len(rows) > limit else None
+        return {"items": rows[:limit], "next": next_cursor}
+
     def create_task(self, computer_id, command, payload):
         json_payload = json.dumps(payload) if isinstance(payload, dict) else payload
         cursor = self._execute("INSERT INTO tasks (computer_id, command, payload) VALUES (?, ?, ?)",
-                               (computer_id, command, json_payload), commit=True)
+                               (computer_id, command, json_payload))
+        self._refresh_task_state([computer_id], commit=True)
+        self._notify_tasks([computer_id])
+        self._publish_tasks([cursor.lastrowid])
         return cursor.lastrowid
 
-    def get_pending_tasks(self, hostname):
-        computer = self._execute("SELECT id, agent_version FROM computers WHERE hostname = ? COLLATE NOCASE",
-                                 (hostname,)).fetchone()
-        if not computer: return []
-        computer_id = computer['id']
+    def create_tasks(self, tasks, batch_id=None, commit=True):
+        """
+        Dodaje wiele zadań jednym executemany w jednej transakcji. tasks to lista krotek
+        (computer_id, command, payload). Zwraca liczbę dodanych zadań.
+        """
+        rows = [(computer_id, command, json.dumps(payload) if isinstance(payload, dict) else payload, batch_id)
+                for computer_id, command, payload in tasks]
+        if not rows:
+            return 0
+        self.db.executemany("INSERT INTO tasks (computer_id, command, payload, batch_id) VALUES (?, ?, ?, ?)", rows)
+        # Nowe zadania mają status 'oczekuje', więc licznik aktywnych zadań rośnie dokładnie o ich liczbę
+        added = Counter(row[0] for row in rows)
+        self.db.executemany(
+            "UPDATE computer_state SET active_task_count = active_task_count + ? WHERE computer_id = ?",
+            [(count, computer_id) for computer_id, count in added.items()])
+        if commit:
+            self.db.commit()
+            self._notify_tasks(list(added))
+            for computer_id in added:
+                publish_event('tasks_changed', {'computer_id': computer_id})
+        return len(rows)
 
-        query = """
-        SELECT id, computer_id, command, payload, status FROM tasks 
-        WHERE computer_id = ? 
-        AND (
-            status = 'oczekuje' 
-            OR 
-            (status IN ('w toku', 'w_trakcie_wykonywania', 'w_trakcie_aktualizacji', 'oczekuje_na_uzytkownika', 'sukces_oczekuje_na_potwierdzenie') 
-             AND updated_at < datetime('now', '-15 minutes'))
-        )
+    def select_computers(self, selector):
         """
-        tasks = self._execute(query, (computer_id,)).fetchall()
+        Zwraca listę ID komputerów wskazanych selektorem zadań zbiorczych:
+        {'type': 'all'}, {'type': 'pending_update', 'app_id': X}, {'type': 'agent_version_below', 'version': V}
+        lub {'type': 'ids', 'ids': [...]}. Nieprawidłowy selektor zgłasza ValueError.
+        """
+        selector_type = (selector or {}).get('type')
+        if selector_type == 'all':
+            rows = self._execute(f"SELECT id FROM computers {FLEET_SCAN_MARKER}").fetchall()
+            return [row['id'] for row in rows]
+        if selector_type == 'pending_update':
+            if not selector.get('app_id'):
+                raise ValueError("Selektor pending_update wymaga pola app_id.")
+            rows = self._execute(
+                "SELECT DISTINCT computer_id FROM fleet_packages WHERE app_id = ? AND available_version IS NOT NULL",
+                (selector['app_id'],)).fetchall()
+            return [row['computer_id'] for row in rows]
+        if selector_type == 'agent_version_below':
+            if not selector.get('version'):
+                raise ValueError("Selektor agent_version_below wymaga pola version.")
+            limit_key = version_sort_key(selector['version'])
+            rows = self._execute(f"SELECT id, agent_version FROM computers {FLEET_SCAN_MARKER}").fetchall()
+            return [row['id'] for row in rows if version_sort_key(row['agent_version']) < limit_key]
+        if selector_type == 'ids':
+            try:
+                ids = sorted({int(computer_id) for computer_id in selector.get('ids') or []})
+            except (TypeError, ValueError):
+                raise ValueError("Selektor ids wymaga listy liczbowych ID komputerów.")
+            found = []
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                placeholders = ','.join('?' for _ in chunk)
+                found.extend(row['id'] for row in self._execute(
+                    f"SELECT id FROM computers WHERE id IN ({placeholders})", tuple(chunk)).fetchall())
+            return found
+        raise ValueError(f"Nieznany typ selektora: {selector_type}")
+
+    def create_task_batch(self, command, payload, computer_ids, selector):
+        """Zleca to samo zadanie wielu komputerom w jednej transakcji. Zwraca ID paczki."""
+        json_payload = json.dumps(payload) if isinstance(payload, dict) else payload
+        cursor = self._execute(
+            "INSERT INTO task_batches (command, payload, selector, task_count) VALUES (?, ?, ?, ?)",
+            (command, json_payload, json.dumps(selector), len(computer_ids)))
+        batch_id = cursor.lastrowid
+        self.create_tasks([(computer_id, command, json_payload) for computer_id in computer_ids], batch_id=batch_id,
+                          commit=False)
+        self.db.commit()
+        self._notify_tasks(computer_ids)
+        publish_event('batch', {'batch_id': batch_id, 'command': command, 'count': len(computer_ids)})
+        logging.info(f"Utworzono paczkę zadań {batch_id} ({command}) dla {len(computer_ids)} komputerów.")
+        return batch_id
+
+    def get_task_batch(self, batch_id):
+        """Zwraca paczkę zadań z zagregowanym postępem (liczba zadań w każdym statusie)."""
+        batch = self._execute("SELECT * FROM task_batches WHERE id = ?", (batch_id,)).fetchone()
+        if not batch: return None
+        by_status = {row['status']: row['count'] for row in self._execute(
+            "SELECT status, COUNT(*) AS count FROM tasks WHERE batch_id = ? GROUP BY status", (batch_id,)).fetchall()}
+        finished = sum(count for status, count in by_status.items() if status in FINAL_TASK_STATUSES)
+        total = sum(by_status.values())
+        return {"batch": dict(batch), "total": total, "finished": finished, "active": total - finished,
+                "by_status": by_status}
+
+    def _publish_tasks(self, task_ids):
+        """Publikuje aktualny stan zadań w strumieniu zdarzeń panelu. Wywoływać po commicie."""
+        if not task_ids: return
+        placeholders = ','.join('?' for _ in task_ids)
+        for task in self._execute(
+                f"SELECT id, computer_id, command, payload, status FROM tasks WHERE id IN ({placeholders})",
+                tuple(task_ids)).fetchall():
+            publish_event('task', dict(task))
+
+    def _notify_tasks(self, computer_ids):
+        """Budzi agentów czekających (long-poll) na zadania podanych komputerów. Wywoływać po commicie."""
+        notifier = current_app.extensions.get('task_notifier')
+        if notifier and computer_ids:
+            notifier.notify(computer_ids)
 
-        tasks_to_return = []
-        tasks_to_complete = []
+    def get_computer_id(self, hostname):
+        computer = self._execute("SELECT id FROM computers WHERE hostname = ? COLLATE NOCASE", (hostname,)).fetchone()
+        return computer['id'] if computer else None
 
+    def _lease_modifier(self):
+        return f"+{int(current_app.config['TASK_LEASE_SECONDS'])} seconds"
+
+    def get_pending_tasks(self, hostname):
+        """
+        Atomowo pobiera oczekujące zadania komputera i nadaje im dzierżawę. Zadanie pobrane przez
+        jedno zapytanie agenta nie zostanie wydane ponownie, dopóki dzierżawa nie wygaśnie.
+        Zadania self_update zachowują status 'oczekuje' i nie dostają dzierżawy - jak dotąd są wydawane
+        przy każdym zapytaniu, dopóki agent nie zmieni ich statusu.
+        """
+        cursor = self._execute(
+            """UPDATE tasks SET
+                   status = CASE WHEN command = 'self_update' THEN status ELSE 'w toku' END,
+                   lease_expires_at = CASE WHEN command = 'self_update' THEN NULL ELSE datetime('now', ?) END,
+                   updated_at = CURRENT_TIMESTAMP
+               WHERE computer_id = (SELECT id FROM computers WHERE hostname = ? COLLATE NOCASE)
+               AND status = 'oczekuje' AND (lease_expires_at IS NULL OR lease_expires_at < datetime('now'))
+               RETURNING id, computer_id, command, payload, status""",
+            (self._lease_modifier(), hostname))
+        tasks = [dict(task) for task in cursor.fetchall()]
+        self.db.commit()
         for task in tasks:
-            is_stuck = task['status'] != 'oczekuje'
-            is_self_update = task['command'] == 'self_update'
-
-            if is_stuck and is_self_update:
-                try:
-                    payload = json.loads(task['payload'])
-                    target_version = payload.get('target_version')
-
-                    if target_version and computer['agent_version']:
-                        if computer['agent_version'] >= target_version:
-                            tasks_to_complete.append(task['id'])
-                            logging.info(
-                                f"Wykryto zawieszone zadanie self_update (ID: {task['id']}), ale agent ma już aktualną wersję ({computer['agent_version']}). Zadanie zostanie zamknięte.")
-                            continue
-                    else:
-                        tasks_to_complete.append(task['id'])
-                        logging.warning(
-                            f"Wykryto i zamknięto zawieszone zadanie self_update bez numeru wersji (ID: {task['id']}), aby zapobiec niechcianym aktualizacjom.")
-                        continue
-                except (json.JSONDecodeError, TypeError, KeyError):
-                    tasks_to_complete.append(task['id'])
-                    logging.error(
-                        f"Wykryto i zamknięto zawieszone zadanie self_update z uszkodzonym payloadem (ID: {task['id']}).")
-                    continue
-
-            tasks_to_return.append(dict(task))
-
-        if tasks_to_complete:
-            placeholders = ','.join('?' for _ in tasks_to_complete)
-            self._execute(
-                f"UPDATE tasks SET status = 'zakończone', result_details = 'Zadanie zamknięte automatycznie przez serwer (agent już zaktualizowany lub zadanie przestarzałe).' WHERE id IN ({placeholders})",
-                tuple(tasks_to_complete), commit=True
-            )
-
-        if tasks_to_return:
-            task_ids_to_update = [t['id'] for t in tasks_to_return if t['command'] != 'self_update']
-            if task_ids_to_update:
-                current_app.logger.info(
-                    f"Pobrano zadania {task_ids_to_update} dla {hostname}. Zmieniam status na 'w toku'.")
-                placeholders = ','.join('?' for _ in task_ids_to_update)
-                self._execute(
-                    f"UPDATE tasks SET status = 'w toku', updated_at = CURRENT_TIMESTAMP WHERE id IN ({placeholders})",
-                    tuple(task_ids_to_update), commit=True)
-
-        return tasks_to_return
+            publish_event('task', task)
+        if tasks:
+            current_app.logger.info(
+                f"Pobrano zadania {[task['id'] for task in tasks]} dla {hostname}. Zmieniam status na 'w toku'.")
+        return sorted(tasks, key=lambda task: task['id'])
+
+    def _renew_running_task_leases(self, hostnames):
+        """
+        Przedłuża dzierżawę zadań wykonywanych przez agentów, które właśnie dały znak życia (bez commita).
+        Zawieszone self_update nie jest przedłużane - po wygaśnięciu dzierżawy sprawdza je expire_task_leases.
+        """
+        placeholders = ','.join('?' for _ in RUNNING_TASK_STATUSES)
+        self.db.executemany(
+            f"""UPDATE tasks SET lease_expires_at = datetime('now', ?)
+               WHERE computer_id = (SELECT id FROM computers WHERE hostname = ? COLLATE NOCASE)
+               AND status IN ({placeholders}) AND command != 'self_update'""",
+            [(self._lease_modifier(), hostname, *RUNNING_TASK_STATUSES) for hostname in hostnames])
+
+    def expire_task_leases(self):
+        """
+        Zwalnia zadania, których dzierżawa wygasła: wracają do kolejki ze statusem 'oczekuje'.
+        Zawieszone zadanie self_update jest zamykane, jeśli agent ma już docelową wersję
+        lub payload nie pozwala jej ustalić. UPDATE ponownie sprawdza wygaśnięcie dzierżawy - zadanie,
+        którego wynik agent zapisał po SELECT, nie wraca do kolejki. Zwraca liczbę zwolnionych zadań.
+        """
+        expired = self._execute(
+            """SELECT t.id, t.computer_id, t.command, t.payload, c.agent_version FROM tasks t
+               JOIN computers c ON c.id = t.computer_id
+               WHERE t.lease_expires_at < datetime('now')""").fetchall()
+        if not expired:
+            return 0
+        tasks_to_requeue, tasks_to_complete = [], []
+        for task in expired:
+            if task['command'] != 'self_update':
+                tasks_to_requeue.append(task['id'])
+                continue
+            try:
+                target_version = json.loads(task['payload']).get('target_version')
+            except (json.JSONDecodeError, TypeError, AttributeError):
+                tasks_to_complete.append(task['id'])
+                logging.error(
+                    f"Wykryto i zamknięto zawieszone zadanie self_update z uszkodzonym payloadem (ID: {task['id']}).")
+                continue
+            if not target_version:
+                tasks_to_complete.append(task['id'])
+                logging.warning(
+                    f"Wykryto i zamknięto zawieszone zadanie self_update bez numeru wersji (ID: {task['id']}), aby zapobiec niechcianym aktualizacjom.")
+            elif task['agent_version'] and version_sort_key(task['agent_version']) >= version_sort_key(target_version):
+                tasks_to_complete.append(task['id'])
+                logging.info(
+                    f"Wykryto zawieszone zadanie self_update (ID: {task['id']}), ale agent ma już aktualną wersję ({task['agent_version']}). Zadanie zostanie zamknięte.")
+            else:
+                tasks_to_requeue.append(task['id'])
+        requeued = self._update_expired_tasks(
+            "status = 'oczekuje', lease_expires_at = NULL, updated_at = CURRENT_TIMESTAMP", tasks_to_requeue)
+        completed = self._update_expired_tasks(
+            "status = 'zakończone', lease_expires_at = NULL, result_details = 'Zadanie zamknięte automatycznie przez serwer (agent już zaktualizowany lub zadanie przestarzałe).'",
+            tasks_to_complete)
+        if requeued:
+            logging.warning(f"Wygasła dzierżawa zadań {sorted(requeued)}. Zadania wracają do kolejki.")
+        changed = {**requeued, **completed}
+        if not changed:
+            self.db.commit()
+            return 0
+        self._refresh_task_state(changed.values(), commit=True)
+        self._publish_tasks(sorted(changed))
+        self._notify_tasks(set(requeued.values()))
+        return len(changed)
+
+    def _update_expired_tasks(self, assignments, task_ids):
+        """UPDATE zadań, których dzierżawa nadal jest wygasła (bez commita). Zwraca {id zadania: id komputera}."""
+        if not task_ids: return {}
+        placeholders = ','.join('?' for _ in task_ids)
+        rows = self._execute(
+            f"""UPDATE tasks SET {assignments}
+               WHERE id IN ({placeholders}) AND lease_expires_at < datetime('now')
+               RETURNING id, computer_id""", tuple(task_ids)).fetchall()
+        return {row['id']: row['computer_id'] for row in rows}
 
     def update_task_status(self, task_id, status, details=None):
-        self._execute("UPDATE tasks SET status = ?, result_details = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-                      (status, details, task_id), commit=True)
+        """Zapisuje status zadania. Status "w trakcie" przedłuża dzierżawę, pozostałe ją zwalniają."""
+        lease = self._lease_modifier() if status in LEASED_TASK_STATUSES else None
+        self._execute(
+            """UPDATE tasks SET status = ?, result_details = ?, updated_at = CURRENT_TIMESTAMP,
+                   lease_expires_at = CASE WHEN ? IS NULL THEN NULL ELSE datetime('now', ?) END
+               WHERE id = ?""",
+            (status, details, lease, lease, task_id))
+        task = self._execute("SELECT computer_id FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        self._refresh_task_state([task['computer_id']] if task else [], commit=True)
+        self._publish_tasks([task_id])
         logging.info(f"Zaktualizowano status zadania ID {task_id} na: {status}")
 
     def get_computer_details_by_id(self, computer_id):
@@ -315,15 +982,10 @@ class DatabaseManager:
 
     def get_report_details(self, report_id):
         report = self._execute(
-            "SELECT r.id, r.report_timestamp, c.hostname, c.ip_address FROM reports r JOIN computers c ON r.computer_id = c.id WHERE r.id = ?",
+            "SELECT r.id, r.report_timestamp, r.snapshot_id, c.hostname, c.ip_address FROM reports r JOIN computers c ON r.computer_id = c.id WHERE r.id = ?",
             (report_id,)).fetchone()
         if not report: return None
-        apps = self._execute(
-            "SELECT name, version, app_id FROM applications WHERE report_id = ? ORDER BY name COLLATE NOCASE",
-            (report_id,)).fetchall()
-        updates = self._execute(
-            "SELECT name, app_id, current_version, available_version, update_type FROM updates WHERE report_id = ? ORDER BY update_type, name COLLATE NOCASE",
-            (report_id,)).fetchall()
+        apps, updates = self._load_snapshot(report['snapshot_id'])
         return {"report": report, "apps": apps, "updates": updates}
 
     def get_active_tasks_for_computer(self, computer_id, command_filter=None):
@@ -334,10 +996,16 @@ class DatabaseManager:
             params.append(command_filter)
         return self._execute(query, tuple(params)).fetchall()
 
-    def delete_tasks(self, task_ids):
+    def delete_tasks(self, task_ids, commit=True):
         if not task_ids: return
         placeholders = ','.join('?' for _ in task_ids)
-        self._execute(f"DELETE FROM tasks WHERE id IN ({placeholders})", task_ids, commit=True)
+        computer_ids = [row['computer_id'] for row in self._execute(
+            f"SELECT DISTINCT computer_id FROM tasks WHERE id IN ({placeholders})", task_ids).fetchall()]
+        self._execute(f"DELETE FROM tasks WHERE id IN ({placeholders})", task_ids)
+        self._refresh_task_state(computer_ids, commit=commit)
+        if commit:
+            for computer_id in computer_ids:
+                publish_event('tasks_changed', {'computer_id': computer_id})
         logging.info(f"Usunięto zadania o ID: {task_ids}")
 
     def get_computer_tasks(self, computer_id):
@@ -359,27 +1027,49 @@ class DatabaseManager:
     def get_task_details(self, task_id):
         return self._execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
 
+    def get_tasks_status(self, task_ids):
+        """Zwraca słownik {id: stan zadania} dla wielu zadań naraz (zadania nieistniejące są pomijane)."""
+        statuses = {}
+        for i in range(0, len(task_ids), 500):
+            chunk = task_ids[i:i + 500]
+            placeholders = ','.join('?' for _ in chunk)
+            for task in self._execute(
+                    f"SELECT id, computer_id, command, payload, status, result_details, updated_at FROM tasks WHERE id IN ({placeholders})",
+                    tuple(chunk)).fetchall():
+                statuses[task['id']] = dict(task)
+        return statuses
+
     def get_task_status(self, task_id):
         result = self._execute("SELECT status FROM tasks WHERE id = ?", (task_id,)).fetchone()
         return result['status'] if result else None
 
     def delete_computer(self, computer_id):
+        computer = self._execute("SELECT hostname FROM computers WHERE id = ?", (computer_id,)).fetchone()
+        self._execute("DELETE FROM computer_state WHERE computer_id = ?", (computer_id,))
+        self._execute("DELETE FROM fleet_packages WHERE computer_id = ?", (computer_id,))
+        self._execute("DELETE FROM report_apps_fts WHERE rowid IN (SELECT id FROM inventory_snapshots WHERE computer_id = ?)",
+                      (computer_id,))
         self._execute("DELETE FROM computers WHERE id = ?", (computer_id,), commit=True)
+        # Walidatory zadań agenta zawierają ID komputera - podbicie licznika unieważnia je po usunięciu
+        self._notify_tasks([computer_id])
+        publish_event('computer_removed', {'computer_id': computer_id,
+                                           'hostname': computer['hostname'] if computer else None})
         logging.info(f"Usunięto komputer o ID: {computer_id}")
 
-    def cleanup_scheduled_tasks(self, computer_id):
+    def cleanup_scheduled_tasks(self, computer_id, commit=True):
         details_text = "Zadanie zakończone automatycznie po otrzymaniu nowego raportu (wynik na kliencie nieznany)."
         self._execute(
             "UPDATE tasks SET status = 'zakończone_po_restarcie', result_details = ? WHERE computer_id = ? AND status = 'zaplanowane_na_logowanie'",
-            (details_text, computer_id),
-            commit=True
+            (details_text, computer_id)
         )
+        self._refresh_task_state([computer_id], commit=commit)
         logging.info(f"Wyczyszczono przestarzałe 'zaplanowane' zadania dla komputera ID: {computer_id}")
 
     def get_pending_updates_for_computer(self, computer_id):
         query = """
-        SELECT update_type, app_id
-        FROM updates
-        WHERE report_id = (SELECT MAX(id) FROM reports WHERE computer_id = ?)
+        SELECT u.update_type, p.app_id
+        FROM updates u JOIN packages p ON p.id = u.package_id
+        WHERE u.snapshot_id = (SELECT r.snapshot_id FROM computer_state s
+                             JOIN reports r ON r.id = s.latest_report_id WHERE s.computer_id = ?)
         """
         return self._execute(query, (computer_id,)).fetchall()
\ No newline at end of file
@@ -0,0 +1,141 @@
+# winget-dashboard_new/winget_dashboard/events.py
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from flask import current_app
+
+
+class EventBus:
+    """
+    Bufor ostatnich zdarzeń panelu (zmiany zadań, nowe raporty, przejścia online/offline agentów)
+    udostępniany przeglądarce jako strumień SSE. Każde zdarzenie ma rosnący identyfikator, który
+    służy jako kursor: klient po ponownym połączeniu (Last-Event-ID) dostaje tylko pominięte zdarzenia.
+    Gdy pominięte zdarzenia wypadły już z bufora (lub serwer był restartowany), klient dostaje 'resync'.
+    Działa w obrębie jednego procesu serwera.
+    """
+
+    def __init__(self, app):
+        self.stream_timeout = app.config['EVENTS_STREAM_TIMEOUT']
+        self.keepalive_interval = app.config['EVENTS_KEEPALIVE_INTERVAL']
+        self.max_streams = app.config['EVENTS_MAX_STREAMS']
+        self._events = deque(maxlen=app.config['EVENTS_BUFFER_SIZE'])
+        self._condition = threading.Condition()
+        # Identyfikatory startują od znacznika czasu, więc kursor sprzed restartu serwera wymusza 'resync'
+        self._last_id = int(time.time() * 1000)
+        self._streams = 0
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """Rejestruje funkcję callback(event_type, data) wywoływaną w procesie serwera przy każdym zdarzeniu."""
+        self._subscribers.append(callback)
+
+    def publish(self, event_type, data):
+        with self._condition:
+            self._last_id += 1
+            self._events.append((self._last_id, event_type, data))
+            self._condition.notify_all()
+        for callback in self._subscribers:
+            try:
+                callback(event_type, data)
+            except Exception as e:
+                logging.error(f"Błąd obsługi zdarzenia '{event_type}': {e}", exc_info=True)
+
+    def last_id(self):
+        with self._condition:
+            return self._last_id
+
+    def _since(self, cursor):
+        """Zwraca (zdarzenia po kursorze, czy potrzebny resync). Wywoływać z założoną blokadą."""
+        if cursor is None:
+            return [], False
+        first_id = self._events[0][0] if self._events else self._last_id + 1
+        if cursor > self._last_id or cursor < first_id - 1:
+            return [], True
+        return [event for event in self._events if event[0] > cursor], False
+
+    def open_stream(self, cursor):
+        """Zwraca strumień ramek SSE (EventStream) albo None, gdy osiągnięto limit równoczesnych strumieni."""
+        with self._condition:
+            if self._streams >= self.max_streams:
+                return None
+            self._streams += 1
+        return EventStream(self, self._stream(cursor))
+
+    def _release_stream(self):
+        with self._condition:
+            self._streams -= 1
+
+    def _stream(self, cursor):
+        deadline = time.monotonic() + self.stream_timeout
+        yield 'retry: 3000\n\n'
+        with self._condition:
+            events, resync = self._since(cursor)
+            if cursor is None or resync:
+                cursor = self._last_id
+        if resync:
+            yield _format_event(cursor, 'resync', {})
+        while True:
+            for event_id, event_type, data in events:
+                yield _format_event(event_id, event_type, data)
+                cursor = event_id
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            with self._condition:
+                if self._last_id == cursor:
+                    self._condition.wait(min(self.keepalive_interval, remaining))
+                events, resync = self._since(cursor)
+            if resync:
+                with self._condition:
+                    cursor = self._last_id
+                yield _format_event(cursor, 'resync', {})
+            elif not events:
+                yield ': keepalive\n\n'
+
+
+class EventStream:
+    """
+    Ramki SSE jednego klienta. Miejsce w limicie EVENTS_MAX_STREAMS zwalnia close(), które serwer WSGI
+    wywołuje po zakończeniu odpowiedzi - także wtedy, gdy klient rozłączył się przed pierwszą ramką
+    i generator nigdy nie wystartował.
+    """
+
+    def __init__(self, bus, frames):
+        self._bus = bus
+        self._frames = frames
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        return self._frames
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._frames.close()
+        self._bus._release_stream()
+
+
+def _format_event(event_id, event_type, data):
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def publish_event(event_type, data, app=None):
+    """Publikuje zdarzenie, jeśli aplikacja ma zainicjowany EventBus."""
+    app = app or current_app
+    bus = app.extensions.get('events')
+    if bus:
+        bus.publish(event_type, data)
+
+
+def get_event_bus():
+    return current_app.extensions['events']
+
+
+def init_app(app):
+    app.extensions['events'] = EventBus(app)
@@ -0,0 +1,201 @@
+# winget-dashboard_new/winget_dashboard/ingest.py
+
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from flask import current_app
+from .catalog import clear_package_catalog
+from .events import publish_event
+from .inventory import InventoryDeltaError
+
+
+def _is_busy_error(error):
+    """Czy błąd SQLite oznacza blokadę bazy przez inny zapis (SQLITE_BUSY / SQLITE_LOCKED)."""
+    name = getattr(error, 'sqlite_errorname', '') or ''
+    return name.startswith(('SQLITE_BUSY', 'SQLITE_LOCKED')) or 'locked' in str(error) or 'busy' in str(error)
+
+
+class ReportIngestQueue:
+    """
+    Kolejka zapisu raportów w tle. Endpoint /api/report tylko waliduje i kolejkuje dane,
+    a jeden wątek zapisujący pobiera wiele raportów naraz i zapisuje je w jednej transakcji
+    (group commit). Każdy raport ma własny SAVEPOINT, więc błędny raport nie cofa pozostałych.
+    Transakcja zaczyna się od BEGIN IMMEDIATE - blokada zapisu jest brana od razu, więc zapis innego
+    wątku między odczytem a pierwszym zapisem paczki nie unieważnia jej migawki. Gdy baza jest zajęta,
+    cała paczka jest ponawiana (INGEST_RETRY_ATTEMPTS razy), zamiast liczyć jej raporty jako błędne.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.batch_size = app.config['INGEST_BATCH_SIZE']
+        self.flush_interval = app.config['INGEST_FLUSH_INTERVAL']
+        self.retry_attempts = max(1, app.config['INGEST_RETRY_ATTEMPTS'])
+        self.retry_delay = app.config['INGEST_RETRY_DELAY']
+        self._queue = queue.Queue(maxsize=app.config['INGEST_QUEUE_MAX'])
+        self._lock = threading.Lock()
+        self._writer = None
+        self._stopping = threading.Event()
+        self._stats = {
+            'accepted': 0, 'rejected': 0, 'processed': 0, 'failed': 0, 'batches': 0,
+            'last_batch_size': 0, 'last_flush_ms': 0.0, 'max_flush_ms': 0.0, 'total_flush_ms': 0.0,
+            'last_queue_wait_ms': 0.0, 'retries': 0,
+        }
+
+    def submit(self, data):
+        """Dodaje raport do kolejki. Zwraca False, gdy kolejka jest pełna."""
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((time.monotonic(), data))
+        except queue.Full:
+            with self._lock:
+                self._stats['rejected'] += 1
+            logging.warning(f"Kolejka raportów jest pełna. Odrzucono raport od {data.get('hostname')}.")
+            return False
+        with self._lock:
+            self._stats['accepted'] += 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['queue_capacity'] = self._queue.maxsize
+        stats['avg_flush_ms'] = round(stats.pop('total_flush_ms') / stats['batches'], 2) if stats['batches'] else 0.0
+        stats['writer_alive'] = bool(self._writer and self._writer.is_alive())
+        return stats
+
+    def stop(self, timeout=10):
+        """Zatrzymuje wątek zapisujący po opróżnieniu kolejki."""
+        self._stopping.set()
+        if self._writer and self._writer.is_alive():
+            self._writer.join(timeout)
+
+    def _ensure_writer(self):
+        if self._writer and self._writer.is_alive():
+            return
+        with self._lock:
+            if self._writer and self._writer.is_alive():
+                return
+            self._writer = threading.Thread(target=self._run, name='report-ingest-writer', daemon=True)
+            self._writer.start()
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        logging.info("Uruchomiono wątek zapisu raportów w tle.")
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                try:
+                    self._flush_with_retry(batch)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+
+    def _flush_with_retry(self, batch):
+        for attempt in range(1, self.retry_attempts + 1):
+            try:
+                self._flush(batch)
+                return
+            except sqlite3.OperationalError as e:
+                if attempt < self.retry_attempts and _is_busy_error(e):
+                    logging.warning(f"Baza zajęta przy zapisie paczki {len(batch)} raportów ({e}) - "
+                                    f"ponowienie {attempt}/{self.retry_attempts - 1}.")
+                    with self._lock:
+                        self._stats['retries'] += 1
+                    time.sleep(self.retry_delay * attempt)
+                    continue
+                error = e
+            except Exception as e:
+                error = e
+            logging.error(f"Krytyczny błąd zapisu paczki {len(batch)} raportów: {error}", exc_info=error)
+            with self._lock:
+                self._stats['failed'] += len(batch)
+            return
+
+    def _flush(self, batch):
+        from .db import DatabaseManager
+
+        started = time.monotonic()
+        processed, failed = 0, 0
+        saved = []
+        with self.app.app_context():
+            db_manager = DatabaseManager()
+            db = db_manager.db
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                for _, data in batch:
+                    db.execute("SAVEPOINT ingest_report")
+                    try:
+                        computer_id, created = db_manager.process_report(data)
+                        db.execute("RELEASE SAVEPOINT ingest_report")
+                        saved.append((computer_id, created, data))
+                        processed += 1
+                    except InventoryDeltaError as e:
+                        # Baza raportu zmieniła się, zanim raport doczekał zapisu - przy kolejnym raporcie
+                        # serwer odpowie agentowi 409 i agent wyśle pełną listę aplikacji.
+                        clear_package_catalog()
+                        db.execute("ROLLBACK TO SAVEPOINT ingest_report")
+                        db.execute("RELEASE SAVEPOINT ingest_report")
+                        failed += 1
+                        logging.warning(f"Odrzucono raport różnicowy: {e}")
+                    except sqlite3.Error as e:
+                        if isinstance(e, sqlite3.OperationalError) and _is_busy_error(e):
+                            # Blokada bazy - wycofywana i ponawiana jest cała paczka
+                            raise
+                        clear_package_catalog()
+                        db.execute("ROLLBACK TO SAVEPOINT ingest_report")
+                        db.execute("RELEASE SAVEPOINT ingest_report")
+                        failed += 1
+                        logging.error(f"Błąd zapisu raportu od {data.get('hostname')}: {e}", exc_info=True)
+                db.commit()
+            except Exception:
+                clear_package_catalog()
+                db.rollback()
+                raise
+            presence = self.app.extensions.get('presence')
+            for computer_id, created, data in saved:
+                if presence:
+                    presence.observe_report(data)
+                publish_event('report', {'computer_id': computer_id, 'hostname': data.get('hostname'),
+                                         'created': created}, self.app)
+
+        finished = time.monotonic()
+        flush_ms = (finished - started) * 1000
+        with self._lock:
+            self._stats['processed'] += processed
+            self._stats['failed'] += failed
+            self._stats['batches'] += 1
+            self._stats['last_batch_size'] = len(batch)
+            self._stats['last_flush_ms'] = round(flush_ms, 2)
+            self._stats['max_flush_ms'] = round(max(self._stats['max_flush_ms'], flush_ms), 2)
+            self._stats['total_flush_ms'] += flush_ms
+            self._stats['last_queue_wait_ms'] = round((started - batch[0][0]) * 1000, 2)
+        logging.info(f"Zapisano paczkę {processed} raportów w {flush_ms:.1f} ms (błędy: {failed}).")
+
+
+def get_ingest_queue():
+    return current_app.extensions['report_ingest']
+
+
+def init_app(app):
+    ingest_queue = ReportIngestQueue(app)
+    app.extensions['report_ingest'] = ingest_queue
+    atexit.register(ingest_queue.stop)
@@ -0,0 +1,32 @@
+# winget-dashboard_new/winget_dashboard/inventory.py
+
+import hashlib
+import json
+
+
+class InventoryDeltaError(ValueError):
+    """Różnica inwentarza nie pasuje do stanu na serwerze - agent musi wysłać pełną listę."""
+
+
+def snapshot_hash(app_rows, update_rows):
+    """
+    Skrót zawartości migawki inwentarza: wiersze aplikacji (nazwa, wersja, id) i aktualizacji
+    (nazwa, id, wersja bieżąca, wersja dostępna, typ) w postaci, w jakiej trafiają do bazy.
+    Kolejność wierszy nie ma znaczenia, a wartości są sprowadzane do tekstu jak w kolumnach TEXT.
+    """
+    def lines(rows):
+        return sorted(json.dumps([None if value is None else str(value) for value in row], ensure_ascii=False)
+                      for row in rows)
+    payload = '\n'.join(lines(app_rows)) + '\n--\n' + '\n'.join(lines(update_rows))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def validate_delta(delta):
+    """Sprawdza strukturę pola inventory_delta raportu. Zwraca komunikat błędu albo None."""
+    if not isinstance(delta, dict) or not isinstance(delta.get('base'), str) or not isinstance(delta.get('hash'), str):
+        return "inventory_delta wymaga pól base i hash."
+    for field in ('added', 'removed', 'changed'):
+        entries = delta.get(field, [])
+        if not isinstance(entries, list) or not all(isinstance(entry, dict) for entry in entries):
+            return f"inventory_delta.{field} musi być listą obiektów."
+    return None
@@ -0,0 +1,481 @@
+# winget-dashboard_new/winget_dashboard/migrations.py
+
+import logging
+import re
+import sqlite3
+from flask import current_app, g
+
+# Tabela z historią zastosowanych migracji. Najwyższy numer wersji to aktualna wersja schematu.
+MIGRATIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    description TEXT NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+def _m001_computer_state(db):
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS computer_state (
+        computer_id INTEGER PRIMARY KEY,
+        latest_report_id INTEGER,
+        app_update_count INTEGER NOT NULL DEFAULT 0,
+        os_update_count INTEGER NOT NULL DEFAULT 0,
+        reboot_required BOOLEAN DEFAULT FALSE,
+        last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        active_task_count INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (computer_id) REFERENCES computers (id) ON DELETE CASCADE,
+        FOREIGN KEY (latest_report_id) REFERENCES reports (id) ON DELETE SET NULL
+    )""")
+    # Stan liczony w schemacie z tej wersji (aktualizacje powiązane z raportem). rebuild_computer_state
+    # korzysta już z migawek inwentarza z migracji 9, więc nie może być tu wywołane.
+    db.execute("""
+    INSERT INTO computer_state
+        (computer_id, latest_report_id, app_update_count, os_update_count, reboot_required, last_seen)
+    SELECT c.id, lr.report_id,
+        (SELECT COUNT(*) FROM updates u WHERE u.report_id = lr.report_id AND u.update_type = 'APP'),
+        (SELECT COUNT(*) FROM updates u WHERE u.report_id = lr.report_id AND u.update_type = 'OS'),
+        c.reboot_required, c.last_report
+    FROM computers c
+    LEFT JOIN (SELECT computer_id, MAX(id) AS report_id FROM reports GROUP BY computer_id) lr
+        ON lr.computer_id = c.id""")
+    from .db import DatabaseManager
+    DatabaseManager()._refresh_task_state([row['id'] for row in db.execute("SELECT id FROM computers").fetchall()])
+
+
+_M002_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_computers_hostname_nocase ON computers (hostname COLLATE NOCASE)",
+    "CREATE INDEX IF NOT EXISTS idx_reports_computer_ts ON reports (computer_id, report_timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_applications_report ON applications (report_id)",
+    "CREATE INDEX IF NOT EXISTS idx_updates_report_type ON updates (report_id, update_type)",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_computer_status ON tasks (computer_id, status)",
+]
+
+_M003_REPORT_ARCHIVES = [
+    """CREATE TABLE IF NOT EXISTS report_archives (
+        report_id INTEGER PRIMARY KEY,
+        format TEXT NOT NULL,
+        payload BLOB NOT NULL,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (report_id) REFERENCES reports (id) ON DELETE CASCADE
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_reports_timestamp ON reports (report_timestamp)",
+]
+
+
+def _m004_report_apps_fts(db):
+    # Jeden dokument na raport (rowid = id raportu): kolumna computer to "#<id komputera>#",
+    # a apps to linie "Nazwa (Id)" wszystkich aplikacji raportu. Tokenizer trigram daje wyszukiwanie podciągów.
+    db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS report_apps_fts USING fts5(computer, apps, tokenize = 'trigram')")
+    db.execute("""
+        INSERT INTO report_apps_fts (rowid, computer, apps)
+        SELECT r.id, '#' || r.computer_id || '#',
+               group_concat(IFNULL(a.name, '') || ' (' || IFNULL(a.app_id, '') || ')', char(10))
+        FROM reports r JOIN applications a ON a.report_id = r.id
+        GROUP BY r.id""")
+    from .db import fts_computer_key, fts_apps_document
+    from .retention import unpack_inventory
+    archived = db.execute(
+        "SELECT ra.report_id, ra.payload, r.computer_id FROM report_archives ra JOIN reports r ON r.id = ra.report_id"
+    ).fetchall()
+    for row in archived:
+        apps, _ = unpack_inventory(row['payload'])
+        db.execute("INSERT INTO report_apps_fts (rowid, computer, apps) VALUES (?, ?, ?)",
+                   (row['report_id'], fts_computer_key(row['computer_id']), fts_apps_document(apps)))
+
+
+def _m005_fleet_packages(db):
+    # Odwrócony indeks (app_id, wersja) -> komputery, liczony z najnowszego raportu każdego komputera.
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS fleet_packages (
+        app_id TEXT NOT NULL COLLATE NOCASE,
+        computer_id INTEGER NOT NULL,
+        version TEXT NOT NULL DEFAULT '',
+        version_key TEXT NOT NULL DEFAULT '',
+        name TEXT,
+        available_version TEXT,
+        PRIMARY KEY (app_id, computer_id, version),
+        FOREIGN KEY (computer_id) REFERENCES computers (id) ON DELETE CASCADE
+    ) WITHOUT ROWID""")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_fleet_packages_computer ON fleet_packages (computer_id)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_fleet_packages_version ON fleet_packages (app_id, version_key)")
+    db.execute("""CREATE INDEX IF NOT EXISTS idx_fleet_packages_pending ON fleet_packages (app_id, computer_id)
+                  WHERE available_version IS NOT NULL""")
+    # Inwentarz czytany w schemacie z tej wersji (aplikacje powiązane z raportem) - jak w _m001.
+    from .db import DatabaseManager
+    db_manager = DatabaseManager()
+    for row in db.execute(
+            "SELECT computer_id, latest_report_id FROM computer_state WHERE latest_report_id IS NOT NULL").fetchall():
+        apps = db.execute("SELECT name, version, app_id AS id FROM applications WHERE report_id = ?",
+                          (row['latest_report_id'],)).fetchall()
+        updates = db.execute(
+            "SELECT app_id AS id, available_version FROM updates WHERE report_id = ? AND update_type = 'APP'",
+            (row['latest_report_id'],)).fetchall()
+        db_manager._sync_fleet_packages(row['computer_id'], [dict(app) for app in apps],
+                                        [dict(update) for update in updates])
+
+
+def _m006_task_leases(db):
+    # Kolumna dzierżawy zadań. Zadania już będące w toku dostają dzierżawę liczoną od ostatniej zmiany statusu.
+    from .db import LEASED_TASK_STATUSES
+    db.execute("ALTER TABLE tasks ADD COLUMN lease_expires_at TIMESTAMP")
+    placeholders = ','.join('?' for _ in LEASED_TASK_STATUSES)
+    db.execute(f"UPDATE tasks SET lease_expires_at = datetime(updated_at, ?) WHERE status IN ({placeholders})",
+               (f"+{int(current_app.config['TASK_LEASE_SECONDS'])} seconds", *LEASED_TASK_STATUSES))
+    db.execute("DROP INDEX IF EXISTS idx_tasks_computer_status")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_tasks_computer_status_lease ON tasks (computer_id, status, lease_expires_at)")
+    db.execute("""CREATE INDEX IF NOT EXISTS idx_tasks_lease_expiry ON tasks (lease_expires_at)
+                  WHERE lease_expires_at IS NOT NULL""")
+
+
+_M007_TASK_BATCHES = [
+    """CREATE TABLE IF NOT EXISTS task_batches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        command TEXT NOT NULL,
+        payload TEXT,
+        selector TEXT NOT NULL,
+        task_count INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    "ALTER TABLE tasks ADD COLUMN batch_id INTEGER REFERENCES task_batches (id) ON DELETE SET NULL",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_batch_status ON tasks (batch_id, status) WHERE batch_id IS NOT NULL",
+]
+
+_M008_INVENTORY_HASH = [
+    "ALTER TABLE computer_state ADD COLUMN inventory_hash TEXT",
+]
+
+
+def _m009_inventory_snapshots(db):
+    # Inwentarz (aplikacje i aktualizacje) przechowywany raz na migawkę o danej treści zamiast kopii na każdy
+    # raport. Raport wskazuje migawkę, archiwum raportów z migracji 3 staje się archiwum migawek, a indeks
+    # FTS dostaje jeden dokument na migawkę (rowid = id migawki).
+    from .db import fts_computer_key, fts_apps_document
+    from .inventory import snapshot_hash
+    from .retention import unpack_inventory
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS inventory_snapshots (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        computer_id INTEGER NOT NULL,
+        content_hash TEXT NOT NULL,
+        app_count INTEGER NOT NULL DEFAULT 0,
+        app_update_count INTEGER NOT NULL DEFAULT 0,
+        os_update_count INTEGER NOT NULL DEFAULT 0,
+        archive_format TEXT,
+        archive BLOB,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (computer_id, content_hash),
+        FOREIGN KEY (computer_id) REFERENCES computers (id) ON DELETE CASCADE
+    )""")
+    db.execute("ALTER TABLE reports ADD COLUMN snapshot_id INTEGER REFERENCES inventory_snapshots (id) ON DELETE SET NULL")
+    db.execute("""
+    CREATE TABLE snapshot_applications (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        snapshot_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        version TEXT,
+        app_id TEXT,
+        FOREIGN KEY (snapshot_id) REFERENCES inventory_snapshots (id) ON DELETE CASCADE
+    )""")
+    db.execute("""
+    CREATE TABLE snapshot_updates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        snapshot_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        app_id TEXT,
+        current_version TEXT,
+        available_version TEXT,
+        update_type TEXT NOT NULL,
+        FOREIGN KEY (snapshot_id) REFERENCES inventory_snapshots (id) ON DELETE CASCADE
+    )""")
+    db.execute("DELETE FROM report_apps_fts")
+
+    snapshots = {}
+    for report in db.execute("SELECT id, computer_id FROM reports ORDER BY id").fetchall():
+        archive = db.execute("SELECT format, payload FROM report_archives WHERE report_id = ?",
+                             (report['id'],)).fetchone()
+        if archive:
+            apps, updates = unpack_inventory(archive['payload'])
+        else:
+            apps = db.execute("SELECT name, version, app_id FROM applications WHERE report_id = ?",
+                              (report['id'],)).fetchall()
+            updates = db.execute(
+                "SELECT name, app_id, current_version, available_version, update_type FROM updates WHERE report_id = ?",
+                (report['id'],)).fetchall()
+        app_rows = [(app['name'], app['version'], app['app_id']) for app in apps]
+        update_rows = [(update['name'], update['app_id'], update['current_version'], update['available_version'],
+                        update['update_type']) for update in updates]
+        key = (report['computer_id'], snapshot_hash(app_rows, update_rows))
+        snapshot = snapshots.get(key)
+        if snapshot is None:
+            snapshot_id = db.execute(
+                """INSERT INTO inventory_snapshots (computer_id, content_hash, app_count, app_update_count,
+                   os_update_count, archive_format, archive) VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (report['computer_id'], key[1], len(app_rows), sum(1 for row in update_rows if row[4] == 'APP'),
+                 sum(1 for row in update_rows if row[4] == 'OS'),
+                 archive['format'] if archive else None, archive['payload'] if archive else None)).lastrowid
+            if app_rows:
+                db.execute("INSERT INTO report_apps_fts (rowid, computer, apps) VALUES (?, ?, ?)",
+                           (snapshot_id, fts_computer_key(report['computer_id']),
+                            fts_apps_document({'name': row[0], 'app_id': row[2]} for row in app_rows)))
+            snapshot = snapshots[key] = {'id': snapshot_id, 'archived': bool(archive), 'has_rows': False}
+        if not archive and not snapshot['has_rows']:
+            # Wiersze są potrzebne, gdy choć jeden raport z tą treścią nie był zarchiwizowany.
+            db.executemany("INSERT INTO snapshot_applications (snapshot_id, name, version, app_id) VALUES (?, ?, ?, ?)",
+                           [(snapshot['id'], *row) for row in app_rows])
+            db.executemany(
+                """INSERT INTO snapshot_updates (snapshot_id, name, app_id, current_version, available_version,
+                   update_type) VALUES (?, ?, ?, ?, ?, ?)""", [(snapshot['id'], *row) for row in update_rows])
+            if snapshot['archived']:
+                db.execute("UPDATE inventory_snapshots SET archive_format = NULL, archive = NULL WHERE id = ?",
+                           (snapshot['id'],))
+            snapshot['has_rows'] = True
+        db.execute("UPDATE reports SET snapshot_id = ? WHERE id = ?", (snapshot['id'], report['id']))
+
+    for table in ('applications', 'updates', 'report_archives'):
+        db.execute(f"DROP TABLE {table}")
+    db.execute("ALTER TABLE snapshot_applications RENAME TO applications")
+    db.execute("ALTER TABLE snapshot_updates RENAME TO updates")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_applications_snapshot ON applications (snapshot_id)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_updates_snapshot_type ON updates (snapshot_id, update_type)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_reports_snapshot ON reports (snapshot_id)")
+    logging.info(f"Zamieniono inwentarz raportów na {len(snapshots)} migawek.")
+
+
+def _m010_package_catalog(db):
+    # Słownik pakietów (app_id, nazwa) i wersji - wiersze migawek przechowują tylko identyfikatory liczbowe.
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS packages (
+        id INTEGER PRIMARY KEY,
+        app_id TEXT,
+        name TEXT NOT NULL
+    )""")
+    db.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_packages_app_name ON packages (app_id, name)")
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS package_versions (
+        id INTEGER PRIMARY KEY,
+        version TEXT NOT NULL UNIQUE
+    )""")
+    db.execute("""
+    INSERT INTO packages (app_id, name)
+    SELECT app_id, name FROM applications UNION SELECT app_id, name FROM updates""")
+    db.execute("""
+    INSERT INTO package_versions (version)
+    SELECT version FROM applications WHERE version IS NOT NULL
+    UNION SELECT current_version FROM updates WHERE current_version IS NOT NULL
+    UNION SELECT available_version FROM updates WHERE available_version IS NOT NULL""")
+    db.execute("""
+    CREATE TABLE catalog_applications (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        snapshot_id INTEGER NOT NULL,
+        package_id INTEGER NOT NULL,
+        version_id INTEGER,
+        FOREIGN KEY (snapshot_id) REFERENCES inventory_snapshots (id) ON DELETE CASCADE,
+        FOREIGN KEY (package_id) REFERENCES packages (id),
+        FOREIGN KEY (version_id) REFERENCES package_versions (id)
+    )""")
+    db.execute("""
+    CREATE TABLE catalog_updates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        snapshot_id INTEGER NOT NULL,
+        package_id INTEGER NOT NULL,
+        current_version_id INTEGER,
+        available_version_id INTEGER,
+        update_type TEXT NOT NULL,
+        FOREIGN KEY (snapshot_id) REFERENCES inventory_snapshots (id) ON DELETE CASCADE,
+        FOREIGN KEY (package_id) REFERENCES packages (id),
+        FOREIGN KEY (current_version_id) REFERENCES package_versions (id),
+        FOREIGN KEY (available_version_id) REFERENCES package_versions (id)
+    )""")
+    db.execute("""
+    INSERT INTO catalog_applications (id, snapshot_id, package_id, version_id)
+    SELECT a.id, a.snapshot_id, p.id, v.id FROM applications a
+    JOIN packages p ON p.app_id IS a.app_id AND p.name = a.name
+    LEFT JOIN package_versions v ON v.version = a.version""")
+    db.execute("""
+    INSERT INTO catalog_updates (id, snapshot_id, package_id, current_version_id, available_version_id, update_type)
+    SELECT u.id, u.snapshot_id, p.id, cv.id, av.id, u.update_type FROM updates u
+    JOIN packages p ON p.app_id IS u.app_id AND p.name = u.name
+    LEFT JOIN package_versions cv ON cv.version = u.current_version
+    LEFT JOIN package_versions av ON av.version = u.available_version""")
+    db.execute("DROP TABLE applications")
+    db.execute("DROP TABLE updates")
+    db.execute("ALTER TABLE catalog_applications RENAME TO applications")
+    db.execute("ALTER TABLE catalog_updates RENAME TO updates")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_applications_snapshot ON applications (snapshot_id)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_updates_snapshot_type ON updates (snapshot_id, update_type)")
+
+
+# Lista migracji w kolejności: (wersja, opis, lista poleceń SQL lub funkcja przyjmująca połączenie).
+MIGRATIONS = [
+    (1, "Tabela computer_state ze zbiorczym stanem komputerów", _m001_computer_state),
+    (2, "Indeksy dla raportów, aplikacji, aktualizacji, zadań i nazw hostów", _M002_INDEXES),
+    (3, "Archiwum skompresowanego inwentarza starych raportów", _M003_REPORT_ARCHIVES),
+    (4, "Indeks pełnotekstowy (FTS5, trigram) aplikacji z historii raportów", _m004_report_apps_fts),
+    (5, "Odwrócony indeks pakietów floty (app_id, wersja) -> komputery", _m005_fleet_packages),
+    (6, "Dzierżawa zadań (lease_expires_at) i indeksy kolejki zadań", _m006_task_leases),
+    (7, "Paczki zadań zlecanych zbiorczo (task_batches, tasks.batch_id)", _M007_TASK_BATCHES),
+    (8, "Skrót inwentarza najnowszego raportu dla raportów różnicowych", _M008_INVENTORY_HASH),
+    (9, "Migawki inwentarza adresowane treścią zamiast kopii aplikacji i aktualizacji w każdym raporcie",
+     _m009_inventory_snapshots),
+    (10, "Słownik pakietów i wersji - identyfikatory liczbowe w applications i updates", _m010_package_catalog),
+]
+
+
+def get_schema_version(db):
+    """Zwraca numer ostatniej zastosowanej migracji (0 dla bazy bez historii migracji)."""
+    table = db.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations'").fetchone()
+    if not table:
+        return 0
+    row = db.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+    return row[0] or 0
+
+
+def upgrade(db):
+    """Stosuje wszystkie brakujące migracje. Każda migracja wykonuje się w osobnej transakcji."""
+    db.execute(MIGRATIONS_TABLE_SQL)
+    db.commit()
+    current_version = get_schema_version(db)
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if version <= current_version:
+            continue
+        try:
+            db.execute("BEGIN")
+            if callable(step):
+                step(db)
+            else:
+                for statement in step:
+                    db.execute(statement)
+            db.execute("INSERT INTO schema_migrations (version, description) VALUES (?, ?)", (version, description))
+            db.commit()
+        except sqlite3.Error:
+            db.rollback()
+            logging.error(f"Migracja {version} ({description}) nie powiodła się.", exc_info=True)
+            raise
+        logging.info(f"Zastosowano migrację schematu {version}: {description}")
+        applied.append(version)
+    return applied
+
+
+# --- Kontrola planów zapytań ---
+
+_FULL_SCAN_RE = re.compile(r'^SCAN (?!\(|CONSTANT ROW)(\S+)$')
+# Komentarz oznaczający zapytanie, które z założenia czyta wszystkie komputery - kontrola planów je pomija.
+FLEET_SCAN_MARKER = '/* fleet-scan */'
+_SHADOW_TABLE_RE = re.compile(r"'main'\.'\w+_(config|data|idx|docsize|content)'")
+
+
+def _run_query_workload(db_manager):
+    """Wywołuje wszystkie metody DatabaseManager, które obsługują ruch agentów i panelu."""
+    from inventory_sync import inventory_hash
+
+    report = {
+        'hostname': 'PLAN-CHECK', 'ip_address': '127.0.0.1', 'agent_version': '1.0.0', 'reboot_required': False,
+        'installed_apps': [{'name': 'Git', 'id': 'Git.Git', 'version': '2.0'}],
+        'available_app_updates': [{'name': 'Git', 'id': 'Git.Git', 'version': '2.0', 'available_version': '2.1'}],
+        'pending_os_updates': [{'Title': 'Aktualizacja', 'KB': '1'}],
+    }
+    computer_id = db_manager.save_report(report)
+    db_manager.save_report(report)
+    delta = {'base': db_manager.get_inventory_hash('plan-check'),
+             'hash': inventory_hash([{'name': 'Git', 'id': 'Git.Git', 'version': '2.1'},
+                                     {'name': 'Vim', 'id': 'vim.vim', 'version': '9.0'}]),
+             'added': [{'name': 'Vim', 'id': 'vim.vim', 'version': '9.0'}], 'removed': [],
+             'changed': [{'name': 'Git', 'id': 'Git.Git', 'version': '2.1', 'previous_version': '2.0'}]}
+    db_manager.resolve_inventory_delta('plan-check', delta)
+    db_manager.save_report({**{k: v for k, v in report.items() if k != 'installed_apps'}, 'inventory_delta': delta})
+    db_manager.process_report({**report, 'hostname': 'plan-check-2'})
+    db_manager.db.commit()
+    db_manager.rebuild_computer_state()
+    db_manager.rebuild_fleet_packages()
+    db_manager.save_heartbeats([{'hostname': 'plan-check', 'last_seen': '2024-01-01 00:00:00',
+                                 'reboot_required': True, 'changed': {'reboot_required': True}}])
+    db_manager.get_all_computers()
+    page = db_manager.get_computer_overview(420, limit=1)
+    db_manager.get_computer_overview(420, status='updates', search='plan', after=page['next'])
+    db_manager.get_computer_overview(420, status='offline', sort='last_report', descending=True)
+    db_manager.get_fleet_summary(420)
+    db_manager.get_computer_details('plan-check')
+    db_manager.get_computer_details_by_id(computer_id)
+    db_manager.get_computer_history('plan-check', {'keyword': 'git', 'start_date': '2024-01-01'})
+    db_manager.get_computer_history('plan-check', {'keyword': 'gi'})
+    db_manager.get_computer_history('plan-check', {'changed_only': '1'})
+    page = db_manager.search_fleet_packages('git.git', limit=1)
+    db_manager.search_fleet_packages('Git.Git', older_than='2.1', after=page['next'])
+    db_manager.search_fleet_packages('Git.Git', pending_only=True)
+    latest = db_manager.get_computer_details('plan-check')['computer']
+    db_manager.get_computer_blacklist(latest['hostname'])
+    db_manager.update_computer_blacklist(latest['hostname'], 'office')
+    task_id = db_manager.create_task(computer_id, 'request_update', 'Git.Git')
+    db_manager.create_task(computer_id, 'self_update', {'download_path': '/x', 'target_version': '1.0.0'})
+    db_manager.get_pending_tasks('plan-check')
+    for selector in ({'type': 'all'}, {'type': 'pending_update', 'app_id': 'Git.Git'},
+                     {'type': 'agent_version_below', 'version': '2.0.0'}, {'type': 'ids', 'ids': [computer_id]}):
+        batch_id = db_manager.create_task_batch('request_update', 'Git.Git',
+                                                db_manager.select_computers(selector), selector)
+    db_manager.get_task_batch(batch_id)
+    db_manager.create_tasks([(computer_id, 'request_os_update', 'os_update')])
+    db_manager.update_task_status(task_id, 'zaplanowane_na_logowanie')
+    db_manager.get_task_details(task_id)
+    db_manager.get_task_status(task_id)
+    db_manager.get_tasks_status([task_id, batch_id])
+    db_manager.get_computer_tasks(computer_id)
+    db_manager.get_pending_updates_for_computer(computer_id)
+    db_manager.expire_task_leases()
+    db_manager.cleanup_scheduled_tasks(computer_id)
+    active = db_manager.get_active_tasks_for_computer(computer_id, command_filter='update')
+    db_manager.delete_tasks([task_id] + [t['id'] for t in active])
+    report_row = db_manager.get_computer_history('plan-check')['reports'][0]
+    db_manager.get_report_details(report_row['id'])
+    db_manager.update_agent_update_status('plan-check', 'sukces')
+    db_manager.confirm_agent_update('plan-check')
+    db_manager.delete_computer(computer_id)
+
+
+def check_query_plans():
+    """
+    Uruchamia zestaw zapytań DatabaseManager na bazie w pamięci (schemat + migracje) i sprawdza
+    EXPLAIN QUERY PLAN każdego z nich. Zwraca listę (zapytanie, plan) dla zapytań, które
+    przeszukują całą tabelę bez użycia indeksu.
+    """
+    from .catalog import clear_package_catalog
+    from .db import DatabaseManager, connect
+
+    memory_db = connect(':memory:')
+    previous_db = g.pop('db', None)
+    g.db = memory_db
+    statements = []
+    try:
+        with current_app.open_resource('schema.sql') as f:
+            memory_db.executescript(f.read().decode('utf8'))
+        upgrade(memory_db)
+        # Identyfikatory słownika pakietów w pamięci procesu dotyczą właściwej bazy, nie bazy w pamięci.
+        clear_package_catalog()
+        memory_db.set_trace_callback(statements.append)
+        _run_query_workload(DatabaseManager())
+        memory_db.set_trace_callback(None)
+
+        problems = []
+        for statement in dict.fromkeys(statements):
+            if not statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'WITH')):
+                continue
+            if _SHADOW_TABLE_RE.search(statement):
+                continue  # wewnętrzne zapytania FTS5 do jego tabel pomocniczych
+            if FLEET_SCAN_MARKER in statement:
+                continue  # zapytania celowo przeglądające całą flotę (np. selektory zadań zbiorczych)
+            try:
+                plan = [row['detail'] for row in memory_db.execute(f"EXPLAIN QUERY PLAN {statement}").fetchall()]
+            except sqlite3.Error:
+                continue
+            if any(_FULL_SCAN_RE.match(detail) for detail in plan):
+                problems.append((statement, plan))
+        return problems
+    finally:
+        clear_package_catalog()
+        g.pop('db', None)
+        memory_db.close()
+        if previous_db is not None:
+            g.db = previous_db
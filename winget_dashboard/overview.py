@@ -0,0 +1,94 @@
+# winget-dashboard_new/winget_dashboard/overview.py
+
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from .db import DatabaseManager, OVERVIEW_SORT_COLUMNS, OVERVIEW_STATUS_FILTERS
+
+
+class FleetOverviewCache:
+    """
+    Pamięć podręczna stron przeglądu floty (strona główna i /api/computers). Zdarzenia z EventBus
+    unieważniają wpisy tylko przy zmianie składu floty (nowy lub usunięty komputer) i zmianie czarnej
+    listy. Częste zdarzenia (raporty, zadania, przejścia online/offline) domyka OVERVIEW_CACHE_TTL -
+    przy setkach agentów każde z nich czyściłoby pamięć, zanim ktokolwiek z niej skorzysta.
+    Numer generacji chroni przed zapisaniem wyniku zapytania, które wystartowało przed unieważnieniem.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.ttl = app.config['OVERVIEW_CACHE_TTL']
+        self.max_entries = app.config['OVERVIEW_CACHE_MAX_ENTRIES']
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def on_event(self, event_type, data):
+        if event_type in ('computer_removed', 'blacklist') or (event_type == 'report' and data.get('created')):
+            self.invalidate()
+
+    def invalidate(self, *_):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._stats['invalidations'] += 1
+
+    def _get_or_load(self, key, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[1]
+            self._stats['misses'] += 1
+            generation = self._generation
+        value = loader()
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (now + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def get_page(self, status=None, search=None, sort='hostname', descending=False, after=None, limit=100):
+        """Strona przeglądu floty: {'items': [słowniki komputerów], 'next': kursor lub None}."""
+        status = status if status in OVERVIEW_STATUS_FILTERS else None
+        sort = sort if sort in OVERVIEW_SORT_COLUMNS else 'hostname'
+        search = (search or '').strip() or None
+        key = ('page', status, search, sort, bool(descending), after, limit)
+
+        def load():
+            page = DatabaseManager().get_computer_overview(
+                self.app.config['AGENT_OFFLINE_THRESHOLD'], status=status, search=search, sort=sort,
+                descending=descending, after=after, limit=limit)
+            items = []
+            for row in page['items']:
+                computer = dict(row)
+                computer.pop('sort_value')
+                computer['is_offline'] = bool(computer['is_offline'])
+                items.append(computer)
+            return {'items': items, 'next': page['next']}
+
+        return self._get_or_load(key, load)
+
+    def get_summary(self):
+        return self._get_or_load(('summary',), lambda: DatabaseManager().get_fleet_summary(
+            self.app.config['AGENT_OFFLINE_THRESHOLD']))
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'entries': len(self._entries), 'generation': self._generation}
+
+
+def get_fleet_overview():
+    return current_app.extensions['fleet_overview']
+
+
+def init_app(app):
+    overview = FleetOverviewCache(app)
+    app.extensions['fleet_overview'] = overview
+    app.extensions['events'].subscribe(overview.on_event)
@@ -0,0 +1,182 @@
+# winget-dashboard_new/winget_dashboard/presence.py
+
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone
+from flask import current_app
+from .events import publish_event
+
+# Pola heartbeatu zapisywane w tabeli computers (wraz z wartością domyślną, jak w dotychczasowym zapisie)
+HEARTBEAT_FIELDS = {
+    'ip_address': None,
+    'reboot_required': False,
+    'agent_version': 'N/A',
+    'winget_version': None,
+    'agent_mode': None,
+}
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class PresenceTracker:
+    """
+    Przechowuje stan heartbeatów agentów w pamięci. Do bazy trafiają okresowo, w jednej
+    transakcji, tylko komputery, które wysłały heartbeat od ostatniego zapisu - i tylko
+    te kolumny, których wartość się zmieniła. Status online/offline jest liczony z pamięci,
+    a przejścia między nimi są publikowane w strumieniu zdarzeń panelu.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.flush_interval = app.config['PRESENCE_FLUSH_INTERVAL']
+        self.offline_threshold = app.config['AGENT_OFFLINE_THRESHOLD']
+        self._lock = threading.Lock()
+        self._known = {}
+        self._dirty = {}
+        self._flusher = None
+        self._stopping = threading.Event()
+
+    def heartbeat(self, data):
+        """Rejestruje heartbeat agenta. Nie dotyka bazy danych."""
+        hostname = data['hostname']
+        key = hostname.lower()
+        now = datetime.now(timezone.utc)
+        values = {field: data.get(field, default) for field, default in HEARTBEAT_FIELDS.items()}
+        with self._lock:
+            known = self._known.setdefault(key, {'hostname': hostname, 'values': {}})
+            changed = {field: value for field, value in values.items() if known['values'].get(field, object()) != value}
+            known['values'].update(values)
+            known['last_seen'] = now
+            came_online = self._mark_online(known)
+            pending = self._dirty.setdefault(key, {'hostname': hostname, 'changed': {}})
+            pending['changed'].update(changed)
+        if came_online:
+            publish_event('presence', {'hostname': hostname, 'online': True}, self.app)
+        self._ensure_flusher()
+
+    def observe_report(self, data):
+        """Aktualizuje stan w pamięci po zapisaniu pełnego raportu (dane są już w bazie)."""
+        hostname = data.get('hostname')
+        if not hostname: return
+        values = {field: data.get(field, default) for field, default in HEARTBEAT_FIELDS.items()}
+        with self._lock:
+            known = self._known.setdefault(hostname.lower(), {'hostname': hostname, 'values': {}})
+            known['values'].update(values)
+            known['last_seen'] = datetime.now(timezone.utc)
+            came_online = self._mark_online(known)
+        if came_online:
+            publish_event('presence', {'hostname': hostname, 'online': True}, self.app)
+
+    @staticmethod
+    def _mark_online(known):
+        came_online = not known.get('online')
+        known['online'] = True
+        return came_online
+
+    def check_offline(self):
+        """Oznacza jako offline agentów bez heartbeatu dłużej niż AGENT_OFFLINE_THRESHOLD i publikuje przejścia."""
+        now = datetime.now(timezone.utc)
+        went_offline = []
+        with self._lock:
+            for known in self._known.values():
+                if known.get('online') and (now - known['last_seen']).total_seconds() > self.offline_threshold:
+                    known['online'] = False
+                    went_offline.append(known['hostname'])
+        for hostname in went_offline:
+            publish_event('presence', {'hostname': hostname, 'online': False}, self.app)
+        return went_offline
+
+    def forget(self, hostname):
+        with self._lock:
+            self._known.pop(hostname.lower(), None)
+            self._dirty.pop(hostname.lower(), None)
+
+    def last_seen(self, hostname):
+        with self._lock:
+            known = self._known.get(hostname.lower())
+            return known.get('last_seen') if known else None
+
+    def apply(self, computer):
+        """
+        Nadpisuje last_report i reboot_required (oraz is_offline, jeśli jest) w słowniku komputera
+        świeższymi danymi z pamięci.
+        """
+        with self._lock:
+            known = self._known.get(computer['hostname'].lower())
+            if not known or 'last_seen' not in known:
+                return computer
+            seen = known['last_seen'].strftime(TIMESTAMP_FORMAT)
+            reboot_required = known['values'].get('reboot_required')
+            if 'is_offline' in computer:
+                computer['is_offline'] = not known.get('online')
+        if not computer.get('last_report') or str(computer['last_report']) < seen:
+            computer['last_report'] = seen
+            computer['reboot_required'] = reboot_required
+        return computer
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._dirty)
+
+    def flush(self):
+        """Zapisuje zaległe heartbeaty do bazy w jednej transakcji."""
+        from .db import DatabaseManager
+
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            batch = []
+            for key, pending in dirty.items():
+                known = self._known[key]
+                batch.append({
+                    'hostname': pending['hostname'],
+                    'last_seen': known['last_seen'].strftime(TIMESTAMP_FORMAT),
+                    'reboot_required': known['values'].get('reboot_required', False),
+                    'changed': pending['changed'],
+                })
+        if not batch:
+            return 0
+        try:
+            with self.app.app_context():
+                DatabaseManager().save_heartbeats(batch)
+        except Exception as e:
+            logging.error(f"Błąd zapisu paczki {len(batch)} heartbeatów: {e}", exc_info=True)
+            with self._lock:
+                for pending in dirty.values():
+                    current = self._dirty.setdefault(pending['hostname'].lower(),
+                                                     {'hostname': pending['hostname'], 'changed': {}})
+                    current['changed'] = {**pending['changed'], **current['changed']}
+            return 0
+        changed_count = sum(1 for hb in batch if hb['changed'])
+        logging.info(f"Zapisano heartbeaty {len(batch)} komputerów (ze zmianą danych: {changed_count}).")
+        return len(batch)
+
+    def stop(self):
+        self._stopping.set()
+        if self._flusher and self._flusher.is_alive():
+            self._flusher.join(5)
+        self.flush()
+
+    def _ensure_flusher(self):
+        if self._flusher and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(target=self._run, name='presence-flusher', daemon=True)
+            self._flusher.start()
+
+    def _run(self):
+        while not self._stopping.wait(self.flush_interval):
+            self.flush()
+            self.check_offline()
+
+
+def get_presence_tracker():
+    return current_app.extensions['presence']
+
+
+def init_app(app):
+    tracker = PresenceTracker(app)
+    app.extensions['presence'] = tracker
+    atexit.register(tracker.stop)
@@ -0,0 +1,240 @@
+# winget-dashboard_new/winget_dashboard/retention.py
+
+import json
+import logging
+import threading
+import time
+import zlib
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+ARCHIVE_FORMAT = 'json+zlib/1'
+DELETE_CHUNK_SIZE = 500
+
+_APP_COLUMNS = ('name', 'version', 'app_id')
+_UPDATE_COLUMNS = ('name', 'app_id', 'current_version', 'available_version', 'update_type')
+
+
+def pack_inventory(apps, updates):
+    """Pakuje aplikacje i aktualizacje raportu do skompresowanego bloba."""
+    payload = {
+        'apps': [[app[col] for col in _APP_COLUMNS] for app in apps],
+        'updates': [[update[col] for col in _UPDATE_COLUMNS] for update in updates],
+    }
+    return zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'), 9)
+
+
+def unpack_inventory(blob):
+    """Odwrotność pack_inventory - zwraca listy słowników o kluczach jak kolumny tabel."""
+    payload = json.loads(zlib.decompress(blob).decode('utf-8'))
+    apps = [dict(zip(_APP_COLUMNS, row)) for row in payload.get('apps', [])]
+    updates = [dict(zip(_UPDATE_COLUMNS, row)) for row in payload.get('updates', [])]
+    return apps, updates
+
+
+class RetentionEngine:
+    """
+    Porządkuje historię raportów:
+    - raporty młodsze niż RETENTION_FULL_DAYS zostają bez zmian,
+    - do RETENTION_DAILY_DAYS zostaje ostatni raport z każdego dnia,
+    - starsze przerzedzane są do jednego raportu na tydzień (a powyżej RETENTION_MAX_DAYS usuwane),
+    - migawki inwentarza, których wszystkie raporty są starsze niż RETENTION_ARCHIVE_DAYS, są pakowane
+      do kolumny archive, a migawki bez żadnego raportu - usuwane,
+    - na końcu zwalniane jest miejsce w pliku przez incremental vacuum. Jednorazowe przełączenie starszej
+      bazy w tryb INCREMENTAL (pełny VACUUM) wykonuje tylko polecenie retention-run (full_vacuum=True).
+    Najnowszy raport każdego komputera nigdy nie jest usuwany ani archiwizowany.
+    """
+
+    def __init__(self, db, config, full_vacuum=False):
+        self.db = db
+        self.config = config
+        self.full_vacuum = full_vacuum
+
+    def run(self):
+        started = time.monotonic()
+        summary = {'orphans_removed': self.delete_orphans()}
+        summary['daily_removed'] = self.downsample(self.config['RETENTION_FULL_DAYS'],
+                                                   self.config['RETENTION_DAILY_DAYS'], '%Y-%m-%d')
+        summary['weekly_removed'] = self.downsample(self.config['RETENTION_DAILY_DAYS'], None, '%Y-%W')
+        summary['expired_removed'] = self.delete_expired(self.config.get('RETENTION_MAX_DAYS'))
+        summary['archived'] = self.archive(self.config['RETENTION_ARCHIVE_DAYS'])
+        summary['pages_freed'] = self.vacuum()
+        summary['duration_s'] = round(time.monotonic() - started, 2)
+        logging.info(f"Zakończono porządkowanie historii raportów: {summary}")
+        return summary
+
+    def _delete_reports(self, report_ids):
+        for i in range(0, len(report_ids), DELETE_CHUNK_SIZE):
+            chunk = report_ids[i:i + DELETE_CHUNK_SIZE]
+            placeholders = ','.join('?' for _ in chunk)
+            snapshot_ids = [row['snapshot_id'] for row in self.db.execute(
+                f"SELECT DISTINCT snapshot_id FROM reports WHERE id IN ({placeholders}) AND snapshot_id IS NOT NULL",
+                chunk).fetchall()]
+            self.db.execute(f"DELETE FROM reports WHERE id IN ({placeholders})", chunk)
+            self._delete_unused_snapshots(snapshot_ids)
+            self.db.commit()
+        return len(report_ids)
+
+    def _delete_unused_snapshots(self, snapshot_ids):
+        """Usuwa spośród podanych migawki, na które nie wskazuje już żaden raport (bez commita)."""
+        if not snapshot_ids:
+            return
+        placeholders = ','.join('?' for _ in snapshot_ids)
+        unused = [row['id'] for row in self.db.execute(
+            f"""SELECT id FROM inventory_snapshots s WHERE id IN ({placeholders})
+                AND NOT EXISTS (SELECT 1 FROM reports r WHERE r.snapshot_id = s.id)""", snapshot_ids).fetchall()]
+        if not unused:
+            return
+        placeholders = ','.join('?' for _ in unused)
+        self.db.execute(f"DELETE FROM applications WHERE snapshot_id IN ({placeholders})", unused)
+        self.db.execute(f"DELETE FROM updates WHERE snapshot_id IN ({placeholders})", unused)
+        self.db.execute(f"DELETE FROM report_apps_fts WHERE rowid IN ({placeholders})", unused)
+        self.db.execute(f"DELETE FROM inventory_snapshots WHERE id IN ({placeholders})", unused)
+
+    def delete_orphans(self):
+        """Usuwa raporty, migawki i wpisy inwentarza pozostałe po komputerach usuniętych bez kaskady."""
+        removed = self.db.execute(
+            "DELETE FROM reports WHERE computer_id NOT IN (SELECT id FROM computers)").rowcount
+        removed += self.db.execute(
+            """DELETE FROM inventory_snapshots WHERE computer_id NOT IN (SELECT id FROM computers)
+               OR NOT EXISTS (SELECT 1 FROM reports r WHERE r.snapshot_id = inventory_snapshots.id)""").rowcount
+        removed += self.db.execute(
+            "DELETE FROM applications WHERE snapshot_id NOT IN (SELECT id FROM inventory_snapshots)").rowcount
+        removed += self.db.execute(
+            "DELETE FROM updates WHERE snapshot_id NOT IN (SELECT id FROM inventory_snapshots)").rowcount
+        removed += self.db.execute(
+            "DELETE FROM report_apps_fts WHERE rowid NOT IN (SELECT id FROM inventory_snapshots)").rowcount
+        removed += self.db.execute(
+            "DELETE FROM tasks WHERE computer_id NOT IN (SELECT id FROM computers)").rowcount
+        self.db.commit()
+        return removed
+
+    def downsample(self, newer_than_days, older_than_days, bucket_format):
+        """Zostawia ostatni raport z każdego przedziału czasu (bucket_format dla strftime)."""
+        params = [bucket_format, f'-{int(newer_than_days)} days']
+        window = "report_timestamp < datetime('now', ?)"
+        if older_than_days is not None:
+            window += " AND report_timestamp >= datetime('now', ?)"
+            params.append(f'-{int(older_than_days)} days')
+        rows = self.db.execute(
+            f"""SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY computer_id, strftime(?, report_timestamp) ORDER BY id DESC) AS rn
+                FROM reports WHERE {window}
+            )
+            WHERE rn > 1
+            AND id NOT IN (SELECT latest_report_id FROM computer_state WHERE latest_report_id IS NOT NULL)""",
+            params).fetchall()
+        return self._delete_reports([row['id'] for row in rows])
+
+    def delete_expired(self, max_days):
+        if not max_days:
+            return 0
+        rows = self.db.execute(
+            """SELECT id FROM reports WHERE report_timestamp < datetime('now', ?)
+               AND id NOT IN (SELECT latest_report_id FROM computer_state WHERE latest_report_id IS NOT NULL)""",
+            (f'-{int(max_days)} days',)).fetchall()
+        return self._delete_reports([row['id'] for row in rows])
+
+    def archive(self, older_than_days):
+        """
+        Pakuje do kolumny archive inwentarz migawek, na które wskazują wyłącznie raporty starsze niż
+        older_than_days. Wpisy w report_apps_fts zostają, więc zarchiwizowane raporty nadal są wyszukiwane
+        w historii. Migawka najnowszego raportu komputera zawsze zostaje w tabelach. Archiwum zawiera nazwy
+        i wersje, a nie identyfikatory ze słownika pakietów.
+        """
+        from .db import SNAPSHOT_APPS_QUERY, SNAPSHOT_UPDATES_QUERY
+
+        rows = self.db.execute(
+            """SELECT s.id FROM inventory_snapshots s
+               WHERE s.archive IS NULL
+               AND (SELECT MAX(r.report_timestamp) FROM reports r WHERE r.snapshot_id = s.id) < datetime('now', ?)
+               AND s.id NOT IN (SELECT r.snapshot_id FROM computer_state cs
+                                JOIN reports r ON r.id = cs.latest_report_id WHERE r.snapshot_id IS NOT NULL)""",
+            (f'-{int(older_than_days)} days',)).fetchall()
+        archived = 0
+        for row in rows:
+            snapshot_id = row['id']
+            apps = self.db.execute(SNAPSHOT_APPS_QUERY, (snapshot_id,)).fetchall()
+            updates = self.db.execute(SNAPSHOT_UPDATES_QUERY, (snapshot_id,)).fetchall()
+            self.db.execute("UPDATE inventory_snapshots SET archive_format = ?, archive = ? WHERE id = ?",
+                            (ARCHIVE_FORMAT, pack_inventory(apps, updates), snapshot_id))
+            self.db.execute("DELETE FROM applications WHERE snapshot_id = ?", (snapshot_id,))
+            self.db.execute("DELETE FROM updates WHERE snapshot_id = ?", (snapshot_id,))
+            archived += 1
+            if archived % DELETE_CHUNK_SIZE == 0:
+                self.db.commit()
+        self.db.commit()
+        return archived
+
+    def vacuum(self):
+        """
+        Zwalnia wolne strony pliku bazy. Bazę bez auto_vacuum=INCREMENTAL przełącza pełnym VACUUM tylko
+        przy full_vacuum=True - przebieg w tle nie blokuje w ten sposób działającej bazy.
+        """
+        if self.db.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            if not self.full_vacuum:
+                logging.warning("Baza nie ma włączonego auto_vacuum=INCREMENTAL - pomijam zwalnianie miejsca. "
+                                "Uruchom 'flask retention-run', aby jednorazowo przełączyć bazę.")
+                return 0
+            logging.warning("Baza nie ma włączonego auto_vacuum=INCREMENTAL. Wykonuję jednorazowy pełny VACUUM.")
+            self.db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self.db.execute("VACUUM")
+            return 0
+        free_pages = self.db.execute("PRAGMA freelist_count").fetchone()[0]
+        if free_pages:
+            self.db.execute(f"PRAGMA incremental_vacuum({int(free_pages)})").fetchall()
+        return free_pages
+
+
+class RetentionScheduler:
+    """Uruchamia RetentionEngine cyklicznie w wątku tła (co RETENTION_INTERVAL_HOURS)."""
+
+    def __init__(self, app):
+        self.app = app
+        self.interval = app.config['RETENTION_INTERVAL_HOURS'] * 3600
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def ensure_started(self):
+        if not self.interval or (self._thread and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='retention-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    run_retention()
+            except Exception as e:
+                logging.error(f"Błąd podczas cyklicznego porządkowania historii raportów: {e}", exc_info=True)
+
+
+def run_retention(full_vacuum=False):
+    from .db import get_db
+    return RetentionEngine(get_db(), current_app.config, full_vacuum=full_vacuum).run()
+
+
+@click.command('retention-run')
+@with_appcontext
+def retention_run_command():
+    """Przerzedza starą historię raportów, archiwizuje inwentarz i zwalnia miejsce w pliku bazy."""
+    summary = run_retention(full_vacuum=True)
+    for key, value in summary.items():
+        click.echo(f'{key}: {value}')
+
+
+def init_app(app):
+    scheduler = RetentionScheduler(app)
+    app.extensions['retention'] = scheduler
+    app.before_request(scheduler.ensure_started)
+    app.cli.add_command(retention_run_command)
@@ -1,10 +1,20 @@
 -- winget-dashboard_new/winget_dashboard/schema.sql
+-- Schemat bazowy (wersja 0). Kolejne zmiany schematu i indeksy znajdują się w migrations.py.
 
 DROP TABLE IF EXISTS computers;
 DROP TABLE IF EXISTS reports;
 DROP TABLE IF EXISTS applications;
 DROP TABLE IF EXISTS updates;
 DROP TABLE IF EXISTS tasks;
+DROP TABLE IF EXISTS computer_state;
+DROP TABLE IF EXISTS schema_migrations;
+DROP TABLE IF EXISTS report_archives;
+DROP TABLE IF EXISTS report_apps_fts;
+DROP TABLE IF EXISTS fleet_packages;
+DROP TABLE IF EXISTS task_batches;
+DROP TABLE IF EXISTS inventory_snapshots;
+DROP TABLE IF EXISTS packages;
+DROP TABLE IF EXISTS package_versions;
 
 CREATE TABLE computers (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
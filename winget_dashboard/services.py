@@ -48,6 +48,17 @@ class AgentVersionService:
         except Exception as e:
             logging.error(f"Błąd zapisu pliku wersji: {e}")
 
+    def get_build_fingerprint(self) -> str:
+        """Odcisk paczki agenta z metadanych plików (bez czytania ich treści) - podstawa ETagu /api/agent/latest_info."""
+        parts = []
+        for path in (self.agent_path, self.version_path):
+            try:
+                stat = os.stat(path)
+                parts.append(f"{stat.st_mtime_ns:x}.{stat.st_size:x}")
+            except OSError:
+                parts.append('0')
+        return '-'.join(parts)
+
     def get_server_agent_info(self):
         """Zbiera kompletne informacje o agencie na serwerze."""
         version = self.get_server_agent_version()
@@ -90,6 +101,10 @@ class AgentGenerator:
             source_dir = os.path.join(current_app.root_path, '..')
             shutil.copy(os.path.join(source_dir, 'ui_helper.py'), build_dir)
             shutil.copy(os.path.join(source_dir, 'updater.py'), build_dir)
+            # Moduły importowane przez agenta - PyInstaller dołącza je do agent.exe
+            for module in ('winget_parser.py', 'blacklist_matcher.py', 'inventory_sync.py', 'data_collector.py',
+                           'shell_worker.py', 'ui_channel.py'):
+                shutil.copy(os.path.join(source_dir, module), build_dir)
 
             try:
                 error_definitions_path = os.path.join(source_dir, 'error_definitions.json')
@@ -25,42 +25,93 @@ document.addEventListener('DOMContentLoaded', () => {
         window.location.href = url.toString();
     }
 
-    const pollTaskStatus = (taskId, onUpdate, onComplete, onError) => {
-        let attempts = 0;
-        const maxAttempts = 36;
-        const interval = setInterval(() => {
-            attempts++;
-            if (attempts > maxAttempts) {
-                clearInterval(interval);
-                if (onError) onError(new Error("Zadanie przekroczyło limit czasu."));
+    // === Zdarzenia na żywo (SSE) ===
+    // Jeden strumień /api/events dostarcza zmiany zadań, nowe raporty i przejścia online/offline.
+    // Gdy strumień jest niedostępny, stan obserwowanych zadań jest pobierany jednym zapytaniem zbiorczym.
+    const FINAL_TASK_STATUSES = ['zakończone', 'błąd', 'niepowodzenie_interwencja_uzytkownika', 'not_found', 'odroczone_aplikacja_uruchomiona'];
+    const TASK_WATCH_TIMEOUT_MS = 180000;
+
+    const liveEvents = {
+        source: null,
+        listeners: [],
+        watchedTasks: new Map(),
+        fallbackTimer: null,
+
+        connect() {
+            if (this.source) return;
+            if (!window.EventSource) {
+                this.startFallback();
                 return;
             }
+            this.source = new EventSource(`/api/events?apiKey=${encodeURIComponent(window.apiKey)}`);
+            ['task', 'tasks_changed', 'batch', 'report', 'presence', 'resync'].forEach(type => {
+                this.source.addEventListener(type, (e) => this.dispatch(type, JSON.parse(e.data)));
+            });
+            this.source.onopen = () => this.stopFallback();
+            // EventSource sam wznawia połączenie (z Last-Event-ID); do tego czasu działa odpytywanie zbiorcze
+            this.source.onerror = () => this.startFallback();
+        },
+
+        on(handler) {
+            this.listeners.push(handler);
+            this.connect();
+        },
+
+        dispatch(type, data) {
+            if (type === 'task') this.updateWatchedTask(data);
+            if (type === 'resync') this.pollWatchedTasks();
+            this.listeners.forEach(handler => handler(type, data));
+        },
+
+        watchTask(taskId, onUpdate, onComplete, onError) {
+            const timer = setTimeout(() => {
+                if (this.watchedTasks.delete(String(taskId)) && onError) {
+                    onError(new Error("Zadanie przekroczyło limit czasu."));
+                }
+            }, TASK_WATCH_TIMEOUT_MS);
+            this.watchedTasks.set(String(taskId), { onUpdate, onComplete, onError, timer });
+            this.connect();
+            // Zadanie mogło zmienić stan, zanim zaczęliśmy je obserwować
+            this.pollWatchedTasks();
+        },
+
+        updateWatchedTask(task) {
+            const watch = this.watchedTasks.get(String(task.id));
+            if (!watch) return;
+            if (FINAL_TASK_STATUSES.includes(task.status)) {
+                clearTimeout(watch.timer);
+                this.watchedTasks.delete(String(task.id));
+                if (watch.onComplete) watch.onComplete(task.status);
+            } else if (watch.onUpdate) {
+                watch.onUpdate(task.status);
+            }
+        },
 
-            fetch(`/api/task_status/${taskId}`, {
+        pollWatchedTasks() {
+            if (!this.watchedTasks.size) return;
+            const ids = Array.from(this.watchedTasks.keys());
+            fetch(`/api/task_statuses?ids=${ids.join(',')}`, {
                 headers: { 'X-API-Key': window.apiKey }
             })
                 .then(response => {
-                    if (!response.ok) {
-                        if (response.status === 404) return { status: 'zakończone' };
-                        throw new Error('Błąd serwera przy sprawdzaniu statusu.');
-                    }
+                    if (!response.ok) throw new Error('Błąd serwera przy sprawdzaniu statusu.');
                     return response.json();
                 })
-                .then(data => {
-                    const finalStatuses = ['zakończone', 'błąd', 'niepowodzenie_interwencja_uzytkownika', 'not_found', 'odroczone_aplikacja_uruchomiona'];
-                    if (finalStatuses.includes(data.status)) {
-                        clearInterval(interval);
-                        if (onComplete) onComplete(data.status);
-                    } else {
-                        if (onUpdate) onUpdate(data.status);
-                    }
+                .then(statuses => {
+                    ids.forEach(id => this.updateWatchedTask(statuses[id] || { id: id, status: 'not_found' }));
                 })
-                .catch(err => {
-                    clearInterval(interval);
-                    console.error("Błąd odpytywania o status zadania:", err);
-                    if (onError) onError(err);
-                });
-        }, 5000);
+                .catch(err => console.error("Błąd odpytywania o status zadań:", err));
+        },
+
+        startFallback() {
+            if (this.fallbackTimer) return;
+            this.fallbackTimer = setInterval(() => this.pollWatchedTasks(), 5000);
+        },
+
+        stopFallback() {
+            clearInterval(this.fallbackTimer);
+            this.fallbackTimer = null;
+        }
     };
 
     const toggleButton = document.getElementById('theme-toggle');
@@ -219,7 +270,7 @@ document.addEventListener('DOMContentLoaded', () => {
                         } else {
                             this.textContent = "Czekam...";
                         }
-                        pollTaskStatus(
+                        liveEvents.watchTask(
                             data.task_id,
                             (status) => { if(notificationBar) notificationBar.textContent = `W toku... (Status: ${status})` },
                             (status) => forceReload(),
@@ -253,10 +304,23 @@ document.addEventListener('DOMContentLoaded', () => {
         refreshAllBtn.addEventListener('click', function() {
             if (!confirm('Czy na pewno chcesz zlecić odświeżenie na wszystkich komputerach?')) return;
 
-            const buttons = document.querySelectorAll('.refresh-btn[data-computer-id]');
-            buttons.forEach(btn => {
-                btn.click();
-            });
+            // Strona główna pokazuje tylko jedną stronę floty, więc zadanie idzie zbiorczo do wszystkich komputerów
+            this.disabled = true;
+            fetch('/api/tasks/bulk', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-API-Key': window.apiKey
+                },
+                body: JSON.stringify({ command: 'force_report', selector: { type: 'all' } })
+            })
+                .then(response => response.json().then(data => ({ ok: response.ok, data })))
+                .then(({ ok, data }) => {
+                    if (!ok) throw new Error(data.message || 'Błąd serwera');
+                    alert(data.message);
+                })
+                .catch(error => alert(`Błąd: ${error.message}`))
+                .finally(() => { this.disabled = false; });
         });
     }
 
@@ -291,7 +355,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 if (refreshData.task_id) {
                     notificationBar.style.backgroundColor = '#28a745';
                     notificationBar.style.display = 'block';
-                    pollTaskStatus(
+                    liveEvents.watchTask(
                         refreshData.task_id,
                         (status) => { notificationBar.textContent = `Zapisano! Oczekuję na raport... (Status: ${status})`; },
                         (status) => forceReload(),
@@ -475,6 +539,46 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     });
 
+    const renderTaskStatuses = (tasks) => {
+        document.querySelectorAll('tr[data-package-id]').forEach(row => {
+            const packageId = row.dataset.packageId;
+            const task = tasks[packageId];
+            if (!task) return;
+
+            const statusCell = row.querySelector('.task-status');
+            const actionCell = row.querySelector('.task-action');
+            const isAppsTable = !!row.querySelector('.uninstall-btn');
+            const isUninstallTask = task.command.includes('uninstall');
+
+            if (isAppsTable && !isUninstallTask) {
+                return;
+            }
+
+            if (statusCell) {
+                const isErrorStatus = task.status.includes('niepowodzenie') || task.status.includes('błąd');
+                const statusClass = isErrorStatus ? 'fail' : 'pending';
+                const statusTextRaw = task.status.replace(/_/g, ' ');
+                const statusText = statusTextRaw.charAt(0).toUpperCase() + statusTextRaw.slice(1);
+
+                let statusHtml = `<span class="status-${statusClass}">${statusText}</span>`;
+                const hasDetails = isErrorStatus || task.status === 'zakończone';
+
+                if (hasDetails) {
+                    statusHtml += ` <button class="action-btn-link details-btn" data-task-id="${task.id}">(pokaż szczegóły)</button>`;
+                }
+                statusCell.innerHTML = statusHtml;
+            }
+
+            if (actionCell) {
+                const activeStatuses = ['oczekuje', 'w_trakcie_wykonywania', 'oczekuje_na_uzytkownika', 'w_trakcie_aktualizacji', 'zaplanowane_na_logowanie'];
+                if (activeStatuses.includes(task.status)) {
+                    const actionGroup = actionCell.querySelector('.action-group');
+                    if (actionGroup) actionGroup.remove();
+                }
+            }
+        });
+    };
+
     const fetchAndRenderTaskStatuses = () => {
         const refreshBtn = document.querySelector('.refresh-btn[data-computer-id]');
         if (!refreshBtn) return;
@@ -487,45 +591,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 if (!response.ok) throw new Error('Nie udało się pobrać statusów zadań.');
                 return response.json();
             })
-            .then(tasks => {
-                document.querySelectorAll('tr[data-package-id]').forEach(row => {
-                    const packageId = row.dataset.packageId;
-                    const task = tasks[packageId];
-                    if (!task) return;
-
-                    const statusCell = row.querySelector('.task-status');
-                    const actionCell = row.querySelector('.task-action');
-                    const isAppsTable = !!row.querySelector('.uninstall-btn');
-                    const isUninstallTask = task.command.includes('uninstall');
-
-                    if (isAppsTable && !isUninstallTask) {
-                        return;
-                    }
-
-                    if (statusCell) {
-                        const isErrorStatus = task.status.includes('niepowodzenie') || task.status.includes('błąd');
-                        const statusClass = isErrorStatus ? 'fail' : 'pending';
-                        const statusTextRaw = task.status.replace(/_/g, ' ');
-                        const statusText = statusTextRaw.charAt(0).toUpperCase() + statusTextRaw.slice(1);
-
-                        let statusHtml = `<span class="status-${statusClass}">${statusText}</span>`;
-                        const hasDetails = isErrorStatus || task.status === 'zakończone';
-
-                        if (hasDetails) {
-                            statusHtml += ` <button class="action-btn-link details-btn" data-task-id="${task.id}">(pokaż szczegóły)</button>`;
-                        }
-                        statusCell.innerHTML = statusHtml;
-                    }
-
-                    if (actionCell) {
-                        const activeStatuses = ['oczekuje', 'w_trakcie_wykonywania', 'oczekuje_na_uzytkownika', 'w_trakcie_aktualizacji', 'zaplanowane_na_logowanie'];
-                        if (activeStatuses.includes(task.status)) {
-                            const actionGroup = actionCell.querySelector('.action-group');
-                            if (actionGroup) actionGroup.remove();
-                        }
-                    }
-                });
-            })
+            .then(renderTaskStatuses)
             .catch(error => {
                 console.error('Błąd podczas ładowania statusów zadań:', error);
                 const notificationBar = document.getElementById('notification-bar');
@@ -536,5 +602,35 @@ document.addEventListener('DOMContentLoaded', () => {
                 }
             });
     };
-    fetchAndRenderTaskStatuses();
+
+    // Strona szczegółów komputera: statusy zadań są pobierane raz, a potem aktualizowane zdarzeniami
+    const taskTable = document.querySelector('tr[data-package-id]');
+    const detailsRefreshBtn = document.querySelector('.refresh-btn[data-computer-id]');
+    if (taskTable && detailsRefreshBtn) {
+        const computerId = Number(detailsRefreshBtn.dataset.computerId);
+        fetchAndRenderTaskStatuses();
+        liveEvents.on((type, data) => {
+            if (type === 'task' && data.computer_id === computerId) {
+                renderTaskStatuses({ [data.payload]: data });
+            } else if (type === 'resync' || type === 'batch'
+                || ((type === 'tasks_changed' || type === 'report') && data.computer_id === computerId)) {
+                fetchAndRenderTaskStatuses();
+            }
+        });
+    }
+
+    // Strona główna: przejścia online/offline agentów bez przeładowania strony
+    if (document.querySelector('.computer-tile[data-host-key]')) {
+        liveEvents.on((type, data) => {
+            if (type === 'resync') {
+                forceReload();
+                return;
+            }
+            if (type !== 'presence') return;
+            const tile = document.querySelector(`.computer-tile[data-host-key="${CSS.escape(data.hostname.toLowerCase())}"]`);
+            if (!tile) return;
+            tile.querySelector('.agent-offline-status').hidden = data.online;
+            tile.querySelector('.agent-online-status').hidden = !data.online;
+        });
+    }
 });
\ No newline at end of file
@@ -0,0 +1,46 @@
+# winget-dashboard_new/winget_dashboard/task_leases.py
+
+import logging
+import threading
+
+
+class TaskLeaseSweeper:
+    """Co TASK_LEASE_SWEEP_INTERVAL sekund zwalnia w wątku tła zadania z wygasłą dzierżawą."""
+
+    def __init__(self, app):
+        self.app = app
+        self.interval = app.config['TASK_LEASE_SWEEP_INTERVAL']
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def ensure_started(self):
+        if not self.interval or (self._thread and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='task-lease-sweeper', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def sweep(self):
+        from .db import DatabaseManager
+
+        with self.app.app_context():
+            return DatabaseManager().expire_task_leases()
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logging.error(f"Błąd podczas zwalniania wygasłych dzierżaw zadań: {e}", exc_info=True)
+
+
+def init_app(app):
+    sweeper = TaskLeaseSweeper(app)
+    app.extensions['task_leases'] = sweeper
+    app.before_request(sweeper.ensure_started)
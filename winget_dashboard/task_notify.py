@@ -0,0 +1,62 @@
+# winget-dashboard_new/winget_dashboard/task_notify.py
+
+import threading
+import time
+from flask import current_app
+
+
+class TaskNotifier:
+    """
+    Budzi zapytania long-poll agentów, gdy dla ich komputera pojawi się nowe zadanie.
+    Każdy komputer ma licznik zmian - oczekujący porównuje go z wartością odczytaną przed
+    sprawdzeniem bazy, więc zadanie dodane w międzyczasie nie zostanie przeoczone.
+    Działa w obrębie jednego procesu serwera.
+    """
+
+    def __init__(self, app):
+        self.max_waiters = app.config['TASK_LONG_POLL_MAX_WAITERS']
+        self._condition = threading.Condition()
+        self._versions = {}
+        self._waiters = 0
+
+    def version(self, computer_id):
+        with self._condition:
+            return self._versions.get(computer_id, 0)
+
+    def notify(self, computer_ids):
+        with self._condition:
+            for computer_id in set(computer_ids):
+                self._versions[computer_id] = self._versions.get(computer_id, 0) + 1
+            self._condition.notify_all()
+
+    def wait(self, computer_id, seen_version, timeout):
+        """
+        Czeka, aż licznik komputera zmieni się względem seen_version lub minie timeout.
+        Zwraca True, jeśli pojawiło się zadanie. Przy zbyt wielu oczekujących zwraca False od razu.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            if self._waiters >= self.max_waiters:
+                return False
+            self._waiters += 1
+            try:
+                while self._versions.get(computer_id, 0) == seen_version:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._condition.wait(remaining)
+                return True
+            finally:
+                self._waiters -= 1
+
+    def waiting_count(self):
+        with self._condition:
+            return self._waiters
+
+
+def get_task_notifier():
+    return current_app.extensions['task_notifier']
+
+
+def init_app(app):
+    app.extensions['task_notifier'] = TaskNotifier(app)
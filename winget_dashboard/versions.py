@@ -0,0 +1,17 @@
+# winget-dashboard_new/winget_dashboard/versions.py
+
+import re
+
+_VERSION_PART_RE = re.compile(r'\d+|[A-Za-z]+')
+
+
+def version_sort_key(version):
+    """
+    Zamienia numer wersji na tekst porównywalny leksykograficznie (w SQL i w Pythonie),
+    np. '1.10.0' > '1.9.2'. Części liczbowe są dopełniane zerami, tekstowe zamieniane na małe litery.
+    Pusta lub nieznana wersja daje ''.
+    """
+    parts = []
+    for part in _VERSION_PART_RE.findall(str(version or '')):
+        parts.append(part.zfill(12) if part.isdigit() else part.lower())
+    return '.'.join(parts)
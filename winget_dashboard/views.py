@@ -6,10 +6,12 @@ import logging
 import zipfile
 from flask import (Blueprint, render_template, current_app, send_file, request, flash, redirect, url_for, abort,
                    Response, after_this_request)
-from datetime import datetime, timezone
+from datetime import datetime
 from zoneinfo import ZoneInfo
 from .db import DatabaseManager
 from .services import AgentGenerator, ReportGenerator, AgentVersionService
+from .presence import get_presence_tracker
+from .overview import get_fleet_overview
 
 bp = Blueprint('views', __name__)
 
@@ -30,36 +32,21 @@ def _get_suggested_server_address():
 
 @bp.route('/')
 def index():
-    db_manager = DatabaseManager()
-    computers_raw = db_manager.get_all_computers()
-    version_service = AgentVersionService()
-    server_agent_info = version_service.get_server_agent_info()
-    offline_threshold = current_app.config['AGENT_OFFLINE_THRESHOLD']
-    now_utc = datetime.now(timezone.utc)
-    computers = []
-    for computer_row in computers_raw:
-        computer = dict(computer_row)
-        computer['is_offline'] = False
-        last_report = computer.get('last_report')
-        if last_report:
-            try:
-                last_report_dt = None
-                if isinstance(last_report, str):
-                    last_report_dt = datetime.fromisoformat(last_report).replace(tzinfo=timezone.utc)
-                elif isinstance(last_report, datetime):
-                    last_report_dt = last_report.replace(tzinfo=timezone.utc)
-                if last_report_dt:
-                    seconds_since_report = (now_utc - last_report_dt).total_seconds()
-                    if seconds_since_report > offline_threshold:
-                        computer['is_offline'] = True
-            except (ValueError, TypeError) as e:
-                current_app.logger.warning(
-                    f"Nie można przetworzyć znacznika czasu '{last_report}' dla komputera {computer.get('hostname')}: {e}")
-                pass
-        else:
-            computer['is_offline'] = True
-        computers.append(computer)
-    return render_template('index.html', computers=computers, server_agent_info=server_agent_info)
+    overview = get_fleet_overview()
+    filters = {
+        'status': request.args.get('status') or None,
+        'search': request.args.get('q', '').strip() or None,
+        'sort': request.args.get('sort', 'hostname'),
+        'descending': request.args.get('order') == 'desc',
+    }
+    page = overview.get_page(**filters, after=request.args.get('after'),
+                             limit=current_app.config['OVERVIEW_PAGE_SIZE'])
+    presence = get_presence_tracker()
+    computers = [presence.apply(dict(computer)) for computer in page['items']]
+    server_agent_info = AgentVersionService().get_server_agent_info()
+    return render_template('index.html', computers=computers, server_agent_info=server_agent_info,
+                           summary=overview.get_summary(), next_cursor=page['next'],
+                           is_first_page=not request.args.get('after'), filters=filters)
 
 
 @bp.route('/settings', methods=['GET', 'POST'])
@@ -158,7 +145,7 @@ def computer_details(hostname):
 def computer_history(hostname):
     db_manager = DatabaseManager()
     search_params = {'start_date': request.args.get('start_date', ''), 'end_date': request.args.get('end_date', ''),
-                     'keyword': request.args.get('keyword', '')}
+                     'keyword': request.args.get('keyword', ''), 'changed_only': request.args.get('changed_only', '')}
     clean_search_params = {k: v for k, v in search_params.items() if v}
     history = db_manager.get_computer_history(hostname, search_params=clean_search_params)
     if not history: abort(404)
@@ -166,6 +153,22 @@ def computer_history(hostname):
     return render_template('history.html', **history)
 
 
+@bp.route('/packages')
+def fleet_packages():
+    search_params = {'app_id': request.args.get('app_id', '').strip(), 'mode': request.args.get('mode', 'all'),
+                     'version': request.args.get('version', '').strip(), 'after': request.args.get('after', '')}
+    result = None
+    if search_params['app_id']:
+        db_manager = DatabaseManager()
+        result = db_manager.search_fleet_packages(
+            search_params['app_id'],
+            older_than=search_params['version'] if search_params['mode'] == 'older' else None,
+            pending_only=search_params['mode'] == 'pending',
+            after=search_params['after'] or None,
+            limit=current_app.config['FLEET_SEARCH_PAGE_SIZE'])
+    return render_template('packages.html', search_params=search_params, result=result)
+
+
 @bp.route('/report/<int:report_id>')
 def view_report(report_id):
     db_manager = DatabaseManager()
@@ -0,0 +1,530 @@
+# Plik: winget_parser.py
+
+"""
+Strumieniowy parser wyjścia winget używany przez agenta (agent.exe dołącza ten moduł przy budowaniu).
+
+Dane można podawać porcjami (feed) w miarę czytania wyjścia - parser nie trzyma całego tekstu w pamięci:
+- WingetTableParser czyta tabele trybu tekstowego. Nagłówek to linia nad linią z samych kresek, więc
+  zlokalizowane nagłówki też działają. Kolumny są wyznaczane według szerokości wyświetlania
+  (znaki CJK zajmują dwie kolumny konsoli), a nie według indeksu znaku.
+- JsonStreamDecoder czyta wynik --json: pojedynczy obiekt, tablicę albo sklejone obiekty "{...}{...}".
+  Używa json.JSONDecoder.raw_decode, więc nawiasy wewnątrz tekstów i zagnieżdżonych obiektów nie przeszkadzają.
+
+Uruchomienie "python winget_parser.py benchmark" sprawdza parser na nagraniach z katalogu winget_corpus
+i mierzy czas na dużym inwentarzu w porównaniu z dotychczasowym parserem. Pochodzenie każdego pliku
+korpusu (nagranie z komputera albo przykład odtworzony ręcznie) jest zapisane w winget_corpus/sources.json.
+Nowe nagranie robi na Windows "python winget_parser.py record <plik> -- list --accept-source-agreements":
+polecenie idzie przez PowerShell tak samo jak w Pomocniku UI, a wynik parsera trzeba przejrzeć
+przed dopisaniem go do expected.json (--update-expected). Język tabel winget zależy od języka interfejsu
+Windows, więc nagranie zlokalizowane wymaga komputera z takim językiem. "python winget_parser.py corpus
+--require-captured" kończy się błędem, dopóki korpus nie ma nagrań z komputera w en-US i w innym języku.
+"""
+
+import gc
+import json
+import operator
+import re
+import unicodedata
+
+# Sekwencje sterujące konsoli (kolory, przesunięcia kursora), które winget może wypisać
+_ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]')
+# Nazwy kolumn tabeli winget (angielskie) -> klucz wpisu. Nieznane nagłówki są przypisywane według pozycji.
+KNOWN_COLUMNS = {'name': 'name', 'id': 'id', 'version': 'version', 'available': 'available_version', 'source': 'source'}
+POSITIONAL_COLUMNS = {4: ('name', 'id', 'version', 'source'), 5: ('name', 'id', 'version', 'available_version', 'source')}
+JSON_START = ('{', '[')
+_JSON_START = re.compile(r'[{\[]')
+# Znaki szerokie (CJK, pełnej szerokości, emoji) i łączące. Linia bez nich ma szerokość równą liczbie znaków
+# i jest dzielona zwykłym wycinaniem - dokładne liczenie szerokości znak po znaku dotyczy tylko reszty linii.
+_NON_NARROW = re.compile('[\u0300-\u036f\u0483-\u0489\u0591-\u05bd\u0610-\u061a\u064b-\u065f\u1100-\u115f'
+                         '\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\u2e80-\u303e\u3041-\u33ff\u3400-\u4dbf'
+                         '\u4e00-\u9fff\ua000-\ua4cf\ua960-\ua97f\uac00-\ud7a3\uf900-\ufaff\ufe00-\ufe0f'
+                         '\ufe10-\ufe19\ufe20-\ufe6f\uff00-\uff60\uffe0-\uffe6\U0001f300-\U0001faff'
+                         '\U00020000-\U0003fffd]')
+
+
+def char_width(char):
+    """Szerokość znaku w kolumnach konsoli: 2 dla znaków szerokich (CJK), 0 dla znaków łączących."""
+    if char < '\u0300':
+        return 1
+    if unicodedata.combining(char):
+        return 0
+    return 2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1
+
+
+def _is_narrow(text):
+    return text.isascii() or not _NON_NARROW.search(text)
+
+
+def display_width(text):
+    return len(text) if _is_narrow(text) else sum(char_width(char) for char in text)
+
+
+def _clean_line(line):
+    # Pasek postępu i wskaźnik "- \ | /" są nadpisywane przez \r - liczy się tekst po ostatnim \r
+    line = line.rstrip('\r')
+    if '\r' in line:
+        line = line[line.rindex('\r') + 1:]
+    if '\x1b' in line:
+        line = _ANSI_ESCAPE.sub('', line)
+    return line
+
+
+def _is_separator(line):
+    stripped = line.strip()
+    return len(stripped) >= 3 and not stripped.strip('-')
+
+
+def _column_starts(header):
+    """Pozycje (w kolumnach konsoli) i nazwy kolumn nagłówka tabeli."""
+    starts, names, position, previous = [], [], 0, ' '
+    for char in header:
+        if char != ' ' and previous == ' ':
+            starts.append(position)
+            names.append('')
+        if char != ' ':
+            names[-1] += char
+        position += char_width(char)
+        previous = char
+    return starts, names
+
+
+def _split_by_width(line, starts):
+    """
+    Dzieli linię ze znakami szerokimi lub łączącymi na kolumny zaczynające się w podanych pozycjach konsoli.
+    Zwraca None, gdy linia nie pasuje do tabeli - znak tuż przed początkiem kolumny nie jest spacją.
+    """
+    cells, current, column, position = [], [], 0, 0
+    for char in line:
+        while column + 1 < len(starts) and position >= starts[column + 1]:
+            if current and current[-1] != ' ':
+                return None
+            cells.append(''.join(current).strip())
+            current, column = [], column + 1
+        current.append(char)
+        position += char_width(char)
+    cells.append(''.join(current).strip())
+    return cells + [''] * (len(starts) - len(cells))
+
+
+class WingetTableParser:
+    """
+    Parser tabel z wyjścia "winget list" / "winget upgrade" w trybie tekstowym. feed() przyjmuje kolejne
+    porcje tekstu i zwraca wpisy z linii, które są już kompletne; close() zwraca resztę.
+    Linia jest przetwarzana dopiero po odczytaniu następnej - nagłówek rozpoznaje się po linii kresek pod nim.
+    Tabela kończy się pustą linią. Wiersze, które nie pasują do kolumn, są pomijane (skipped_lines).
+    """
+
+    def __init__(self):
+        self._partial = ''
+        self._pending = None
+        self._starts = None
+        self._keys = None
+        self._fields = None
+        self._gaps = None
+        self.skipped_lines = 0
+        self.tables = 0
+
+    def feed(self, chunk):
+        entries = []
+        lines = (self._partial + chunk).split('\n')
+        self._partial = lines.pop()
+        for line in lines:
+            self._push(_clean_line(line), entries)
+        return entries
+
+    def close(self):
+        entries = []
+        if self._partial:
+            self._push(_clean_line(self._partial), entries)
+            self._partial = ''
+        if self._pending is not None:
+            self._row(self._pending, entries)
+            self._pending = None
+        return entries
+
+    def _push(self, line, entries):
+        pending, self._pending = self._pending, line
+        if pending is None:
+            return
+        if _is_separator(line):
+            self._header(pending)
+            self._pending = None
+        else:
+            self._row(pending, entries)
+
+    def _header(self, header):
+        starts, names = _column_starts(header)
+        if len(starts) < 3:
+            self._starts = None
+            return
+        keys = [KNOWN_COLUMNS.get(name.lower()) for name in names]
+        if None in keys:
+            keys = list(POSITIONAL_COLUMNS.get(len(names), ('name', 'id', 'version')))
+            keys += [None] * (len(names) - len(keys))
+        self._starts, self._keys = starts, keys
+        # Dla linii bez znaków szerokich: wycinki kolumn i pozycje, na których musi stać spacja między kolumnami
+        bounds = starts[1:] + [None]
+        self._fields = [(key, slice(start, end)) for key, start, end in zip(keys, starts, bounds) if key and key != 'source']
+        self._gaps = [start - 1 for start in starts[1:]]
+        self._gap_chars = operator.itemgetter(*self._gaps)
+        self.tables += 1
+
+    def _row(self, line, entries):
+        if self._starts is None:
+            return
+        if not line.strip():
+            self._starts = None
+            return
+        # Wiersz nie pasuje do tabeli (np. stopka "3 upgrades available."), gdy między kolumnami nie ma spacji
+        if _is_narrow(line):
+            length = len(line)
+            if length > self._gaps[-1] + 1:
+                fits = set(self._gap_chars(line)) == {' '}
+            else:
+                fits = all(length <= gap + 1 or line[gap] == ' ' for gap in self._gaps)
+            entry = {key: line[part].strip() for key, part in self._fields} if fits else {}
+        else:
+            cells = _split_by_width(line, self._starts)
+            entry = {key: cell for key, cell in zip(self._keys, cells or ()) if key and key != 'source'}
+        if not entry.get('name') or not entry.get('id') or not entry.get('version'):
+            self.skipped_lines += 1
+            return
+        entries.append(entry)
+
+
+class JsonStreamDecoder:
+    """
+    Dekoder wyniku winget --json podawanego porcjami. Zwraca kolejne wartości najwyższego poziomu
+    (obiekty lub tablice). Tekst przed pierwszym "{" / "[" i między wartościami (np. wskaźnik postępu)
+    jest pomijany i liczony w skipped_chars.
+    Niekompletna wartość na końcu bufora jest dekodowana ponownie dopiero, gdy niezdekodowany tekst
+    urośnie dwukrotnie - jedna duża wartość podawana małymi porcjami nie jest przeglądana od nowa
+    przy każdej porcji. Cały tekst podany jednym feed() jest dekodowany w jednym przebiegu bez kopii.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._chunks = []
+        self._pending_size = 0
+        self._retry_size = 0
+        self.skipped_chars = 0
+        self.values = 0
+
+    def feed(self, chunk):
+        if not chunk:
+            return []
+        self._chunks.append(chunk)
+        self._pending_size += len(chunk)
+        # Dekodowanie ma sens dopiero, gdy porcja może kończyć się pełną wartością
+        tail = chunk.rstrip()
+        if tail[-1:] not in ('}', ']') or self._pending_size < self._retry_size:
+            return []
+        return self._decode(final=False)
+
+    def close(self):
+        values = self._decode(final=True)
+        self._chunks, self._pending_size, self._retry_size = [], 0, 0
+        return values
+
+    def _decode(self, final):
+        # Wartości budowane w pętli Pythona uruchamiają cykliczny GC co kilkaset obiektów, a przy dużym
+        # inwentarzu każdy przebieg przegląda coraz więcej żywych słowników. Parsowanie nie tworzy cykli,
+        # więc GC jest wstrzymywany na czas dekodowania (jak w json.loads całego tekstu naraz).
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._decode_buffer(final)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def _decode_buffer(self, final):
+        buffer = self._chunks[0] if len(self._chunks) == 1 else ''.join(self._chunks)
+        values, position = [], 0
+        raw_decode, skipped = self._decoder.raw_decode, 0
+        while True:
+            # Zwykle kolejna wartość zaczyna się zaraz po poprzedniej - wyszukiwanie tylko przy przerwie
+            if buffer.startswith(JSON_START, position):
+                start = position
+            else:
+                match = _JSON_START.search(buffer, position)
+                if match is None:
+                    skipped += len(buffer[position:].strip())
+                    position = len(buffer)
+                    break
+                start = match.start()
+                skipped += len(buffer[position:start].strip())
+            try:
+                value, position = raw_decode(buffer, start)
+            except json.JSONDecodeError:
+                if not final:
+                    # Wartość jeszcze niekompletna - czekamy na kolejną porcję
+                    position = start
+                    break
+                # Uszkodzony fragment: pomijamy znak otwierający i szukamy następnej wartości
+                skipped += 1
+                position = start + 1
+                continue
+            values.append(value)
+        self.skipped_chars += skipped
+        self.values += len(values)
+        self._chunks = [buffer[position:]] if position < len(buffer) else []
+        self._pending_size = len(buffer) - position
+        self._retry_size = 2 * self._pending_size
+        return values
+
+
+def json_entries(value):
+    """Wpisy (słowniki) z wartości wyniku --json: {"data": [...]}, tablicy albo pojedynczego obiektu."""
+    if isinstance(value, dict):
+        data = value.get('data')
+        if isinstance(data, list):
+            return [item for item in data if isinstance(item, dict)]
+        return [value]
+    if isinstance(value, list):
+        return [entry for item in value for entry in json_entries(item)]
+    return []
+
+
+def iter_chunks(text, size=65536):
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+def parse_text_output(text, chunk_size=65536):
+    """Wpisy wszystkich tabel z tekstowego wyjścia winget."""
+    parser = WingetTableParser()
+    entries = []
+    for chunk in iter_chunks(text or '', chunk_size):
+        entries.extend(parser.feed(chunk))
+    entries.extend(parser.close())
+    return entries
+
+
+def parse_json_output(text, chunk_size=None):
+    """
+    Wpisy z wyjścia winget --json. ValueError, gdy w niepustym wyjściu nie ma żadnej wartości JSON.
+    Gotowy tekst (np. odpowiedź Pomocnika UI) jest dekodowany w jednym przebiegu; chunk_size dzieli go
+    na porcje jak przy czytaniu strumienia.
+    """
+    decoder = JsonStreamDecoder()
+    chunks = iter_chunks(text or '', chunk_size) if chunk_size else (text or '',)
+    batches = [decoder.feed(chunk) for chunk in chunks]
+    batches.append(decoder.close())
+    if not decoder.values and decoder.skipped_chars:
+        raise ValueError("Wyjście winget nie zawiera danych JSON.")
+    entries = []
+    for batch in batches:
+        for value in batch:
+            # Sklejone obiekty "{...}{...}" to już wpisy - bez listy pośredniej dla każdego z nich
+            if isinstance(value, dict) and not isinstance(value.get('data'), list):
+                entries.append(value)
+            else:
+                entries.extend(json_entries(value))
+    return entries
+
+
+# --- Korpus nagrań i benchmark ---
+
+def _legacy_parse_text(text):
+    # Dotychczasowy parser agenta (indeksy znaków z nagłówka sprawdzanego w każdej linii) - do porównania
+    apps, header_line, header_indices = [], "", {}
+    for line in text.strip().split('\n'):
+        if 'Name' in line and 'Id' in line and 'Version' in line:
+            header_line = line
+            header_indices['name_end'] = header_line.index("Id")
+            header_indices['id_end'] = header_line.index("Version")
+            header_indices['version_end'] = header_line.index("Available") if "Available" in header_line else len(header_line)
+            continue
+        if not header_indices or line.startswith('---') or not line.strip():
+            continue
+        app = {"name": line[:header_indices['name_end']].strip(),
+               "id": line[header_indices['name_end']:header_indices['id_end']].strip(),
+               "version": line[header_indices['id_end']:header_indices['version_end']].strip()}
+        if "Available" in header_line:
+            app["available_version"] = line[header_indices['version_end']:].strip()
+        if app['name'] and app['id']:
+            apps.append(app)
+    return apps
+
+
+def _legacy_parse_json(text):
+    text = text.strip()
+    if text.startswith('{') and text.endswith('}'):
+        return json.loads('[' + text.replace('}{', '},{') + ']')
+    return json.loads(text)
+
+
+def _parse_corpus_file(path, chunk_size):
+    with open(path, encoding='utf-8', newline='') as f:
+        text = f.read()
+    parse = parse_json_output if path.endswith('.json') else parse_text_output
+    return parse(text, chunk_size) if chunk_size else parse(text)
+
+
+def _load_json(path, default=None):
+    import os
+    if default is not None and not os.path.exists(path):
+        return default
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_json(path, value):
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        json.dump(value, f, ensure_ascii=False, indent=1, sort_keys=True)
+        f.write('\n')
+
+
+def _ui_culture(source):
+    # record zapisuje kulturę jako "Get-Culture / Get-UICulture" - język wyjścia winget to ta druga
+    return source.get('culture', '').split('/')[-1].strip()
+
+
+def check_corpus(directory, require_captured=False):
+    """
+    Porównuje wynik parsera dla każdego nagrania (przy różnych wielkościach porcji) z expected.json.
+    Z require_captured wymaga też nagrań z komputera: co najmniej jednego po angielsku (en-US)
+    i jednego w innym języku interfejsu Windows.
+    """
+    import os
+    expected = _load_json(os.path.join(directory, 'expected.json'))
+    sources = _load_json(os.path.join(directory, 'sources.json'), {})
+    failures = 0
+    for name in sorted(set(expected) - set(sources)):
+        failures += 1
+        print(f"BŁĄD {name}: brak wpisu o pochodzeniu pliku w sources.json")
+    captured = [sources[name] for name in expected if sources.get(name, {}).get('source') == 'captured']
+    print(f"Korpus: {len(expected)} plików, nagranych na komputerze: {len(captured)}, odtworzonych ręcznie: "
+          f"{len(expected) - len(captured)}")
+    if require_captured:
+        cultures = {_ui_culture(source) for source in captured}
+        if 'en-US' not in cultures:
+            failures += 1
+            print("BŁĄD korpus: brak nagrania z komputera z interfejsem en-US")
+        if not cultures - {'en-US', ''}:
+            failures += 1
+            print("BŁĄD korpus: brak nagrania z komputera ze zlokalizowanym interfejsem (np. pl-PL)")
+    for name in sorted(expected):
+        results = {size: _parse_corpus_file(os.path.join(directory, name), size) for size in (None, 1, 7, 4096)}
+        ok = all(result == expected[name] for result in results.values())
+        failures += not ok
+        print(f"{'OK ' if ok else 'BŁĄD'} {name}: wpisów {len(results[4096])} (oczekiwano {len(expected[name])})")
+    return failures
+
+
+def _powershell(command):
+    # Tak jak run_command_as_user w ui_helper.py - agent dostaje wyjście winget właśnie w tej postaci
+    import subprocess
+    full_command = (f"$ProgressPreference = 'SilentlyContinue'; "
+                    f"[System.Threading.Thread]::CurrentThread.CurrentUICulture = 'en-US'; & {command}")
+    return subprocess.run(["powershell.exe", "-NoProfile", "-ExecutionPolicy", "Bypass", "-Command", full_command],
+                          capture_output=True, text=True, encoding='utf-8', errors='ignore', timeout=600)
+
+
+def record(directory, name, winget_args, update_expected=False):
+    """
+    Nagrywa wyjście "winget <winget_args>" do pliku korpusu (Windows) i zapisuje jego pochodzenie
+    w sources.json. Wynik parsera jest wypisywany do przejrzenia; z update_expected trafia do expected.json.
+    """
+    import datetime
+    import os
+    # Argumenty ze spacjami w apostrofach PowerShell (apostrof wewnątrz jest podwajany)
+    command = 'winget ' + ' '.join("'" + arg.replace("'", "''") + "'" if ' ' in arg else arg for arg in winget_args)
+    result = _powershell(command)
+    if not result.stdout.strip():
+        raise RuntimeError(f"Polecenie '{command}' nie zwróciło wyjścia (kod {result.returncode}): "
+                           f"{result.stderr.strip()[:300]}")
+    with open(os.path.join(directory, name), 'w', encoding='utf-8', newline='') as f:
+        f.write(result.stdout)
+    culture = _powershell("(Get-Culture).Name + ' / ' + (Get-UICulture).Name").stdout.strip()
+    sources_path = os.path.join(directory, 'sources.json')
+    sources = _load_json(sources_path, {})
+    sources[name] = {
+        'source': 'captured', 'command': command, 'exit_code': result.returncode,
+        'winget_version': _powershell('winget --version').stdout.strip(), 'culture': culture,
+        'recorded_at': datetime.date.today().isoformat(),
+    }
+    _save_json(sources_path, sources)
+    entries = _parse_corpus_file(os.path.join(directory, name), None)
+    print(json.dumps(entries, ensure_ascii=False, indent=1))
+    print(f"Zapisano {name}: {len(result.stdout)} znaków, wpisów {len(entries)}.")
+    if update_expected:
+        expected_path = os.path.join(directory, 'expected.json')
+        expected = _load_json(expected_path)
+        expected[name] = entries
+        _save_json(expected_path, expected)
+        print("Wynik dopisano do expected.json - sprawdź go z tabelą winget przed zatwierdzeniem.")
+    return entries
+
+
+def benchmark(directory, rows, rounds):
+    import os
+    import time
+    import tracemalloc
+    with open(os.path.join(directory, 'list_en.txt'), encoding='utf-8', newline='') as f:
+        header, separator, *body = [_clean_line(line) for line in f.read().split('\n') if line.strip()]
+    text = '\n'.join([header, separator] + [body[i % len(body)] for i in range(rows)]) + '\n'
+    entries = [{'Name': f'Aplikacja {i}', 'Id': f'Dostawca.Aplikacja{i}', 'Version': f'1.{i}.0',
+                'Tags': {'opis': 'nawiasy }{ w tekście', 'zagnieżdżone': {'a': [1, {'b': i}]}}} for i in range(rows)]
+    json_text = ''.join(json.dumps(entry, ensure_ascii=False) for entry in entries)
+    # Jedna duża wartość czytana porcjami - bez ponawiania dekodowania od początku przy każdej porcji
+    json_array = json.dumps(entries, ensure_ascii=False)
+
+    def measure(func):
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            result = func()
+            timings.append((time.perf_counter() - started) * 1000)
+        # Pamięć zajęta ponad tekst wejściowy (kopie tekstu, bufor, wynik) - osobny przebieg, bo tracemalloc spowalnia
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+        return min(timings), sum(timings) / len(timings), len(result), peak
+
+    cases = [
+        (f'tekst, dotychczasowy ({len(text) // 1024} KB)', lambda: _legacy_parse_text(text)),
+        ('tekst, WingetTableParser', lambda: parse_text_output(text)),
+        (f'JSON, replace("}}{{") ({len(json_text) // 1024} KB)', lambda: _legacy_parse_json(json_text)),
+        ('JSON, JsonStreamDecoder', lambda: parse_json_output(json_text)),
+        ('JSON, JsonStreamDecoder, porcje 64 KB', lambda: parse_json_output(json_text, 65536)),
+        ('JSON, jedna tablica, porcje 64 KB', lambda: parse_json_output(json_array, 65536)),
+    ]
+    for label, func in cases:
+        try:
+            best, average, count, peak = measure(func)
+            print(f"{label:>40}: najlepszy {best:9.2f} ms, średni {average:9.2f} ms, pamięć {peak:7.1f} MB, wpisów {count}")
+        except ValueError as e:
+            print(f"{label:>40}: błąd - {e}")
+
+
+def main(argv=None):
+    import argparse
+    import os
+    parser = argparse.ArgumentParser(description="Parser wyjścia winget: sprawdzenie korpusu nagrań, benchmark "
+                                                 "i nagrywanie nowych plików korpusu.")
+    parser.add_argument('command', choices=('corpus', 'benchmark', 'record'))
+    parser.add_argument('name', nargs='?', help='Plik korpusu dla record (.txt albo .json dla --json).')
+    parser.add_argument('winget_args', nargs='*', help='Argumenty winget dla record (po "--").')
+    parser.add_argument('--update-expected', action='store_true', help='record: dopisz wynik do expected.json.')
+    parser.add_argument('--require-captured', action='store_true',
+                        help='corpus: wymagaj nagrań z komputera po angielsku i w innym języku.')
+    parser.add_argument('--corpus', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'winget_corpus'))
+    parser.add_argument('--rows', type=int, default=50000, help='Liczba aplikacji w benchmarku.')
+    parser.add_argument('--rounds', type=int, default=3, help='Liczba powtórzeń pomiaru.')
+    args = parser.parse_args(argv)
+    if args.command == 'record':
+        if not args.name or not args.winget_args:
+            parser.error("record wymaga nazwy pliku i argumentów winget, np. record list_de.txt -- list")
+        record(args.corpus, args.name, args.winget_args, args.update_expected)
+        return 0
+    failures = check_corpus(args.corpus, args.require_captured)
+    if args.command == 'benchmark':
+        benchmark(args.corpus, args.rows, args.rounds)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())